@@ -0,0 +1,214 @@
+"""Benchmarks for Library, Gallery and UploadFiles at scale.
+
+Generates synthetic image trees with mixed sizes, formats and nested directories, then times
+directory scanning, metadata extraction, running the library script and saving uploads. Results are
+written as JSON so runs can be compared between releases.
+
+Example usage:
+    python benchmarks/bench.py --sizes 1000 10000 --output results.json
+    python benchmarks/bench.py --sizes 1000 10000 --baseline results.json
+"""
+import argparse
+import importlib.metadata
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep every cache written by the package inside a throwaway directory so runs don't affect each
+# other or the user's real cache.
+CACHE_DIR = tempfile.mkdtemp(prefix="sul-bench-cache-")
+os.environ["XDG_CACHE_HOME"] = CACHE_DIR
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+from streamlit.delta_generator import DeltaGenerator
+from streamlit_uploads_library.index import FileIndex
+from streamlit_uploads_library.instrumentation import NULL_METRICS
+from streamlit_uploads_library.library import Library, load_library_data
+from streamlit_uploads_library.metadata import MetadataStore
+from streamlit_uploads_library.uploads import UploadFiles
+
+TEMPLATE_SIZES = [(64, 48), (640, 480), (1920, 1080), (480, 640)]
+TEMPLATE_FORMATS = [("JPEG", ".jpg"), ("PNG", ".png"), ("WEBP", ".webp")]
+FILES_PER_DIR = 200
+
+class FakeUploadedFile(io.BytesIO):
+    """A stand-in for the UploadedFile objects returned by st.file_uploader."""
+    def __init__(self, data, name, file_id):
+        super(FakeUploadedFile, self).__init__(data)
+        self.id = file_id
+        self.name = name
+        self.size = len(data)
+
+def create_templates():
+    """Returns encoded template images for every size and format combination."""
+    templates = list()
+    for width, height in TEMPLATE_SIZES:
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        for image_format, suffix in TEMPLATE_FORMATS:
+            buffer = io.BytesIO()
+            img.save(buffer, format=image_format)
+            templates.append((buffer.getvalue(), suffix))
+    return templates
+
+def create_tree(root, num_of_files, templates, seed=0):
+    """Creates a nested tree of `num_of_files` images below `root`."""
+    rng = random.Random(seed)
+    for file_idx in range(num_of_files):
+        dir_idx = file_idx // FILES_PER_DIR
+        directory = root / f"group_{dir_idx // 10:03d}" / f"folder_{dir_idx:04d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        data, suffix = rng.choice(templates)
+        (directory / f"image_{file_idx:06d}{suffix}").write_bytes(data)
+
+def timed(func, *args, **kwargs):
+    """Returns the result of calling `func` and the elapsed time in seconds."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+class DeltaCounter():
+    """Counts the elements and blocks emitted by streamlit while active."""
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        self._enqueue = DeltaGenerator._enqueue
+        self._block = DeltaGenerator._block
+        counter = self
+        def enqueue(dg, *args, **kwargs):
+            counter.count += 1
+            return counter._enqueue(dg, *args, **kwargs)
+        def block(dg, *args, **kwargs):
+            counter.count += 1
+            return counter._block(dg, *args, **kwargs)
+        DeltaGenerator._enqueue = enqueue
+        DeltaGenerator._block = block
+        return self
+
+    def __exit__(self, *exc_info):
+        DeltaGenerator._enqueue = self._enqueue
+        DeltaGenerator._block = self._block
+
+def bench_tree(root, num_of_files, file_extensions, render_rows, render_all_limit, upload_count, templates):
+    """Runs every benchmark against a tree of `num_of_files` images."""
+    results = list()
+    def record(name, seconds, **extra):
+        results.append(dict(name=name, files=num_of_files, seconds=round(seconds, 6), **extra))
+        print(f"{name:<28} {num_of_files:>8} files {seconds:>10.4f}s {extra if extra else ''}")
+
+    index = FileIndex(root, index_path=Path(CACHE_DIR) / f"bench-{num_of_files}.pickle")
+    _, seconds = timed(index.refresh)
+    record("scan_cold", seconds)
+    _, seconds = timed(index.refresh)
+    record("scan_warm", seconds)
+    _, seconds = timed(FileIndex(root, index_path=index.index_path).refresh)
+    record("scan_warm_from_disk", seconds)
+    files, seconds = timed(index.files, file_extensions)
+    record("list_files", seconds, listed=len(files))
+
+    store = MetadataStore(root, store_path=Path(CACHE_DIR) / f"bench-meta-{num_of_files}.pickle")
+    entries = index.entries(file_extensions)
+    _, seconds = timed(store.update, entries)
+    record("metadata_cold", seconds)
+    _, seconds = timed(store.update, entries)
+    record("metadata_warm", seconds)
+
+    for max_rows in (render_rows, None):
+        if max_rows is None and num_of_files > render_all_limit:
+            continue
+        load_library_data.clear()
+        with DeltaCounter() as counter:
+            _, seconds = timed(Library, directory=root, file_extensions=file_extensions, max_rows=max_rows, watch_directory=False, uid=f"bench-{num_of_files}")
+        record("render_cold" if max_rows else "render_all_cold", seconds, deltas=counter.count)
+        with DeltaCounter() as counter:
+            _, seconds = timed(Library, directory=root, file_extensions=file_extensions, max_rows=max_rows, watch_directory=False, uid=f"bench-{num_of_files}")
+        record("render_warm" if max_rows else "render_all_warm", seconds, deltas=counter.count)
+
+    rng = random.Random(num_of_files)
+    uploads = [(rng.choice(templates)[0], idx) for idx in range(upload_count)]
+    for save_mode in ("passthrough", "transform"):
+        destination = Path(tempfile.mkdtemp(prefix="sul-bench-upload-"))
+        uploader = UploadFiles.__new__(UploadFiles)
+        uploader.save_mode = save_mode
+        uploader.max_workers = None
+        uploader.thumbnail_widths = (300,)
+        uploader.serve_static = False
+        uploader.max_file_bytes = None
+        uploader.memory_budget = 1024 * 1024 * 1024
+        uploader.warn_duplicates = False
+        uploader.duplicate_distance = 4
+        uploader.accept_archives = False
+        uploader.metrics = NULL_METRICS
+        # Each upload gets unique content so deduplication doesn't skip any of them.
+        files_to_upload = [FakeUploadedFile(data + idx.to_bytes(4, "big"), f"upload_{idx:05d}.jpg", idx) for data, idx in uploads]
+        _, seconds = timed(uploader.save_uploaded_files, files_to_upload, destination)
+        record(f"upload_{save_mode}", seconds, uploads=upload_count)
+        shutil.rmtree(destination, ignore_errors=True)
+    return results
+
+def compare(results, baseline_path):
+    """Prints the change of each result against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = {(result["name"], result["files"]): result for result in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result["name"], result["files"]))
+        if previous is None or previous["seconds"] == 0:
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        print(f"{result['name']:<28} {result['files']:>8} files {ratio:>8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Numbers of files in the generated trees, for example 1000 10000 100000.")
+    parser.add_argument("--extensions", nargs="+", default=[".png", ".jpg", ".jpeg", ".webp"], help="File extensions included in the library.")
+    parser.add_argument("--render-rows", type=int, default=4, help="Rows displayed per page in the paginated render benchmark.")
+    parser.add_argument("--render-all-limit", type=int, default=2000, help="Largest tree rendered without pagination, rendering every file is slow.")
+    parser.add_argument("--uploads", type=int, default=50, help="Number of files saved by the upload benchmarks.")
+    parser.add_argument("--workdir", default=None, help="Directory used for the generated trees, default is a temporary directory.")
+    parser.add_argument("--output", default=None, help="Path to write the JSON results to.")
+    parser.add_argument("--baseline", default=None, help="Path to a previous JSON results file to compare with.")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="sul-bench-"))
+    templates = create_templates()
+    results = list()
+    try:
+        for num_of_files in args.sizes:
+            root = workdir / f"tree_{num_of_files}"
+            if not root.exists():
+                _, seconds = timed(create_tree, root, num_of_files, templates)
+                print(f"Generated {num_of_files} files in {seconds:.2f}s")
+            results.extend(bench_tree(root.resolve(), num_of_files, tuple(args.extensions), args.render_rows, args.render_all_limit, args.uploads, templates))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    try:
+        version = importlib.metadata.version("streamlit_uploads_library")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    report = {
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Import time budget for the streamlit_uploads_library package.
+
+Imports the package and the modules loaded by the upload worker processes in fresh interpreters,
+reads the time Python reports for each import with `-X importtime` and fails when the median of
+the runs is over budget or when a heavy dependency was imported before it is needed. The modules
+displaying images import streamlit, which loads Pillow and NumPy itself, so they are budgeted on
+the time they add to importing streamlit in the same interpreter.
+
+Example usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 9 --scale 2
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Each check is a module to import, its budget in milliseconds, the modules it must not import and
+# the module whose import time is subtracted, or None.
+CHECKS = [
+    ("streamlit_uploads_library", 20, ["streamlit", "PIL", "numpy", "watchdog"], None),
+    ("streamlit_uploads_library.processing", 150, ["streamlit", "numpy", "watchdog"], None),
+    ("streamlit_uploads_library.operations", 75, ["streamlit", "PIL", "numpy", "watchdog"], None),
+    ("streamlit_uploads_library.library", 60, [], "streamlit"),
+    ("streamlit_uploads_library.gallery", 75, [], "streamlit"),
+]
+
+SCRIPT = """import sys
+import {module}
+print(" ".join(sorted(name for name in sys.modules if "." not in name)))
+"""
+
+def measure_import(module, baseline=None):
+    """Imports a module in a fresh interpreter.
+
+    Args:
+        module (str): A str() of the module to import.
+        baseline (str): An optional str() of a module imported by `module` whose cumulative import time is subtracted.
+
+    Returns:
+        import_ms (float): A float() of the cumulative import time of the module in milliseconds, less the time of `baseline`.
+        loaded (set): A set() of the names of the top level modules loaded by the interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT_DIR), os.environ.get("PYTHONPATH")])))
+    # Bytecode is written by the first run so later runs measure a warm start, as workers do.
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", SCRIPT.format(module=module)], env=env, capture_output=True, text=True, check=True)
+    times = dict()
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:   self [us] | cumulative | imported package".
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[2].strip() in (module, baseline):
+            times[fields[2].strip()] = int(fields[1]) / 1000
+    for name in filter(None, (module, baseline)):
+        if name not in times:
+            raise RuntimeError(f"No import time was reported for {name}.")
+    return times[module] - times.get(baseline, 0), set(result.stdout.split())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters each module is imported in, the median is compared to the budget.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier applied to every budget, for slow machines.")
+    args = parser.parse_args()
+
+    failures = list()
+    for module, budget_ms, forbidden, baseline in CHECKS:
+        budget_ms *= args.scale
+        measure_import(module, baseline)
+        runs = [measure_import(module, baseline) for _ in range(args.runs)]
+        median_ms = statistics.median(import_ms for import_ms, _ in runs)
+        loaded = sorted(set(forbidden) & runs[0][1])
+        status = "ok" if median_ms <= budget_ms and not loaded else "FAIL"
+        took = f"{median_ms:.1f} ms" if baseline is None else f"{median_ms:.1f} ms more than {baseline}"
+        print(f"{status:4} {module}: {took} (budget {budget_ms:.0f} ms)")
+        if median_ms > budget_ms:
+            failures.append(f"importing {module} took {took}, the budget is {budget_ms:.0f} ms")
+        if loaded:
+            failures.append(f"importing {module} loaded {', '.join(loaded)}")
+    for failure in failures:
+        print(f"error: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
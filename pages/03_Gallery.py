@@ -1,3 +1,4 @@
+import inspect
 import streamlit as st
 from streamlit_uploads_library.gallery import Gallery
 
@@ -15,43 +16,7 @@ st.set_page_config(
     },
 )
 
-source_code = '''
-import streamlit as st
-from streamlit_uploads_library.library import Library
-
-class Gallery(Library):
-    """Create a simple gallery out of streamlit widgets.
-
-    A wrapper around the `Library` class to create a gallery. Using the gallery is simple, import 
-    `streamlit_uploads_library` and then instantiate the class with the required `directory` 
-    variable. Other options can be configured by passing in different variables when instantiating 
-    the class.
-
-    Example Usage:
-        python
-        import streamlit as st
-        from streamlit_uploads_library.gallery import Gallery
-
-        st.set_page_config(page_title="Streamlit Uploads Library", layout="wide")
-        default_gallery = Gallery(directory="assets")
-   
-    Args:
-        directory (str): A str() of the path to the folder containing the gallery images, for example, "assets".
-        file_extensions (tuple): A tuple() containing strings of the file extensions to include in the gallery, default is (".png", ".jpg", ".jpeg").
-        image_alignment (str): A str() with the CSS keyword used to align the images and details columns.
-        number_of_columns (int): An int() defining the number of required columns, default is 5.
-        show_details (bool): A bool() to show or hide the file and edit details, True shows them, default is False to hide them and create a gallery.
-        uid (str): A str() containing a unique identifier allowing you to create multiple galleries on the same page containing the same images.
-    """
-    def __init__(self, directory, file_extensions=(".png", ".jpg", ".jpeg"), image_alignment="center", number_of_columns=5, show_details=False, uid="gallery"):
-        self.directory = directory
-        self.file_extensions = file_extensions
-        self.image_alignment = image_alignment
-        self.number_of_columns = number_of_columns
-        self.show_details = show_details
-        self.uid = uid
-        super(Gallery, self).__init__(self.directory, self.file_extensions, self.image_alignment, self.number_of_columns, self.show_details, self.uid)
-'''
+source_code = inspect.getsource(inspect.getmodule(Gallery))
 
 with st.sidebar:
     st.info("Welcome to the `streamlit-uploads-library` example app.")
@@ -70,6 +35,23 @@ instantiating the class.
 - `number_of_columns` (optional): An int() defining the number of required columns, default is 5.
 - `show_details` (optional): A bool() to show or hide the file and edit details, True shows them, default is False to hide them and create a gallery.
 - `uid` (optional): A str() containing a unique identifier allowing you to create multiple galleries on the same page containing the same images.
+- `thumbnail_width` (optional): An int() defining the width in pixels of the thumbnails displayed in the gallery, default is 300, can be set to None to display the original images instead.
+- `thumbnail_cache` (optional): A ThumbnailCache() used to store the thumbnails, default is None to use the cache shared by all galleries and libraries.
+- `max_rows` (optional): An int() defining the maximum number of rows displayed at once, default is None to display all images on a single page.
+- `pagination` (optional): A str() defining how further rows are displayed when using `max_rows`, options are "pages" or "load_more", default is "pages".
+- `watch_directory` (optional): A bool() to watch the directory for changes so only the changed paths are refreshed, default is True, set it to False for network filesystems that don't report changes.
+- `metrics` (optional): A Metrics() used to record timings and counters for the gallery, default is None to disable instrumentation.
+- `show_metrics` (optional): A bool() to display the recorded timings and counters below the gallery, default is False.
+- `serve_static` (optional): A bool() to display the images by URL through streamlit's static file route instead of sending them through the streamlit server, requires `server.enableStaticServing`, default is False.
+- `background_scan` (optional): A bool() to scan a directory that has never been indexed in a background thread while displaying the images found so far, default is True.
+- `sort_by` (optional): A str() defining the order of the files, options are "name", "modified", "size" or "dimensions", default is None to use the directory order.
+- `sort_descending` (optional): A bool() to reverse the order of the files, default is False.
+- `file_filter` (optional): A FileFilter() used to only display matching files, default is None to display every file.
+- `show_filters` (optional): A bool() to display search, sort and filter controls above the gallery, default is False.
+- `multi_select` (optional): A bool() to display a checkbox on each image and controls to delete, move or rename the selected files at once, default is False.
+- `layout` (optional): A str() defining how the images are displayed, "columns" creates streamlit columns and widgets for each image, "masonry" displays every image in a single lazy loading grid element, default is "columns". The "masonry" layout requires `serve_static` and can't be used with `show_details` or `multi_select`.
+- `grid_height` (optional): An int() defining the height in pixels of the "masonry" layout, which scrolls when the images don't fit, default is 800.
+- `show_export` (optional): A bool() to display a button exporting the selected files, or every displayed file when none are selected, to a ZIP archive, default is False.
 """
 )
 st.code(
@@ -50,10 +50,20 @@ class CustomLibrary(Library):
 st.header("Caching")
 st.markdown(
 """
-Streamlit Uploads Library makes use of the `st.cache_resource` decorator so the library and gallery 
-on this page will load from the cache instead of reloading the images each time the app is run. You 
-will probably want to clear your cache after uploading new files to your app, to do this you can use 
-the `st.cache_resource.clear()` function provided by Streamlit.
+Streamlit Uploads Library keeps an index of the files in each directory and caches the file list 
+and image metadata of each library with the `st.cache_resource` decorator, so the library and 
+gallery on this page will not read the images again each time the app is run. The cache is keyed on 
+the generation of the directory index, which changes whenever a file is added, changed or removed. 
+The directory of each library is watched for changes and only the changed paths are refreshed, so 
+there is no need to clear the cache after uploading new files. If you use your own file uploader and 
+save function you can refresh the affected libraries with `invalidate_paths`.
+"""
+)
+st.code(
+"""
+from streamlit_uploads_library.index import invalidate_paths
+
+invalidate_paths(["assets/new-image.jpg"])
 """
 )
 default_library = Library(directory="assets/landscape/")
@@ -0,0 +1,46 @@
+"""A simple library or gallery for Streamlit made from widgets.
+
+The classes and functions below can be imported from the package directly, each one is only imported
+from its module the first time it is used so importing the package doesn't load streamlit, Pillow or
+NumPy.
+
+Example Usage:
+    python
+    import streamlit_uploads_library as sul
+
+    library = sul.Library(directory="assets/landscape/")
+"""
+import importlib
+
+# Maps each attribute of the public API to the module defining it.
+_LAZY_ATTRIBUTES = {
+    "Library": "library",
+    "Gallery": "gallery",
+    "UploadFiles": "uploads",
+    "FileFilter": "query",
+    "Metrics": "instrumentation",
+    "ThumbnailCache": "thumbnails",
+    "ImageTooLargeError": "decoding",
+    "set_decode_limits": "decoding",
+    "probe": "probe",
+    "invalidate_paths": "index",
+    "enable_shared_cache": "shared",
+    "export_zip": "export",
+    "delete_files": "operations",
+    "move_files": "operations",
+    "rename_files": "operations",
+}
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    # Later lookups find the attribute directly and never call __getattr__ again.
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import os
+import posixpath
+import tarfile
+import zipfile
+from collections import namedtuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tgz", ".tar.gz")
+# Images hardly compress, members compressed further than this are treated as decompression bombs.
+MAX_COMPRESSION_RATIO = 100
+DEFAULT_MAX_ARCHIVE_BYTES = 4 * 1024 * 1024 * 1024
+DEFAULT_MAX_ARCHIVE_MEMBERS = 10_000
+
+class ArchiveError(ValueError):
+    """Raised when an archive or one of its members can't be extracted safely."""
+
+ArchiveMember = namedtuple("ArchiveMember", ["name", "size", "file"])
+ArchiveMember.__doc__ = """A file read from an archive.
+
+Args:
+    name (str): A str() of the normalised relative path of the file inside the archive, using "/" as the separator.
+    size (int): An int() of the size of the file in bytes declared by the archive.
+    file (file): A readable binary file object streaming the content of the file, only valid until the next member is read.
+"""
+
+def is_archive(name):
+    """Returns whether a file name is a supported archive.
+
+    Args:
+        name (str): A str() of the file name.
+
+    Returns:
+        archive (bool): A bool() which is True for ZIP and TAR archives.
+    """
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def member_name(name):
+    """Returns the normalised relative path of an archive member.
+
+    Args:
+        name (str): A str() of the path stored in the archive.
+
+    Returns:
+        name (str): A str() of the relative path using "/" as the separator.
+
+    Raises:
+        ArchiveError: When the path is absolute or leaves the extraction folder.
+    """
+    normalised = posixpath.normpath(name.replace("\\", "/"))
+    parts = normalised.split("/")
+    if normalised.startswith("/") or ":" in parts[0] or ".." in parts or normalised in ("", "."):
+        raise ArchiveError(f"Unsafe path {name!r} in the archive.")
+    return normalised
+
+def member_path(destination, name):
+    """Returns the path an archive member is extracted to.
+
+    Args:
+        destination (Path): A Path() object pointing to the folder the archive is extracted to.
+        name (str): A str() of the normalised relative path returned by member_name().
+
+    Returns:
+        path (Path): A Path() object inside `destination`.
+
+    Raises:
+        ArchiveError: When the path leaves `destination`, for example through a symbolic link.
+    """
+    destination = Path(destination).resolve()
+    path = (destination / Path(*name.split("/"))).resolve()
+    if destination not in path.parents:
+        raise ArchiveError(f"Unsafe path {name!r} in the archive.")
+    return path
+
+def iter_members(file, file_extensions=None, max_file_bytes=None, max_archive_bytes=DEFAULT_MAX_ARCHIVE_BYTES, max_members=DEFAULT_MAX_ARCHIVE_MEMBERS):
+    """Yields the files of a ZIP or TAR archive one at a time.
+
+    TAR archives, compressed or not, are read as a stream from start to end, so an unsafe entry is
+    only found once the entries before it have been yielded. ZIP archives are read from their
+    central directory and every path is checked before the first file is yielded. Directories, links, devices, hidden files and files without one of the
+    `file_extensions` are skipped, as are files larger than `max_file_bytes` or compressed beyond
+    MAX_COMPRESSION_RATIO. An archive with a path leaving the extraction folder, more than
+    `max_members` entries or more than `max_archive_bytes` of uncompressed content is rejected.
+
+    Args:
+        file (file): A readable and seekable binary file object of the archive.
+        file_extensions (list): A list() containing strings of the file extensions to extract, default is None to extract every file.
+        max_file_bytes (int): An int() defining the maximum size of a single file in bytes, default is None for no limit.
+        max_archive_bytes (int): An int() defining the maximum uncompressed size of the archive in bytes, default is 4 GiB.
+        max_members (int): An int() defining the maximum number of entries in the archive, default is 10,000.
+
+    Yields:
+        member (ArchiveMember): The ArchiveMember() of each file to extract.
+
+    Raises:
+        ArchiveError: When the archive is unsafe or can't be read.
+    """
+    if file_extensions is not None:
+        file_extensions = tuple(f".{extension.lower().lstrip('.')}" for extension in file_extensions)
+    def wanted(name, size, compressed_size=None):
+        basename = name.rpartition("/")[2]
+        if basename.startswith(".") or (file_extensions is not None and not basename.lower().endswith(file_extensions)):
+            return False
+        if max_file_bytes is not None and size > max_file_bytes:
+            logger.warning(f"Skipping {name}: {size} bytes is larger than the limit of {max_file_bytes} bytes.")
+            return False
+        if compressed_size is not None and size > MAX_COMPRESSION_RATIO * max(compressed_size, 1):
+            logger.warning(f"Skipping {name}: compressed {size // max(compressed_size, 1)} times.")
+            return False
+        return True
+    file.seek(0)
+    try:
+        if zipfile.is_zipfile(file):
+            file.seek(0)
+            with zipfile.ZipFile(file) as archive:
+                members = archive.infolist()
+                if len(members) > max_members:
+                    raise ArchiveError(f"The archive has {len(members)} entries, the limit is {max_members}.")
+                total_bytes = sum(member.file_size for member in members)
+                if total_bytes > max_archive_bytes:
+                    raise ArchiveError(f"The archive contains {total_bytes} bytes, the limit is {max_archive_bytes} bytes.")
+                # Every path is checked before the first file is read so an unsafe archive yields nothing.
+                names = [member_name(member.filename) for member in members]
+                for name, member in zip(names, members):
+                    # The file type is stored in the upper bits of the external attributes.
+                    if member.is_dir() or (member.external_attr >> 28) == 0xA:
+                        continue
+                    if wanted(name, member.file_size, member.compress_size):
+                        with archive.open(member) as member_file:
+                            yield ArchiveMember(name, member.file_size, member_file)
+            return
+        file.seek(0)
+        with tarfile.open(fileobj=file, mode="r|*") as archive:
+            for num_of_members, member in enumerate(archive, start=1):
+                if num_of_members > max_members:
+                    raise ArchiveError(f"The archive has more than {max_members} entries.")
+                # Skipping a member still decompresses it, so the position in the uncompressed
+                # stream is limited rather than the size of the extracted files.
+                if member.offset_data + member.size > max_archive_bytes:
+                    raise ArchiveError(f"The archive contains more than {max_archive_bytes} bytes.")
+                name = member_name(member.name)
+                if member.isfile() and wanted(name, member.size):
+                    yield ArchiveMember(name, member.size, archive.extractfile(member))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"Unable to read the archive: {e}") from e
+
+def extract_member(member, path, chunk_size=CHUNK_SIZE):
+    """Streams an archive member to a file, hashing its content.
+
+    More bytes than the size declared by the archive are never written.
+
+    Args:
+        member (ArchiveMember): The ArchiveMember() to extract.
+        path (Path): A Path() object pointing to the file to write.
+        chunk_size (int): An int() defining the number of bytes copied at a time, default is 1 MiB.
+
+    Returns:
+        digest (str): A str() containing the SHA-256 hex digest of the content.
+        num_of_bytes (int): An int() of the number of bytes written.
+
+    Raises:
+        ArchiveError: When the member is larger than its declared size.
+    """
+    hasher = hashlib.sha256()
+    num_of_bytes = 0
+    try:
+        with open(path, "wb") as f:
+            while True:
+                chunk = member.file.read(min(chunk_size, member.size - num_of_bytes + 1))
+                if not chunk:
+                    break
+                num_of_bytes += len(chunk)
+                if num_of_bytes > member.size:
+                    raise ArchiveError(f"{member.name} is larger than its declared size of {member.size} bytes.")
+                hasher.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return hasher.hexdigest(), num_of_bytes
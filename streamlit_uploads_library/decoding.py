@@ -0,0 +1,249 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Pillow refuses to open images above twice its `MAX_IMAGE_PIXELS`, the same limit is used by default.
+DEFAULT_MAX_PIXELS = 2 * Image.MAX_IMAGE_PIXELS
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_max_pixels = DEFAULT_MAX_PIXELS
+_max_bytes = DEFAULT_MAX_BYTES
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image is above the decoding limits."""
+
+def set_decode_limits(max_pixels=DEFAULT_MAX_PIXELS, max_bytes=DEFAULT_MAX_BYTES):
+    """Sets the limits applied whenever an image is decoded.
+
+    Applies to thumbnails, uploads and their worker processes, which are given the limits set
+    before they are started. Pillow's own decompression bomb check is raised when `max_pixels` is
+    above it.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.decoding import set_decode_limits
+
+        set_decode_limits(max_pixels=50_000_000, max_bytes=100 * 1024 * 1024)
+
+    Args:
+        max_pixels (int): An int() defining the maximum number of pixels of an image, default is twice Pillow's `MAX_IMAGE_PIXELS`.
+        max_bytes (int): An int() defining the maximum size of an image file in bytes, default is 512 MiB, None disables it.
+    """
+    global _max_pixels, _max_bytes
+    _max_pixels = max_pixels
+    _max_bytes = max_bytes
+    if Image.MAX_IMAGE_PIXELS is not None and max_pixels > 2 * Image.MAX_IMAGE_PIXELS:
+        Image.MAX_IMAGE_PIXELS = max_pixels
+
+def get_decode_limits():
+    """Returns the limits applied whenever an image is decoded.
+
+    Returns:
+        max_pixels (int): An int() of the maximum number of pixels of an image.
+        max_bytes (int): An int() of the maximum size of an image file in bytes, or None.
+    """
+    return _max_pixels, _max_bytes
+
+def check_decode_limits(width, height, num_of_bytes=None):
+    """Checks that an image is within the decoding limits.
+
+    Args:
+        width (int): An int() of the width of the image in pixels.
+        height (int): An int() of the height of the image in pixels.
+        num_of_bytes (int): An int() of the size of the image file in bytes, default is None to skip the file size check.
+
+    Raises:
+        ImageTooLargeError: When the file or the image is above the decoding limits.
+    """
+    if _max_bytes is not None and num_of_bytes is not None and num_of_bytes > _max_bytes:
+        raise ImageTooLargeError(f"The file is {num_of_bytes} bytes, the limit is {_max_bytes} bytes.")
+    if width * height > _max_pixels:
+        raise ImageTooLargeError(f"The image is {width}x{height} pixels, the limit is {_max_pixels} pixels.")
+
+def open_image(src):
+    """Opens an image after checking it is within the decoding limits.
+
+    Only the image header is read, the pixel data is decoded when the image is used.
+
+    Args:
+        src (str): A str() of the path to the image, or a readable and seekable binary file object.
+
+    Returns:
+        img (Image): The opened PIL Image(), the caller closes it.
+
+    Raises:
+        ImageTooLargeError: When the file or the image is above the decoding limits.
+    """
+    if _max_bytes is not None:
+        if hasattr(src, "read"):
+            position = src.tell()
+            num_of_bytes = src.seek(0, os.SEEK_END)
+            src.seek(position)
+        else:
+            num_of_bytes = os.stat(src).st_size
+        check_decode_limits(0, 0, num_of_bytes)
+    try:
+        img = Image.open(src)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    # Leaving the context only closes files opened by Pillow, not file objects passed in.
+    try:
+        check_decode_limits(img.width, img.height)
+    except ImageTooLargeError:
+        with img:
+            raise
+    return img
+
+def draft_image(img, size):
+    """Configures an image to be decoded at a reduced scale.
+
+    JPEG images are decoded at the smallest scale of 1/2, 1/4 or 1/8 which is still at least `size`,
+    other formats are decoded at full resolution and reduced afterwards by `Image.thumbnail`.
+
+    Args:
+        img (Image): An opened PIL Image() which hasn't been decoded yet.
+        size (tuple): A tuple() of the minimum width and height in pixels that is needed.
+    """
+    if img.format == "JPEG":
+        img.draft(img.mode, size)
+
+def decoded_bytes(img):
+    """Returns the memory used by an image once decoded.
+
+    Args:
+        img (Image): An opened PIL Image(), after draft_image() when it is used.
+
+    Returns:
+        num_of_bytes (int): An int() of the size of the decoded image in bytes.
+    """
+    return img.width * img.height * len(img.getbands())
+
+def estimate_decoded_bytes(src, size=None):
+    """Returns the memory needed to decode an image.
+
+    Only the image header is read.
+
+    Args:
+        src (str): A str() of the path to the image, or a readable and seekable binary file object.
+        size (tuple): A tuple() of the minimum width and height in pixels that is needed, default is None for the full resolution.
+
+    Returns:
+        num_of_bytes (int): An int() of the estimated size of the decoded image in bytes, 0 if it is not a supported image.
+    """
+    try:
+        with open_image(src) as img:
+            if size is not None:
+                draft_image(img, size)
+            return decoded_bytes(img)
+    except (OSError, ValueError, SyntaxError):
+        return 0
+
+@contextmanager
+def decode_image(src, size=None, memory_budget=None):
+    """Opens an image and reserves the memory needed to decode it.
+
+    The image is checked against the decoding limits, JPEG images are decoded at a reduced scale
+    when `size` is given and the memory the decoded image needs is reserved from the memory budget
+    of the process until the block ends, so decoding several large images at once waits instead of
+    exhausting the memory.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.decoding import decode_image
+
+        with decode_image("assets/landscape/pexels-analogicus-6958793.jpg", size=(300, 300)) as img:
+            img.thumbnail((300, 1200))
+
+    Args:
+        src (str): A str() of the path to the image, or a readable and seekable binary file object.
+        size (tuple): A tuple() of the minimum width and height in pixels that is needed, default is None for the full resolution.
+        memory_budget (MemoryBudget): The MemoryBudget() to reserve the memory from, default is None to use the budget of the process.
+
+    Raises:
+        ImageTooLargeError: When the file or the image is above the decoding limits.
+    """
+    if memory_budget is None:
+        memory_budget = get_memory_budget()
+    with open_image(src) as img:
+        if size is not None:
+            draft_image(img, size)
+        with memory_budget.reserve(decoded_bytes(img)):
+            yield img
+
+class MemoryBudget():
+    """Limits the memory used by work running at the same time.
+
+    Work reserves the memory it needs before it starts and releases it once it has finished, when
+    the budget is used up new work waits. A reservation larger than the whole budget is allowed once
+    nothing else is reserved so it can never wait forever.
+
+    Args:
+        max_bytes (int): An int() defining the number of bytes that can be reserved at once.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.reserved = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, num_of_bytes, timeout=None):
+        """Reserves memory, waiting until it is available.
+
+        Args:
+            num_of_bytes (int): An int() of the number of bytes to reserve.
+            timeout (float): A float() of the maximum number of seconds to wait, default is None to wait until it is available.
+
+        Returns:
+            acquired (bool): A bool() which is True when the memory was reserved.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.reserved == 0 or self.reserved + num_of_bytes <= self.max_bytes, timeout):
+                return False
+            self.reserved += num_of_bytes
+            return True
+
+    def release(self, num_of_bytes):
+        """Releases reserved memory.
+
+        Args:
+            num_of_bytes (int): An int() of the number of bytes to release.
+        """
+        with self._condition:
+            self.reserved -= num_of_bytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, num_of_bytes):
+        """Reserves memory for the duration of the block.
+
+        Args:
+            num_of_bytes (int): An int() of the number of bytes to reserve.
+        """
+        self.acquire(num_of_bytes)
+        try:
+            yield
+        finally:
+            self.release(num_of_bytes)
+
+_memory_budget = None
+_memory_budget_lock = threading.Lock()
+
+def get_memory_budget(max_bytes=1024 * 1024 * 1024):
+    """Returns the memory budget of the process for decoding images.
+
+    Shared by thumbnails, uploads and the upload worker processes they wait for.
+
+    Args:
+        max_bytes (int): An int() defining the number of bytes that can be reserved at once, default is 1 GiB. Only used when the budget is created.
+
+    Returns:
+        memory_budget (MemoryBudget): The shared MemoryBudget().
+    """
+    global _memory_budget
+    with _memory_budget_lock:
+        if _memory_budget is None:
+            _memory_budget = MemoryBudget(max_bytes)
+        return _memory_budget
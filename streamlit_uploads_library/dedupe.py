@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from streamlit_uploads_library.index import get_index
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+def hash_file(file, chunk_size=CHUNK_SIZE):
+    """Returns the content hash of a file object.
+
+    The file object is read in chunks and returned to the start afterwards.
+
+    Args:
+        file (file): A readable and seekable binary file object.
+        chunk_size (int): An int() defining the number of bytes read at a time, default is 1 MiB.
+
+    Returns:
+        digest (str): A str() containing the SHA-256 hex digest of the content.
+    """
+    hasher = hashlib.sha256()
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+class ContentHashes():
+    """Content hashes of the files in a directory.
+
+    Used to find whether a file with the same content already exists in a directory. Only existing
+    files with the same size as the new file are hashed, their hashes are kept for as long as their
+    modification time and size don't change. Uploads that were re-encoded before saving are
+    recorded under the hash of the uploaded content so uploading the same file again is detected,
+    the record is dropped once the saved file is changed or replaced.
+
+    Args:
+        directory (str): A str() of the path to the folder to search for duplicates, for example, "assets".
+    """
+    def __init__(self, directory):
+        self.index = get_index(directory)
+        self.directory = self.index.directory
+        self.uploads = dict()
+        self._hashes = dict()
+        self._by_size = (None, dict())
+        self._lock = threading.Lock()
+
+    def file_hash(self, entry):
+        """Returns the content hash of an indexed file.
+
+        Args:
+            entry (FileEntry): The FileEntry() of the file to hash.
+
+        Returns:
+            digest (str): A str() containing the SHA-256 hex digest of the file or None if it can't be read.
+        """
+        key = (entry.path, entry.mtime_ns, entry.size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            try:
+                with open(entry.path, "rb") as f:
+                    digest = hash_file(f)
+            except OSError as e:
+                logger.warning(e)
+                return None
+            self._hashes[key] = digest
+        return digest
+
+    def find(self, digest, size, refresh=True):
+        """Returns the path of an existing file with the given content.
+
+        Args:
+            digest (str): A str() containing the SHA-256 hex digest of the content.
+            size (int): An int() of the size of the content in bytes.
+            refresh (bool): A bool() to refresh the directory index first, default is True, set it to False while writing several files to the directory and refresh it once before.
+
+        Returns:
+            path (str): A str() of the path to the existing file or None if there is none.
+        """
+        with self._lock:
+            record = self.uploads.get(digest)
+            if record is not None:
+                path, mtime_ns, file_size = record
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    stat = None
+                if stat is not None and (stat.st_mtime_ns, stat.st_size) == (mtime_ns, file_size):
+                    return path
+                # The saved file was removed or overwritten, it no longer holds this content.
+                del self.uploads[digest]
+            if refresh:
+                self.index.refresh()
+            if self._by_size[0] != self.index.generation:
+                by_size = dict()
+                for entry in self.index.entries():
+                    # Partial files of uploads in progress or interrupted aren't saved files.
+                    if not entry.path.endswith(".part"):
+                        by_size.setdefault(entry.size, list()).append(entry)
+                self._by_size = (self.index.generation, by_size)
+            for entry in self._by_size[1].get(size, ()):
+                if self.file_hash(entry) == digest:
+                    return entry.path
+        return None
+
+    def add(self, digest, path):
+        """Records the content hash of an uploaded file.
+
+        The modification time and size of the saved file are recorded with it, so the record is only
+        trusted while the file is unchanged.
+
+        Args:
+            digest (str): A str() containing the SHA-256 hex digest of the uploaded content.
+            path (str): A str() of the path the upload was saved to.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning(e)
+            return
+        with self._lock:
+            self.uploads[digest] = (str(path), stat.st_mtime_ns, stat.st_size)
+
+_content_hashes = dict()
+_content_hashes_lock = threading.Lock()
+
+def get_content_hashes(directory):
+    """Returns the shared content hashes of a directory.
+
+    Args:
+        directory (str): A str() of the path to the folder.
+
+    Returns:
+        content_hashes (ContentHashes): The ContentHashes() of the directory.
+    """
+    directory = str(Path(directory).resolve())
+    with _content_hashes_lock:
+        content_hashes = _content_hashes.get(directory)
+        if content_hashes is None:
+            content_hashes = ContentHashes(directory)
+            _content_hashes[directory] = content_hashes
+        return content_hashes
@@ -0,0 +1,143 @@
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from streamlit_uploads_library.utils import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Files which are already compressed are stored as they are, compressing them again only costs time.
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".heic", ".heif")
+# Seconds an export is kept before it is deleted by the next export.
+EXPORT_MAX_AGE = 60 * 60
+# Largest archive sent by st.download_button, which reads the whole archive into memory.
+MAX_DOWNLOAD_BUTTON_BYTES = 32 * 1024 * 1024
+
+def archive_names(paths, base_dir=None):
+    """Returns the name of each file inside an archive.
+
+    Files are named by their path relative to `base_dir` so subfolders are kept, files outside of it
+    by their file name. A number is added to repeated names.
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the files.
+        base_dir (str): A str() of the path the names are relative to, default is None to use the file names.
+
+    Returns:
+        names (list): A list() of str() names using "/" as the separator, in the order of `paths`.
+    """
+    base_dir = None if base_dir is None else Path(os.path.abspath(base_dir))
+    names = list()
+    used = set()
+    for path in paths:
+        path = Path(os.path.abspath(path))
+        if base_dir is not None and base_dir in path.parents:
+            name = path.relative_to(base_dir).as_posix()
+        else:
+            name = path.name
+        stem, dot, suffix = name.rpartition(".")
+        if not dot:
+            stem, suffix = name, ""
+        copy_idx = 1
+        while name.lower() in used:
+            copy_idx += 1
+            name = f"{stem} ({copy_idx}){dot}{suffix}"
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+def write_zip(paths, dst, base_dir=None, chunk_size=CHUNK_SIZE):
+    """Writes a ZIP archive of files to a file object.
+
+    Each file is copied into the archive one chunk at a time, JPEG, PNG and other compressed images
+    are stored without compressing them again and other files are deflated, so the memory used
+    doesn't depend on the size of the files or of the archive. Files that can't be opened are
+    skipped.
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the files to add.
+        dst (file): A writable binary file object, the archive is written incrementally and a seekable one avoids writing a data descriptor after each file.
+        base_dir (str): A str() of the path the names inside the archive are relative to, default is None to use the file names.
+        chunk_size (int): An int() defining the number of bytes copied at a time, default is 1 MiB.
+
+    Returns:
+        num_of_files (int): An int() of the number of files added to the archive.
+    """
+    num_of_files = 0
+    with zipfile.ZipFile(dst, "w", allowZip64=True) as archive:
+        for path, name in zip(paths, archive_names(paths, base_dir)):
+            try:
+                src = open(path, "rb")
+                zip_info = zipfile.ZipInfo.from_file(path, name)
+            except OSError as e:
+                logger.warning(f"Unable to export {path}: {e}")
+                continue
+            with src:
+                zip_info.compress_type = zipfile.ZIP_STORED if Path(path).suffix.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                with archive.open(zip_info, "w") as entry:
+                    shutil.copyfileobj(src, entry, chunk_size)
+            num_of_files += 1
+    return num_of_files
+
+def prune_exports(export_dir, max_age=EXPORT_MAX_AGE):
+    """Deletes old exports.
+
+    Args:
+        export_dir (str): A str() of the path to the folder containing the exports.
+        max_age (int): An int() of the number of seconds an export is kept, default is 1 hour.
+    """
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(export_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.name.endswith(".zip") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+def export_zip(paths, base_dir=None, export_dir=None, name="export"):
+    """Exports files to a ZIP archive on disk.
+
+    The archive is written to a temporary file which is then renamed, so a partially written archive
+    is never served. Archives get an unguessable file name and exports older than EXPORT_MAX_AGE are
+    deleted first.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.export import export_zip
+
+        export_path, num_of_files = export_zip(["assets/mixed/a.jpg", "assets/mixed/b.jpg"], base_dir="assets")
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the files to export.
+        base_dir (str): A str() of the path the names inside the archive are relative to, default is None to use the file names.
+        export_dir (str): A str() of the path to the folder the archive is created in, default is None to use the package cache directory.
+        name (str): A str() used to start the file name of the archive, default is "export".
+
+    Returns:
+        export_path (Path): A Path() object pointing to the archive.
+        num_of_files (int): An int() of the number of files in the archive.
+    """
+    if export_dir is None:
+        export_dir = default_cache_dir() / "exports"
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    prune_exports(export_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=export_dir, prefix=f".{name}-", suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            num_of_files = write_zip(paths, f, base_dir)
+        os.chmod(tmp_path, 0o644)
+        export_path = export_dir / Path(tmp_path).name[1:]
+        os.replace(tmp_path, export_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return export_path, num_of_files
@@ -1,5 +1,15 @@
 import streamlit as st
+import html
+import logging
+import streamlit.components.v1 as components
+from pathlib import Path
 from streamlit_uploads_library.library import Library
+from streamlit_uploads_library.static import get_static_files
+
+logger = logging.getLogger(__name__)
+
+# Rows of the "masonry" layout whose missing thumbnails are created before it is displayed.
+MASONRY_SYNC_ROWS = 2
 
 class Gallery(Library):
     """Create a simple gallery out of streamlit widgets.
@@ -24,12 +34,141 @@ class Gallery(Library):
         number_of_columns (int): An int() defining the number of required columns, default is 5.
         show_details (bool): A bool() to show or hide the file and edit details, True shows them, default is False to hide them and create a gallery.
         uid (str): A str() containing a unique identifier allowing you to create multiple galleries on the same page containing the same images.
+        thumbnail_width (int): An int() defining the width in pixels of the thumbnails displayed in the gallery, default is 300, can be set to None to display the original images instead.
+        thumbnail_cache (ThumbnailCache): A ThumbnailCache() used to store the thumbnails, default is None to use the cache shared by all galleries and libraries.
+        max_rows (int): An int() defining the maximum number of rows displayed at once, default is None to display all images on a single page.
+        pagination (str): A str() defining how further rows are displayed when using `max_rows`, options are "pages" or "load_more", default is "pages".
+        watch_directory (bool): A bool() to watch the directory for changes so only the changed paths are refreshed, default is True, set it to False for network filesystems that don't report changes.
+        metrics (Metrics): A Metrics() used to record timings and counters for the gallery, default is None to disable instrumentation.
+        show_metrics (bool): A bool() to display the recorded timings and counters below the gallery, default is False.
+        serve_static (bool): A bool() to display the images by URL through streamlit's static file route instead of sending them through the streamlit server, requires `server.enableStaticServing`, default is False.
+        background_scan (bool): A bool() to scan a directory that has never been indexed in a background thread while displaying the images found so far, default is True.
+        sort_by (str): A str() defining the order of the files, options are "name", "modified", "size" or "dimensions", default is None to use the directory order.
+        sort_descending (bool): A bool() to reverse the order of the files, default is False.
+        file_filter (FileFilter): A FileFilter() used to only display matching files, default is None to display every file.
+        show_filters (bool): A bool() to display search, sort and filter controls above the gallery, default is False.
+        multi_select (bool): A bool() to display a checkbox on each image and controls to delete, move or rename the selected files at once, default is False.
+        layout (str): A str() defining how the images are displayed, "columns" creates streamlit columns and widgets for each image, "masonry" displays every image in a single lazy loading grid element, default is "columns". The "masonry" layout requires `serve_static` and can't be used with `show_details` or `multi_select`.
+        grid_height (int): An int() defining the height in pixels of the "masonry" layout, which scrolls when the images don't fit, default is 800.
+        show_export (bool): A bool() to display a button exporting the selected files, or every displayed file when none are selected, to a ZIP archive, default is False.
     """
-    def __init__(self, directory, file_extensions=(".png", ".jpg", ".jpeg"), image_alignment="center", number_of_columns=5, show_details=False, uid="gallery"):
+    def __init__(self, directory, file_extensions=(".png", ".jpg", ".jpeg"), image_alignment="center", number_of_columns=5, show_details=False, uid="gallery", thumbnail_width=300, thumbnail_cache=None, max_rows=None, pagination="pages", watch_directory=True, metrics=None, show_metrics=False, serve_static=False, background_scan=True, sort_by=None, sort_descending=False, file_filter=None, show_filters=False, multi_select=False, layout="columns", grid_height=800, show_export=False):
         self.directory = directory
         self.file_extensions = file_extensions
         self.image_alignment = image_alignment
         self.number_of_columns = number_of_columns
         self.show_details = show_details
         self.uid = uid
-        super(Gallery, self).__init__(self.directory, self.file_extensions, self.image_alignment, self.number_of_columns, self.show_details, self.uid)
\ No newline at end of file
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_cache = thumbnail_cache
+        self.max_rows = max_rows
+        self.pagination = pagination
+        self.watch_directory = watch_directory
+        self.metrics = metrics
+        self.show_metrics = show_metrics
+        self.serve_static = serve_static
+        self.background_scan = background_scan
+        self.sort_by = sort_by
+        self.sort_descending = sort_descending
+        self.file_filter = file_filter
+        self.show_filters = show_filters
+        self.multi_select = multi_select
+        self.layout = layout
+        self.grid_height = grid_height
+        self.show_export = show_export
+        super(Gallery, self).__init__(self.directory, self.file_extensions, self.image_alignment, self.number_of_columns, self.show_details, self.uid, self.thumbnail_width, self.thumbnail_cache, self.max_rows, self.pagination, self.watch_directory, self.metrics, self.show_metrics, self.serve_static, self.background_scan, self.sort_by, self.sort_descending, self.file_filter, self.show_filters, self.multi_select, show_export=self.show_export)
+
+    def create_grid(self, library_files, start_idx, number_of_columns, show_details, uid, thumbnail_width=300, serve_static=False, multi_select=False):
+        """Creates the grid of images.
+
+        Uses the "masonry" layout when it is selected and possible, otherwise the rows of columns 
+        created by the library.
+
+        Args:
+            library_files (list): A list() of str() paths to the files to display.
+            start_idx (int): An int() of the position of the first file in the gallery, used to create unique keys for fields within the details section.
+            number_of_columns (int): An int() defining the number of required columns.
+            show_details (bool): A bool() to show or hide the file and edit details.
+            uid (str): A str() containing a unique identifier allowing you to create multiple galleries on the same page containing the same images.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnails, None displays the original images.
+            serve_static (bool): A bool() to display the images through streamlit's static file route.
+            multi_select (bool): A bool() to display a checkbox on each image.
+        """
+        if self.layout == "masonry":
+            if not serve_static or thumbnail_width is None or show_details or multi_select:
+                logger.warning("The \"masonry\" layout requires `serve_static` and `thumbnail_width` and can't be used with `show_details` or `multi_select`, the \"columns\" layout is used instead.")
+            else:
+                self.create_masonry(library_files, number_of_columns, thumbnail_width)
+                return
+        super(Gallery, self).create_grid(library_files, start_idx, number_of_columns, show_details, uid, thumbnail_width, serve_static, multi_select)
+
+    def create_masonry(self, library_files, number_of_columns, thumbnail_width):
+        """Creates a masonry grid of every image in a single element.
+
+        The grid is a single HTML component instead of several streamlit elements per image. Images 
+        are laid out in CSS columns keeping their aspect ratio, their width and height are set from 
+        the stored metadata so the layout doesn't shift while they load. The browser only downloads 
+        the images scrolled into view and chooses between the thumbnail and a thumbnail of twice 
+        the width for high density displays.
+
+        Only thumbnails which are already cached are displayed, apart from the first MASONRY_SYNC_ROWS 
+        rows which are created straight away. Missing thumbnails are created by background threads 
+        and shown as placeholders of the same size until the next run.
+
+        Args:
+            library_files (list): A list() of str() paths to the files to display.
+            number_of_columns (int): An int() defining the number of columns.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnails.
+        """
+        static_files = get_static_files()
+        items = list()
+        num_of_queued = 0
+        num_to_create = MASONRY_SYNC_ROWS * number_of_columns
+        with self.metrics.timer("thumbnails"):
+            for img in library_files:
+                url = static_files.cached_thumbnail_url(img, thumbnail_width, metrics=self.metrics)
+                if url is None and num_to_create > 0:
+                    num_to_create -= 1
+                    url = static_files.thumbnail_url(img, thumbnail_width, metrics=self.metrics)
+                    if url is None:
+                        continue
+                elif url is None:
+                    if not static_files.queue_thumbnail(img, thumbnail_width):
+                        continue
+                    num_of_queued += 1
+                width, height = thumbnail_width, thumbnail_width
+                img_meta = self.fetch_metadata(img)
+                if img_meta is not None and img_meta.width > 0 and img_meta.height > 0:
+                    width, height = img_meta.width, img_meta.height
+                    # EXIF orientations 5 to 8 swap the axes of the displayed thumbnail.
+                    if img_meta.orientation in (5, 6, 7, 8):
+                        width, height = height, width
+                name = html.escape(Path(img).name)
+                if url is None:
+                    items.append(f'<div class="sul-pending" style="aspect-ratio: {width} / {height};" title="{name}"></div>')
+                    continue
+                srcset = f"{html.escape(url)} {thumbnail_width}w"
+                # A larger thumbnail is only available when the original is wider.
+                if img_meta is not None and width > thumbnail_width:
+                    url_2x = static_files.cached_thumbnail_url(img, thumbnail_width * 2, metrics=self.metrics)
+                    if url_2x is not None:
+                        srcset += f", {html.escape(url_2x)} {thumbnail_width * 2}w"
+                    else:
+                        static_files.queue_thumbnail(img, thumbnail_width * 2)
+                dimensions = f' width="{width}" height="{height}"' if img_meta is not None else ""
+                items.append(f'<img src="{html.escape(url)}" srcset="{srcset}" sizes="{100 // number_of_columns}vw" alt="{name}" title="{name}"{dimensions} loading="lazy" decoding="async">')
+        self.metrics.count("files_displayed", len(items))
+        components.html(
+                f"""<style>
+                body {{ margin: 0; }}
+                .sul-masonry {{ columns: {number_of_columns}; column-gap: 0.5rem; }}
+                .sul-masonry img {{ display: block; width: 100%; height: auto; margin-bottom: 0.5rem; break-inside: avoid; border-radius: 0.25rem; }}
+                .sul-masonry .sul-pending {{ width: 100%; margin-bottom: 0.5rem; break-inside: avoid; border-radius: 0.25rem; background: rgba(128, 128, 128, 0.2); }}
+                </style>
+                <div class="sul-masonry">{"".join(items)}</div>
+                """,
+                height=self.grid_height,
+                scrolling=True
+            )
+        if num_of_queued:
+            st.caption(f"Creating {num_of_queued} thumbnails, they are displayed on the next run.")
@@ -0,0 +1,383 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections import namedtuple
+from pathlib import Path
+from streamlit_uploads_library.shared import get_shared_cache
+from streamlit_uploads_library.utils import atomic_write, default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+FileEntry = namedtuple("FileEntry", ["path", "size", "mtime_ns", "extension"])
+FileEntry.__doc__ = """An indexed file, holding its full path, size in bytes, modification time in nanoseconds and lower case extension."""
+
+INDEX_VERSION = 1
+
+class FileIndex():
+    """A persistent index of the files within a directory tree.
+
+    The index stores the path, size, modification time and extension of every file below
+    `directory`. Refreshing the index only calls `stat` once per directory, a directory is only
+    listed again when its modification time has changed, so refreshing an unchanged tree does not
+    touch any files. Listing uses `os.scandir` so the file type and stat results come from the
+    directory entries instead of separate calls for each file. The index is saved to disk after
+    each change and loaded again by the next process.
+
+    Adding, removing or renaming a file changes the modification time of its directory, writing to
+    an existing file in place does not, those changes are picked up by the watcher instead. While
+    the directory is watched a refresh only lists the directories reported as changed and does not
+    walk the tree at all.
+
+    When a SharedCache() is used the index is stored in it instead and shared with other processes,
+    only one process lists a changed directory and the others load the result.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.index import FileIndex
+
+        index = FileIndex(directory="assets")
+        index.refresh()
+        images = index.files((".png", ".jpg", ".jpeg"))
+
+    Args:
+        directory (str): A str() of the path to the folder to index, for example, "assets".
+        index_path (str): A str() of the path to the file used to store the index, default is None to store it in the package cache directory.
+        shared_cache (SharedCache): A SharedCache() used to store the index instead of `index_path`, default is None.
+    """
+    def __init__(self, directory, index_path=None, shared_cache=None):
+        self.directory = str(Path(directory).resolve())
+        if index_path is None:
+            digest = hashlib.sha1(self.directory.encode("utf-8")).hexdigest()
+            index_path = default_cache_dir() / "index" / f"{digest}.pickle"
+        self.index_path = Path(index_path)
+        self.shared_cache = shared_cache
+        self.generation = 0
+        self.dirs = dict()
+        self.dirty = set()
+        self.watched = False
+        self._files_cache = dict()
+        self._changes = dict()
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """Loads the index from disk.
+
+        Loads a previously saved index, a missing, unreadable or outdated index is ignored and the
+        tree is listed again by the next refresh. When a shared cache is used only the directories 
+        changed by other processes since the last load are loaded.
+
+        Returns:
+            changed (bool): A bool() which is True when the index has changed.
+        """
+        if self.shared_cache is not None:
+            return self.load_shared()
+        try:
+            with open(self.index_path, "rb") as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable file index {self.index_path}: {e}")
+            return False
+        if saved.get("version") != INDEX_VERSION or saved.get("directory") != self.directory:
+            return False
+        with self._lock:
+            self.dirs = saved["dirs"]
+            self.generation = saved["generation"]
+            self._files_cache.clear()
+        return True
+
+    def load_shared(self):
+        """Loads the changes made to the index by other processes from the shared cache.
+
+        Returns:
+            changed (bool): A bool() which is True when the index has changed.
+        """
+        generation = self.shared_cache.index_generation(self.directory)
+        if generation is None or generation == self.generation:
+            return False
+        # Only later changes are loaded unless the shared index was recreated.
+        since = self.generation if self.dirs and self.generation < generation else 0
+        generation, changes = self.shared_cache.load_index(self.directory, since)
+        with self._lock:
+            if since == 0:
+                self.dirs = dict()
+            for dir_path, dir_record in changes.items():
+                if dir_record is None:
+                    self.dirs.pop(dir_path, None)
+                else:
+                    self.dirs[dir_path] = dir_record
+            self.generation = generation
+            self._files_cache.clear()
+        return True
+
+    def save(self):
+        """Saves the index to disk.
+
+        The index is written to a temporary file first and then renamed so other processes never
+        load a partially written index. When a shared cache is used only the changed directories are 
+        written to it.
+        """
+        if self.shared_cache is not None:
+            with self._lock:
+                changes = self._changes
+                self._changes = dict()
+            try:
+                self.shared_cache.save_index(self.directory, self.generation, changes)
+            except sqlite3.Error as e:
+                logger.warning(f"Unable to save file index {self.directory} to the shared cache: {e}")
+            return
+        with self._lock:
+            self._changes.clear()
+            saved = {"version": INDEX_VERSION, "directory": self.directory, "generation": self.generation, "dirs": self.dirs}
+            data = pickle.dumps(saved, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            atomic_write(self.index_path, data)
+        except OSError as e:
+            logger.warning(f"Unable to save file index {self.index_path}: {e}")
+
+    def scan_dir(self, dir_path, dir_mtime_ns):
+        """Lists a single directory.
+
+        Args:
+            dir_path (str): A str() of the path to the directory to list.
+            dir_mtime_ns (int): An int() of the modification time of the directory in nanoseconds.
+
+        Returns:
+            dir_record (tuple): A tuple() of the directory modification time, a dict() of filename to FileEntry() and a list() of subdirectory names.
+        """
+        files = dict()
+        subdirs = list()
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[entry.name] = FileEntry(entry.path, stat.st_size, stat.st_mtime_ns, os.path.splitext(entry.name)[1].lower())
+                    except OSError as e:
+                        logger.warning(e)
+        except OSError as e:
+            logger.warning(e)
+        return (dir_mtime_ns, files, subdirs)
+
+    def remove_dir(self, dir_path):
+        """Removes a directory and its subdirectories from the index.
+
+        Args:
+            dir_path (str): A str() of the path to the directory to remove.
+
+        Returns:
+            changed (bool): A bool() which is True when the directory was indexed.
+        """
+        dir_record = self.dirs.pop(dir_path, None)
+        if dir_record is None:
+            return False
+        self._changes[dir_path] = None
+        for name in dir_record[2]:
+            self.remove_dir(os.path.join(dir_path, name))
+        return True
+
+    def update_dirs(self, pending, recursive, force=(), progress=None):
+        """Updates the index for the given directories.
+
+        A directory is listed again when it is new, its modification time has changed or it is in
+        `force`, it only counts as changed when the listing differs from the indexed one. Subdirectories are visited when `recursive` is True, otherwise only new
+        subdirectories are listed.
+
+        Args:
+            pending (list): A list() of str() paths to the directories to update.
+            recursive (bool): A bool() used to visit every subdirectory of the updated directories.
+            force (set): A set() of str() paths to directories that are listed again regardless of their modification time.
+            progress (callable): A callable receiving the path, record and number of pending directories after each directory is visited, default is None.
+
+        Returns:
+            changed (bool): A bool() which is True when the index has changed.
+        """
+        changed = False
+        while pending:
+            dir_path = pending.pop()
+            try:
+                dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                changed |= self.remove_dir(dir_path)
+                continue
+            old_record = self.dirs.get(dir_path)
+            dir_record = old_record
+            if old_record is None or old_record[0] != dir_mtime_ns or dir_path in force:
+                dir_record = self.scan_dir(dir_path, dir_mtime_ns)
+                if dir_record != old_record:
+                    self.dirs[dir_path] = dir_record
+                    self._changes[dir_path] = dir_record
+                    changed = True
+                    if old_record is not None:
+                        for name in set(old_record[2]) - set(dir_record[2]):
+                            self.remove_dir(os.path.join(dir_path, name))
+            for name in reversed(dir_record[2]):
+                subdir_path = os.path.join(dir_path, name)
+                if recursive or subdir_path not in self.dirs:
+                    pending.append(subdir_path)
+            if progress is not None:
+                progress(dir_path, dir_record, len(pending))
+        return changed
+
+    def invalidate(self, path):
+        """Marks a path as changed.
+
+        The directory containing `path`, and `path` itself when it is an indexed directory, are
+        listed again by the next refresh.
+
+        Args:
+            path (str): A str() of the path to the changed file or directory.
+        """
+        path = str(path)
+        with self._lock:
+            if path in self.dirs:
+                self.dirty.add(path)
+            parent = os.path.dirname(path)
+            if parent in self.dirs:
+                self.dirty.add(parent)
+
+    def refresh(self, progress=None):
+        """Refreshes the index.
+
+        When the directory is watched only the directories marked as changed are listed again,
+        otherwise the indexed directories are walked and only directories whose modification time
+        has changed are listed again. Directories that no longer exist are removed from the index.
+
+        When a shared cache is used the changes made by other processes are loaded first while 
+        holding a lock shared by every process, so a change is only listed by one of them.
+
+        Args:
+            progress (callable): A callable receiving the path, record and number of pending directories after each directory is visited, default is None.
+
+        Returns:
+            changed (bool): A bool() which is True when the index has changed.
+        """
+        if self.shared_cache is None:
+            return self.update(progress)
+        if self.watched and self.dirs and not self.dirty and self.shared_cache.index_generation(self.directory) == self.generation:
+            return False
+        with self._lock, self.shared_cache.lock(self.directory):
+            loaded = self.load_shared()
+            return self.update(progress) or loaded
+
+    def update(self, progress=None):
+        """Updates the index from the directory tree, used by refresh().
+
+        Args:
+            progress (callable): A callable receiving the path, record and number of pending directories after each directory is visited, default is None.
+
+        Returns:
+            changed (bool): A bool() which is True when the index has changed.
+        """
+        with self._lock:
+            dirty = self.dirty
+            self.dirty = set()
+            if self.watched and self.dirs:
+                changed = self.update_dirs(sorted(dirty, reverse=True), recursive=False, force=dirty, progress=progress)
+            else:
+                changed = self.update_dirs([self.directory], recursive=True, force=dirty, progress=progress)
+            if changed:
+                self.generation += 1
+                self._files_cache.clear()
+                self.save()
+            return changed
+
+    def entries(self, file_extensions=None):
+        """Returns the indexed files.
+
+        Args:
+            file_extensions (tuple): A tuple() containing strings of the file extensions to include, default is None to include all files.
+
+        Returns:
+            entries (list): A list() of FileEntry() objects.
+        """
+        with self._lock:
+            key = (self.generation, file_extensions)
+            entries = self._files_cache.get(key)
+            if entries is None:
+                entries = list()
+                for dir_record in self.dirs.values():
+                    for name, entry in dir_record[1].items():
+                        if file_extensions is None or name.endswith(file_extensions):
+                            entries.append(entry)
+                self._files_cache[key] = entries
+            return entries
+
+    def files(self, file_extensions=None):
+        """Returns the paths of the indexed files.
+
+        Args:
+            file_extensions (tuple): A tuple() containing strings of the file extensions to include, default is None to include all files.
+
+        Returns:
+            all_files (list): A list() of str() paths.
+        """
+        return [entry.path for entry in self.entries(file_extensions)]
+
+_indexes = dict()
+_indexes_lock = threading.Lock()
+_listeners = list()
+
+def add_invalidation_listener(callback):
+    """Registers a function called whenever paths are invalidated.
+
+    Used to drop data derived from files, such as published copies, once the files are renamed,
+    moved, deleted or changed.
+
+    Args:
+        callback (callable): A function called with a list() of the str() absolute paths passed to invalidate_paths().
+    """
+    with _indexes_lock:
+        _listeners.append(callback)
+
+def invalidate_paths(paths):
+    """Marks paths as changed in every index containing them.
+
+    Used by the watcher and after the package itself renames, deletes or saves files, only the
+    indexes containing the paths are affected. The listeners registered with 
+    add_invalidation_listener() are then called with the paths.
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the changed files or directories.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+        listeners = list(_listeners)
+    paths = [os.path.abspath(path) for path in paths]
+    for path in paths:
+        for index in indexes:
+            if path == index.directory or path.startswith(index.directory + os.sep):
+                index.invalidate(path)
+    for callback in listeners:
+        try:
+            callback(paths)
+        except OSError as e:
+            logger.warning(f"Unable to process changed paths: {e}")
+
+def get_index(directory):
+    """Returns the shared index of a directory.
+
+    A single index is kept for each directory in the process so that every library displaying the
+    same directory shares it.
+
+    Args:
+        directory (str): A str() of the path to the folder to index.
+
+    Returns:
+        index (FileIndex): The FileIndex() of the directory.
+    """
+    directory = str(Path(directory).resolve())
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = FileIndex(directory, shared_cache=get_shared_cache())
+            _indexes[directory] = index
+        return index
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+_local = threading.local()
+_delta_hook_lock = threading.Lock()
+_delta_hook_installed = False
+
+def install_delta_hook():
+    """Installs the hook used to count emitted widgets.
+
+    The hook wraps the streamlit methods that send elements and blocks to the browser, it is only
+    installed once the first Metrics() is created and only counts elements emitted by the thread
+    that is currently counting widgets, so other sessions are never counted.
+    """
+    global _delta_hook_installed
+    from streamlit.delta_generator import DeltaGenerator
+    with _delta_hook_lock:
+        if _delta_hook_installed:
+            return
+        enqueue = DeltaGenerator._enqueue
+        block = DeltaGenerator._block
+        def counted_enqueue(dg, *args, **kwargs):
+            metrics = getattr(_local, "metrics", None)
+            if metrics is not None:
+                metrics.count("widgets_emitted")
+            return enqueue(dg, *args, **kwargs)
+        def counted_block(dg, *args, **kwargs):
+            metrics = getattr(_local, "metrics", None)
+            if metrics is not None:
+                metrics.count("widgets_emitted")
+            return block(dg, *args, **kwargs)
+        DeltaGenerator._enqueue = counted_enqueue
+        DeltaGenerator._block = counted_block
+        _delta_hook_installed = True
+
+class Metrics():
+    """Timings and counters for a library, gallery or file uploader.
+
+    Records the total time spent in each phase, for example "fetch_files" or "thumbnails", and
+    counters such as "files_scanned", "bytes_read", "thumbnail_cache_hits" and "widgets_emitted".
+    Pass an instance to the `metrics` argument of `Library`, `Gallery` or `UploadFiles` to enable
+    it, when no instance is passed a no-op implementation is used instead.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.instrumentation import Metrics
+        from streamlit_uploads_library.library import Library
+
+        metrics = Metrics(callback=lambda kind, name, value: print(kind, name, value))
+        library = Library(directory="assets", metrics=metrics)
+        print(metrics.snapshot())
+
+    Args:
+        callback (callable): A callable receiving `kind` ("timing" or "counter"), `name` and `value` for each recorded value, default is None.
+    """
+    enabled = True
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+        install_delta_hook()
+
+    @contextmanager
+    def timer(self, phase):
+        """Times a phase.
+
+        Args:
+            phase (str): A str() with the name of the phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[phase] += elapsed
+            if self.callback is not None:
+                self.callback("timing", phase, elapsed)
+
+    def count(self, counter, amount=1):
+        """Increases a counter.
+
+        Args:
+            counter (str): A str() with the name of the counter.
+            amount (int): An int() to increase the counter by, default is 1.
+        """
+        with self._lock:
+            self.counters[counter] += amount
+        if self.callback is not None:
+            self.callback("counter", counter, amount)
+
+    @contextmanager
+    def counting_widgets(self):
+        """Counts the widgets emitted by the current thread while active."""
+        previous = getattr(_local, "metrics", None)
+        _local.metrics = self
+        try:
+            yield
+        finally:
+            _local.metrics = previous
+
+    def snapshot(self):
+        """Returns the recorded values.
+
+        Returns:
+            snapshot (dict): A dict() with "timings" in seconds and "counters".
+        """
+        with self._lock:
+            return {"timings": dict(self.timings), "counters": dict(self.counters)}
+
+    def reset(self):
+        """Clears the recorded values."""
+        with self._lock:
+            self.timings.clear()
+            self.counters.clear()
+
+    def render(self, label="Performance"):
+        """Displays the recorded values.
+
+        Args:
+            label (str): A str() used as the label of the expander, default is "Performance".
+
+        Returns:
+            metrics_panel (st.expander): The expander containing the recorded values.
+        """
+        import streamlit as st
+        snapshot = self.snapshot()
+        metrics_panel = st.expander(label=label, expanded=False)
+        with metrics_panel:
+            timings_col, counters_col = st.columns(2)
+            with timings_col:
+                timings = sorted(snapshot["timings"].items())
+                st.table({"Phase": [phase for phase, _ in timings], "Time (ms)": [round(seconds * 1000, 2) for _, seconds in timings]})
+            with counters_col:
+                counters = sorted(snapshot["counters"].items())
+                st.table({"Counter": [counter for counter, _ in counters], "Value": [value for _, value in counters]})
+        return metrics_panel
+
+class NullMetrics():
+    """A no-op Metrics() used when instrumentation is disabled."""
+    enabled = False
+    _null_context = nullcontext()
+
+    def timer(self, phase):
+        return self._null_context
+
+    def count(self, counter, amount=1):
+        pass
+
+    def counting_widgets(self):
+        return self._null_context
+
+    def snapshot(self):
+        return {"timings": dict(), "counters": dict()}
+
+    def reset(self):
+        pass
+
+    def render(self, label="Performance"):
+        return None
+
+NULL_METRICS = NullMetrics()
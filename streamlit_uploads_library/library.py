@@ -1,11 +1,94 @@
 import streamlit as st
-import get_image_size
+import html
 import logging
+import os
+import re
+from collections import namedtuple
 from pathlib import Path
 from math import ceil
+from streamlit_uploads_library.export import MAX_DOWNLOAD_BUTTON_BYTES, export_zip
+from streamlit_uploads_library.index import get_index
+from streamlit_uploads_library.instrumentation import Metrics, NULL_METRICS
+from streamlit_uploads_library.metadata import get_metadata_store
+from streamlit_uploads_library.operations import apply_changes, delete_files, move_files, rename_files
+from streamlit_uploads_library.query import SORT_KEYS, FileFilter, FileTable
+from streamlit_uploads_library.scanning import start_scan
+from streamlit_uploads_library.similarity import DEFAULT_MAX_DISTANCE, get_perceptual_hashes, group_similar
+from streamlit_uploads_library.static import MAX_STATIC_FILE_BYTES, get_static_files, static_serving_enabled
 
 logger = logging.getLogger(__name__)
 
+LibraryData = namedtuple("LibraryData", ["files", "metadata", "table"])
+LibraryData.__doc__ = """The files of a library, a dict() mapping each file to its ImageMetadata() and the FileTable() used to sort and filter them, shared between sessions so it must not be modified."""
+
+# Every change to a directory creates a new entry, older entries are dropped once there are more.
+DATA_CACHE_ENTRIES = 32
+# Rows displayed while a directory is scanned in the background when `max_rows` isn't set.
+PREVIEW_ROWS = 4
+# Seconds between updates of the preview while a directory is scanned in the background.
+PREVIEW_INTERVAL = 0.1
+
+@st.cache_resource(show_spinner="Loading...", max_entries=DATA_CACHE_ENTRIES)
+def load_library_data(_library, directory, file_extensions, generation):
+    """Returns the files and metadata of a library.
+
+    This is the cached data layer of the library, the widgets are created on every run by 
+    Library.create() from the returned data. The cache is keyed on the directory, the file extensions 
+    and the generation of the directory index, which changes whenever a file below the directory is 
+    added, changed or removed, so an entry is never stale and the cache never has to be cleared.
+
+    Args:
+        _library (Library): The Library() used to fetch the files, excluded from the cache key.
+        directory (str): A str() of the path to the folder containing the library images, for example, "assets".
+        file_extensions (tuple): A tuple() containing strings of the file extensions to include in the library.
+        generation (int): An int() of the directory index generation.
+
+    Returns:
+        library_data (LibraryData): The LibraryData() of the directory.
+    """
+    _library.metrics.count("data_cache_misses")
+    files = tuple(_library.fetch_files(directory, file_extensions))
+    metadata_store = get_metadata_store(directory)
+    metadata = {img: metadata_store.get(img) for img in files}
+    entries = {entry.path: entry for entry in get_index(directory).entries(file_extensions)}
+    with _library.metrics.timer("table"):
+        table = FileTable(directory, files, entries, metadata)
+    return LibraryData(files, metadata, table)
+
+@st.cache_resource(show_spinner="Finding similar images...", max_entries=DATA_CACHE_ENTRIES)
+def load_similar_groups(_library, directory, file_extensions, generation, max_distance):
+    """Returns the groups of similar images of a library.
+
+    Cached in the same way as load_library_data(). The perceptual hashes of new or changed files 
+    are computed from their thumbnails and stored, then every file is grouped at once.
+
+    Args:
+        _library (Library): The Library() whose files are grouped, excluded from the cache key.
+        directory (str): A str() of the path to the folder containing the library images, for example, "assets".
+        file_extensions (tuple): A tuple() containing strings of the file extensions to include in the library.
+        generation (int): An int() of the directory index generation.
+        max_distance (int): An int() defining the number of bits of the perceptual hashes that may differ for images to be similar.
+
+    Returns:
+        labels (np.ndarray): A numpy int array of the group of each file in the FileTable(), the position of its first member, or -1 when it isn't similar to another file.
+    """
+    import numpy as np
+    from streamlit_uploads_library.thumbnails import get_thumbnail_cache
+    files = load_library_data(_library, directory, file_extensions, generation).files
+    entries = get_index(directory).entries(file_extensions)
+    thumbnail_cache = None
+    if _library.thumbnail_width is not None:
+        thumbnail_cache = _library.thumbnail_cache or get_thumbnail_cache()
+    perceptual_hashes = get_perceptual_hashes(directory)
+    with _library.metrics.timer("hashes"):
+        perceptual_hashes.update(entries, thumbnail_cache, _library.thumbnail_width)
+    hashes, known = perceptual_hashes.hashes(files)
+    positions = np.flatnonzero(known)
+    known_labels = group_similar(hashes[known], max_distance)
+    labels = np.full(len(files), -1)
+    labels[positions] = np.where(known_labels >= 0, positions[np.maximum(known_labels, 0)], -1)
+    return labels
+
 class Library():
     """Create a simple library out of streamlit widgets.
 
@@ -28,20 +111,77 @@ class Library():
         number_of_columns (int): An int() defining the number of required columns, default is 5.
         show_details (bool): A bool() to show or hide the file and edit details, False hides them, default is True to show them.
         uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        thumbnail_width (int): An int() defining the width in pixels of the thumbnails displayed in the library, default is 300, can be set to None to display the original images instead.
+        thumbnail_cache (ThumbnailCache): A ThumbnailCache() used to store the thumbnails, default is None to use the cache shared by all libraries.
+        max_rows (int): An int() defining the maximum number of rows displayed at once, default is None to display all files on a single page.
+        pagination (str): A str() defining how further rows are displayed when using `max_rows`, options are "pages" or "load_more", default is "pages".
+        watch_directory (bool): A bool() to watch the directory for changes so only the changed paths are refreshed, default is True, set it to False for network filesystems that don't report changes.
+        metrics (Metrics): A Metrics() used to record timings and counters for the library, default is None to disable instrumentation.
+        show_metrics (bool): A bool() to display the recorded timings and counters below the library, default is False.
+        serve_static (bool): A bool() to display the images by URL through streamlit's static file route instead of sending them through the streamlit server, requires `server.enableStaticServing`, default is False.
+        background_scan (bool): A bool() to scan a directory that has never been indexed in a background thread while displaying the images found so far, default is True.
+        sort_by (str): A str() defining the order of the files, options are "name", "modified", "size" or "dimensions", default is None to use the directory order.
+        sort_descending (bool): A bool() to reverse the order of the files, default is False.
+        file_filter (FileFilter): A FileFilter() used to only display matching files, default is None to display every file.
+        show_filters (bool): A bool() to display search, sort and filter controls above the library, default is False.
+        multi_select (bool): A bool() to display a checkbox on each image and controls to delete, move or rename the selected files at once, default is False.
+        show_duplicates (bool): A bool() to display a control grouping similar images, such as resized or re-exported copies, default is False. The images are hashed from their thumbnails the first time it is used.
+        duplicate_distance (int): An int() defining the number of bits of the 64 bit perceptual hashes that may differ for images to be considered similar, default is 4.
+        show_export (bool): A bool() to display a button exporting the selected files, or every displayed file when none are selected, to a ZIP archive, default is False.
     """
-    def __init__(self, directory, file_extensions=(".png", ".jpg", ".jpeg"), image_alignment="end", number_of_columns=5, show_details=True, uid="library"):
+    def __init__(self, directory, file_extensions=(".png", ".jpg", ".jpeg"), image_alignment="end", number_of_columns=5, show_details=True, uid="library", thumbnail_width=300, thumbnail_cache=None, max_rows=None, pagination="pages", watch_directory=True, metrics=None, show_metrics=False, serve_static=False, background_scan=True, sort_by=None, sort_descending=False, file_filter=None, show_filters=False, multi_select=False, show_duplicates=False, duplicate_distance=DEFAULT_MAX_DISTANCE, show_export=False):
         self.directory = Path(directory).resolve()
         self.file_extensions = file_extensions
         self.image_alignment = image_alignment
         self.number_of_columns = number_of_columns
         self.show_details = show_details
         self.uid = uid
-        self.root_container = self.create(directory=self.directory, file_extensions=self.file_extensions, image_alignment=self.image_alignment, number_of_columns=self.number_of_columns, show_details=self.show_details, uid=self.uid)
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_cache = thumbnail_cache
+        self.max_rows = max_rows
+        self.pagination = pagination
+        self.watch_directory = watch_directory
+        self.show_metrics = show_metrics
+        self.serve_static = serve_static
+        self.background_scan = background_scan
+        self.sort_by = sort_by
+        self.sort_descending = sort_descending
+        self.file_filter = file_filter
+        self.show_filters = show_filters
+        self.multi_select = multi_select
+        self.show_duplicates = show_duplicates
+        self.duplicate_distance = duplicate_distance
+        self.show_export = show_export
+        self.library_data = None
+        if serve_static and not static_serving_enabled():
+            logger.warning("`serve_static` requires `server.enableStaticServing = true`, images are sent through the streamlit server instead.")
+            self.serve_static = False
+        if metrics is None:
+            metrics = Metrics() if show_metrics else NULL_METRICS
+        self.metrics = metrics
+        self.page = st.session_state.get(f"{self.uid}_page", 1)
+        self.index = get_index(self.directory)
+        # A directory that has never been indexed is scanned in the background while the images 
+        # found so far are displayed, the library is then created from the complete index.
+        if self.background_scan and not self.index.dirs:
+            with self.metrics.timer("scan"), self.metrics.counting_widgets():
+                self.create_preview(start_scan(self.directory), self.file_extensions, self.number_of_columns, self.thumbnail_width, self.max_rows, self.serve_static)
+        if self.watch_directory:
+            from streamlit_uploads_library.watcher import watch
+            watch(self.directory)
+        with self.metrics.timer("scan"):
+            self.index.refresh()
+        with self.metrics.timer("create"), self.metrics.counting_widgets():
+            self.root_container = self.create(directory=self.directory, file_extensions=self.file_extensions, image_alignment=self.image_alignment, number_of_columns=self.number_of_columns, show_details=self.show_details, uid=self.uid, thumbnail_width=self.thumbnail_width, max_rows=self.max_rows, pagination=self.pagination, page=self.page, generation=self.index.generation, serve_static=self.serve_static, sort_by=self.sort_by, sort_descending=self.sort_descending, file_filter=self.file_filter, show_filters=self.show_filters, multi_select=self.multi_select, show_duplicates=self.show_duplicates, duplicate_distance=self.duplicate_distance, show_export=self.show_export)
+        if self.show_metrics:
+            self.metrics.render(label=f"Performance ({self.uid})")
 
     def fetch_files(self, directory, file_extensions):
         """Returns a list of all files.
 
-        Returns a list of files to be used by create_library().
+        Returns a list of files to be used by create_library(). The files are read from the shared 
+        index of the directory which is refreshed incrementally, an unchanged directory tree is not 
+        listed again. The metadata of new or changed files is read in bulk at the same time.
 
         Args:
             directory (str): A str() of the path to the folder containing the library images, for example, "assets".
@@ -51,16 +191,166 @@ class Library():
             all_files (list): A list of files.
             all_filenames (list): A list of filenames.
         """
-        all_files = list()
-        for item in directory.rglob("*"):
-            if item.is_file() and item.name.endswith(file_extensions):
-                all_files.append(str(item.resolve()))
-        return all_files
+        index = get_index(directory)
+        with self.metrics.timer("scan"):
+            index.refresh()
+            entries = index.entries(file_extensions)
+        self.metrics.count("files_scanned", len(entries))
+        metadata_store = get_metadata_store(directory)
+        generation = (index.generation, file_extensions)
+        if metadata_store.generation != generation:
+            with self.metrics.timer("metadata"):
+                metadata_store.prune(index.entries())
+                metadata_store.update(entries, generation)
+        return [entry.path for entry in entries]
+
+    def fetch_metadata(self, img):
+        """Returns the metadata of a file.
+
+        Returns the stored metadata of a file without reading it, the metadata is read in bulk by 
+        fetch_files() and cached together with the file list.
+
+        Args:
+            img (str): A str() of the path to the image file.
+
+        Returns:
+            img_meta (ImageMetadata): An ImageMetadata() with the width, height, format, orientation and size of the image, None if it is unknown.
+        """
+        if self.library_data is not None and img in self.library_data.metadata:
+            return self.library_data.metadata[img]
+        return get_metadata_store(self.directory).get(img)
+
+    def fetch_thumbnail(self, img, thumbnail_width):
+        """Returns the image to display for a file.
+
+        Returns the path to a thumbnail of the file, or the file itself when thumbnails are disabled.
+
+        Args:
+            img (str): A str() of the path to the image file.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnail, None returns the original image.
+
+        Returns:
+            display_img (str): A str() of the path to the image to display.
+        """
+        if thumbnail_width is None:
+            return img
+        if self.thumbnail_cache is None:
+            from streamlit_uploads_library.thumbnails import get_thumbnail_cache
+            self.thumbnail_cache = get_thumbnail_cache()
+        with self.metrics.timer("thumbnails"):
+            return self.thumbnail_cache.get(img, thumbnail_width, metrics=self.metrics)
+
+    def display_image(self, img, thumbnail_width, serve_static=False):
+        """Displays an image.
+
+        Displays a thumbnail of the file, or the file itself when thumbnails are disabled. When 
+        `serve_static` is True the image is displayed by URL from the app static folder so the 
+        browser downloads it directly and can cache it, images that can't be served statically are 
+        sent through the streamlit server as usual.
+
+        Args:
+            img (str): A str() of the path to the image file.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnail, None displays the original image.
+            serve_static (bool): A bool() to display the image through streamlit's static file route, default is False.
+        """
+        url = None
+        if serve_static:
+            static_files = get_static_files()
+            if thumbnail_width is None:
+                url = static_files.original_url(img)
+            else:
+                with self.metrics.timer("thumbnails"):
+                    url = static_files.thumbnail_url(img, thumbnail_width, metrics=self.metrics)
+        with self.metrics.timer("st_image"):
+            if url is not None:
+                st.markdown(f'<img src="{url}" alt="{html.escape(Path(img).name)}" style="width: 100%;" loading="lazy">', unsafe_allow_html=True)
+            else:
+                st.image(self.fetch_thumbnail(img, thumbnail_width), use_column_width="auto")
+
+    def create_preview(self, scan, file_extensions, number_of_columns, thumbnail_width=300, max_rows=None, serve_static=False):
+        """Create a preview of the library while its directory is scanned.
+
+        Displays the images as soon as they are found by a background scan, together with a 
+        progress bar, until the scan has finished. Only complete rows of images are displayed, up to 
+        `max_rows` or PREVIEW_ROWS rows, without any details as the details widgets are created by 
+        create() once the scan has finished. The preview is removed afterwards.
+
+        Args:
+            scan (BackgroundScan): The BackgroundScan() of the library directory.
+            file_extensions (tuple): A tuple() containing strings of the file extensions to include in the library.
+            number_of_columns (int): An int() defining the number of required columns.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnails displayed in the library, None displays the original images.
+            max_rows (int): An int() defining the maximum number of rows displayed at once, None displays PREVIEW_ROWS rows.
+            serve_static (bool): A bool() to display the images through streamlit's static file route.
+        """
+        max_files = (max_rows or PREVIEW_ROWS) * number_of_columns
+        file_extensions = tuple(file_extensions)
+        placeholder = st.empty()
+        with placeholder.container():
+            preview_grid = st.container()
+            progress_bar = st.progress(0.0, text="Scanning...")
+        num_of_entries = 0
+        preview_files = list()
+        displayed = 0
+        while True:
+            done = scan.wait(PREVIEW_INTERVAL)
+            new_entries = scan.entries(num_of_entries)
+            num_of_entries += len(new_entries)
+            preview_files.extend(entry.path for entry in new_entries if entry.path.endswith(file_extensions))
+            end_idx = min(len(preview_files), max_files)
+            if not done:
+                end_idx -= end_idx % number_of_columns
+            while displayed < end_idx:
+                with preview_grid:
+                    imgs_columns = st.columns(number_of_columns)
+                for col_idx, img in enumerate(preview_files[displayed:min(displayed + number_of_columns, end_idx)]):
+                    with imgs_columns[col_idx]:
+                        self.display_image(img, thumbnail_width, serve_static)
+                displayed = min(displayed + number_of_columns, end_idx)
+            if done:
+                break
+            progress_bar.progress(scan.progress(), text=f"Scanning... {len(preview_files)} files found.")
+        placeholder.empty()
+
+    def change_page(self, uid, page):
+        """Changes the displayed page.
+
+        Args:
+            uid (str): A str() containing the unique identifier of the library.
+            page (int): An int() of the page to display, or the number of pages to display when using "load_more".
+        """
+        st.session_state[f"{uid}_page"] = page
+
+    def create_page_controls(self, num_of_pages, page, pagination, uid):
+        """Create the page controls.
+
+        Creates "Previous" and "Next" buttons for the "pages" pagination mode or a "Load more" button 
+        for the "load_more" pagination mode.
+
+        Args:
+            num_of_pages (int): An int() of the total number of pages.
+            page (int): An int() of the current page, or the number of pages displayed when using "load_more".
+            pagination (str): A str() defining the pagination mode, options are "pages" or "load_more".
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        """
+        if pagination == "load_more":
+            if page < num_of_pages:
+                st.button(label="Load more", key=f"{uid}_load_more_button", use_container_width=True, on_click=self.change_page, args=(uid, page + 1))
+        else:
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                st.button(label="Previous", key=f"{uid}_previous_button", disabled=page <= 1, use_container_width=True, on_click=self.change_page, args=(uid, page - 1))
+            with page_col:
+                st.markdown(f"<p style='text-align: center;'>Page {page} of {num_of_pages}</p>", unsafe_allow_html=True)
+            with next_col:
+                st.button(label="Next", key=f"{uid}_next_button", disabled=page >= num_of_pages, use_container_width=True, on_click=self.change_page, args=(uid, page + 1))
 
     def update_file(self, old_file, new_file, del_check=False):
         """Update or delete the file.
         
-        Updates or deletes the file depending on the supplied options.
+        Updates or deletes the file depending on the supplied options. Only the changed paths are 
+        invalidated so other libraries and cached resources are not affected. Used as a button 
+        callback, the script reruns once afterwards.
 
         Args:
             old_file (Path): A Path() object pointing to the file to be changed.
@@ -68,17 +358,143 @@ class Library():
             del_check (bool): A bool() used to set the mode (update/delete) of the method.
         """
         if del_check == False:
-            try:
-                old_file.rename(old_file.with_stem(new_file))
-            except FileExistsError as e:
-                logger.warning(e)
+            result = apply_changes({old_file: old_file.with_stem(new_file)})
         else:
-            try:
-                old_file.unlink()
-            except FileNotFoundError as e:
-                logger.warning(e)
-        st.cache_resource.clear()
-        st.experimental_rerun()
+            result = apply_changes({old_file: None})
+        for error in result.failed.values():
+            logger.warning(error)
+
+    def toggle_selection(self, img, uid):
+        """Adds a file to or removes it from the selection.
+
+        Args:
+            img (str): A str() of the path to the image file.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        """
+        selection = st.session_state.setdefault(f"{uid}_selection", dict())
+        if img in selection:
+            del selection[img]
+        else:
+            selection[img] = None
+
+    def select_files(self, files, uid, selected=True):
+        """Adds files to or removes them from the selection.
+
+        Args:
+            files (list): A list() of str() paths to the files.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+            selected (bool): A bool() to add the files, False removes them, default is True.
+        """
+        selection = st.session_state.setdefault(f"{uid}_selection", dict())
+        for img in files:
+            if selected:
+                selection[img] = None
+            else:
+                selection.pop(img, None)
+
+    def apply_bulk_operation(self, operation, uid):
+        """Applies a bulk operation to the selected files.
+
+        Used as a button callback so every file is changed before the script reruns once, the files 
+        that were changed are removed from the selection and a summary is displayed after the rerun.
+
+        Args:
+            operation (str): A str() of the operation, options are "delete", "move" or "rename".
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        """
+        selection = st.session_state.setdefault(f"{uid}_selection", dict())
+        files = list(selection)
+        try:
+            if operation == "delete":
+                result = delete_files(files)
+            elif operation == "move":
+                folder = (self.directory / st.session_state.get(f"{uid}_bulk_folder", "").strip()).resolve()
+                if folder != self.directory and self.directory not in folder.parents:
+                    st.session_state[f"{uid}_bulk_message"] = "The folder must be inside the library."
+                    return
+                result = move_files(files, folder)
+            else:
+                try:
+                    result = rename_files(files, st.session_state.get(f"{uid}_bulk_pattern", ""))
+                except (ValueError, KeyError, IndexError) as e:
+                    st.session_state[f"{uid}_bulk_message"] = f"Invalid rename pattern: {e}"
+                    return
+        except OSError as e:
+            logger.warning(e)
+            st.session_state[f"{uid}_bulk_message"] = f"Unable to {operation} the files: {e.strerror or e}"
+            return
+        self.select_files(result.done, uid, selected=False)
+        message = f"{len(result.done)} file(s) changed."
+        if result.failed:
+            message += " " + " ".join(f"{Path(path).name}: {error}" for path, error in result.failed.items())
+        st.session_state[f"{uid}_bulk_message"] = message
+
+    def create_select(self, img, uid):
+        """Create the checkbox used to select a file.
+
+        Args:
+            img (str): A str() of the path to the image file.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        """
+        selected = img in st.session_state.get(f"{uid}_selection", ())
+        st.checkbox(label="Select", value=selected, key=f"{uid}_select_{img}", on_change=self.toggle_selection, args=(img, uid))
+
+    def create_bulk_controls(self, library_files, uid):
+        """Create the controls applied to the selected files.
+
+        Args:
+            library_files (list): A list() of str() paths to the files displayed on the current page.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        """
+        selection = st.session_state.setdefault(f"{uid}_selection", dict())
+        message = st.session_state.pop(f"{uid}_bulk_message", None)
+        if message is not None:
+            st.info(message)
+        count_col, page_col, clear_col = st.columns([2, 1, 1])
+        with count_col:
+            st.markdown(f"**{len(selection)} file(s) selected**")
+        with page_col:
+            st.button(label="Select page", key=f"{uid}_select_page", use_container_width=True, on_click=self.select_files, args=(library_files, uid))
+        with clear_col:
+            st.button(label="Clear selection", key=f"{uid}_clear_selection", use_container_width=True, disabled=not selection, on_click=selection.clear)
+        with st.expander(label="Selected files"):
+            move_col, rename_col, delete_col = st.columns(3)
+            with move_col:
+                st.text_input(label="Folder:", key=f"{uid}_bulk_folder", help="A folder inside the library, it is created if required, leave it empty for the library folder.")
+                st.button(label="Move", key=f"{uid}_bulk_move", use_container_width=True, disabled=not selection, on_click=self.apply_bulk_operation, args=("move", uid))
+            with rename_col:
+                st.text_input(label="Rename pattern:", key=f"{uid}_bulk_pattern", help="The new name without the extension, use {stem} for the current name and {index} for the position in the selection, for example holiday_{index:03d}.")
+                st.button(label="Rename", key=f"{uid}_bulk_rename", use_container_width=True, disabled=not selection, on_click=self.apply_bulk_operation, args=("rename", uid))
+            with delete_col:
+                del_check = st.checkbox(label="Delete ?", key=f"{uid}_bulk_del_check", help="Permanently delete the selected files from the library.")
+                st.button(label="Delete", key=f"{uid}_bulk_delete", type="secondary", use_container_width=True, disabled=not (selection and del_check), on_click=self.apply_bulk_operation, args=("delete", uid))
+
+    def create_styles(self, image_alignment, uid):
+        """Create the stylesheet for the library.
+
+        Emits a single stylesheet for the whole library instead of one per image. The stylesheet is 
+        scoped to the library by a marker element with a class derived from `uid`, so libraries on 
+        the same page can use different alignments.
+
+        Args:
+            image_alignment (str): A str() with the CSS keyword used to align the images and details columns.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+        """
+        marker = "sul-" + re.sub(r"[^A-Za-z0-9_-]", "-", uid)
+        st.markdown(
+                f"""<div class="{marker}"></div>
+                <style>
+                [data-testid="stVerticalBlock"]:has(> div.element-container .{marker}) > div > [data-testid="stHorizontalBlock"],
+                [data-testid="stVerticalBlock"]:has(> div.element-container .{marker}) > [data-testid="stHorizontalBlock"] {{
+                    align-items: {image_alignment};
+                }}
+                div.element-container:has(> div > div > .{marker}) {{
+                    display: none;
+                }}
+                </style>
+                """,
+                unsafe_allow_html=True
+            )
 
     def create_details(self, img, filename_idx, uid):
         """Create the details section for each displayed image.
@@ -91,29 +507,220 @@ class Library():
             filename_idx (int): An int() of the current "filename_idx" used to create a unique key for fields within the details section.
             uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
         """
-        try:
-            img_meta = get_image_size.get_image_metadata(img)
-            img_path = Path(img).resolve()
-            new_name = st.text_input(label="Name:", key=f"{img_path.stem}_{uid}_name_{filename_idx}", value=f"{img_path.stem}")
-            st.text_input(label="Type:", key=f"{img_path.stem}_{uid}_type_{filename_idx}", value=f"{img_path.suffix.strip('.').upper()}", disabled=True)
-            details_col1, details_col2 = st.columns(2)
-            del_check = st.checkbox(label="Delete ?", key=f"{img_path.stem}_{uid}_del_check_{filename_idx}", help="Permanently delete a file from the library.")
-            if del_check:
-                st.button(label="Delete", key=f"{img_path.stem}_{uid}_delete_button_{filename_idx}", type="secondary", use_container_width=True, on_click=self.update_file, args=(img_path, new_name, del_check))
+        img_meta = self.fetch_metadata(img)
+        # Files whose header couldn't be read can still be renamed or deleted, their dimensions are unknown.
+        known = img_meta is not None and img_meta.format is not None
+        img_path = Path(img)
+        new_name = st.text_input(label="Name:", key=f"{img_path.stem}_{uid}_name_{filename_idx}", value=f"{img_path.stem}")
+        st.text_input(label="Type:", key=f"{img_path.stem}_{uid}_type_{filename_idx}", value=f"{img_path.suffix.strip('.').upper()}", disabled=True)
+        details_col1, details_col2 = st.columns(2)
+        del_check = st.checkbox(label="Delete ?", key=f"{img_path.stem}_{uid}_del_check_{filename_idx}", help="Permanently delete a file from the library.")
+        if del_check:
+            st.button(label="Delete", key=f"{img_path.stem}_{uid}_delete_button_{filename_idx}", type="secondary", use_container_width=True, on_click=self.update_file, args=(img_path, new_name, del_check))
+        else:
+            st.button(label="Update", key=f"{img_path.stem}_{uid}_submit_button_{filename_idx}", type="primary", use_container_width=True, on_click=self.update_file, args=(img_path, new_name, del_check))
+        with details_col1:
+            st.text_input(label="Width:", key=f"{img_path.stem}_{uid}_width_{filename_idx}", value=f"{img_meta.width}" if known else "Unknown", disabled=True)
+        with details_col2:
+            st.text_input(label="Height:", key=f"{img_path.stem}_{uid}_height_{filename_idx}", value=f"{img_meta.height}" if known else "Unknown", disabled=True)
+        # Only thumbnails are sent to the browser by default, the original is sent on request.
+        if known and self.thumbnail_width is not None:
+            if st.checkbox(label="Show original", key=f"{img_path.stem}_{uid}_original_{filename_idx}"):
+                self.display_image(img, None, self.serve_static)
+
+    def create_filters(self, table, file_filter, sort_by, sort_descending, uid):
+        """Create the search, sort and filter controls.
+
+        The controls start with the values passed to the library and return to the first page 
+        whenever they are changed.
+
+        Args:
+            table (FileTable): The FileTable() of the library, used for the list of subfolders.
+            file_filter (FileFilter): The FileFilter() passed to the library, None for no filter.
+            sort_by (str): A str() of the sort key passed to the library, None for the directory order.
+            sort_descending (bool): A bool() to reverse the order of the files.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+
+        Returns:
+            file_filter (FileFilter): The FileFilter() chosen with the controls.
+            sort_by (str): A str() of the chosen sort key or None.
+            sort_descending (bool): A bool() which is True when the order is reversed.
+        """
+        if file_filter is None:
+            file_filter = FileFilter()
+        reset_page = dict(on_change=self.change_page, args=(uid, 1))
+        sort_options = [None, *SORT_KEYS]
+        folder_options = ["", *table.folders]
+        search_col, folder_col, sort_col, order_col = st.columns([3, 2, 2, 1])
+        with search_col:
+            search = st.text_input(label="Search:", value=file_filter.search or "", key=f"{uid}_search", **reset_page)
+        with folder_col:
+            subfolder = st.selectbox(label="Folder:", options=folder_options, index=folder_options.index(file_filter.subfolder) if file_filter.subfolder in folder_options else 0, format_func=lambda folder: folder or "All", key=f"{uid}_subfolder", **reset_page)
+        with sort_col:
+            sort_by = st.selectbox(label="Sort by:", options=sort_options, index=sort_options.index(sort_by), format_func=lambda key: "Default" if key is None else key.capitalize(), key=f"{uid}_sort_by", **reset_page)
+        with order_col:
+            sort_descending = st.checkbox(label="Descending", value=sort_descending, key=f"{uid}_sort_descending", **reset_page)
+        with st.expander(label="More filters", expanded=False):
+            date_col, width_col, height_col = st.columns(3)
+            with date_col:
+                dates = [date for date in (file_filter.modified_after, file_filter.modified_before) if date is not None]
+                modified = st.date_input(label="Modified between:", value=dates, key=f"{uid}_modified", **reset_page)
+            # A minimum or maximum of 0 disables the filter.
+            with width_col:
+                min_width = st.number_input(label="Min width:", min_value=0, value=file_filter.min_width or 0, step=1, key=f"{uid}_min_width", **reset_page)
+                max_width = st.number_input(label="Max width:", min_value=0, value=file_filter.max_width or 0, step=1, key=f"{uid}_max_width", **reset_page)
+            with height_col:
+                min_height = st.number_input(label="Min height:", min_value=0, value=file_filter.min_height or 0, step=1, key=f"{uid}_min_height", **reset_page)
+                max_height = st.number_input(label="Max height:", min_value=0, value=file_filter.max_height or 0, step=1, key=f"{uid}_max_height", **reset_page)
+        modified = list(modified) if isinstance(modified, (list, tuple)) else [modified]
+        file_filter = FileFilter(
+            search=search or None,
+            subfolder=subfolder or None,
+            modified_after=modified[0] if len(modified) > 0 else None,
+            modified_before=modified[1] if len(modified) > 1 else None,
+            min_width=min_width or None,
+            max_width=max_width or None,
+            min_height=min_height or None,
+            max_height=max_height or None,
+        )
+        return file_filter, sort_by, sort_descending
+
+    def create_duplicate_controls(self, file_order, directory, file_extensions, generation, duplicate_distance, uid):
+        """Create the control grouping similar images.
+
+        When it is checked only the files that are similar to another file are displayed, the files 
+        of each group next to each other and the groups in the order of their first file.
+
+        Args:
+            file_order (np.ndarray): A numpy int array of the positions of the files to display, as returned by FileTable.select().
+            directory (str): A str() of the path to the folder containing the library images.
+            file_extensions (tuple): A tuple() containing strings of the file extensions to include in the library.
+            generation (int): An int() of the directory index generation.
+            duplicate_distance (int): An int() defining the number of bits of the perceptual hashes that may differ for images to be considered similar.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+
+        Returns:
+            file_order (np.ndarray): A numpy int array of the positions of the files to display.
+        """
+        if not st.checkbox(label="Group similar images", key=f"{uid}_group_similar", on_change=self.change_page, args=(uid, 1)):
+            return file_order
+        import numpy as np
+        labels = load_similar_groups(self, str(directory), tuple(file_extensions), generation, duplicate_distance)
+        file_order = file_order[labels[file_order] >= 0]
+        order_labels = labels[file_order]
+        group_labels, first_idx = np.unique(order_labels, return_index=True)
+        file_order = file_order[np.argsort(first_idx[np.searchsorted(group_labels, order_labels)], kind="stable")]
+        st.caption(f"{len(file_order)} similar images in {len(group_labels)} groups.")
+        return file_order
+
+    def create_export_controls(self, file_table, file_order, uid, serve_static=False, multi_select=False):
+        """Create the controls exporting files to a ZIP archive.
+
+        The selected files are exported, or every file matching the filters when none are selected. 
+        The archive is written to disk one file at a time, with `serve_static` it is downloaded from 
+        the static file route which streams it, up to streamlit's static file limit. Otherwise it is 
+        sent by a download button, which holds it in memory, so only archives up to 
+        MAX_DOWNLOAD_BUTTON_BYTES are offered and the archive is deleted once it has been downloaded 
+        instead of being sent again on every run. Larger exports are refused.
+
+        Args:
+            file_table (FileTable): The FileTable() of the library.
+            file_order (np.ndarray): A numpy int array of the positions of the displayed files, as returned by FileTable.select().
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+            serve_static (bool): A bool() to download the archive through streamlit's static file route.
+            multi_select (bool): A bool() to export the selected files when there are any.
+        """
+        selection = st.session_state.get(f"{uid}_selection") if multi_select else None
+        num_of_files = len(selection) if selection else len(file_order)
+        download_name = f"{self.directory.name}.zip"
+        max_bytes = MAX_STATIC_FILE_BYTES if serve_static else MAX_DOWNLOAD_BUTTON_BYTES
+        limit = f"exports are limited to {max_bytes / (1024 * 1024):.0f} MiB{'' if serve_static else ' without serve_static'}, select fewer files."
+        export_col, download_col = st.columns([1, 3])
+        with export_col:
+            export = st.button(label=f"Export {num_of_files} file(s)", key=f"{uid}_export", use_container_width=True, disabled=not num_of_files)
+        if export:
+            previous_path = st.session_state.pop(f"{uid}_export_path", None)
+            if previous_path is not None:
+                Path(previous_path).unlink(missing_ok=True)
+            if selection:
+                files = list(selection)
+                total_bytes = sum(os.path.getsize(path) for path in files if os.path.exists(path))
+            else:
+                files = file_table.paths(file_order)
+                total_bytes = int(file_table.size[file_order].sum())
+            # Images are stored without being compressed again, so the archive is about as large as the files.
+            if total_bytes > max_bytes:
+                with download_col:
+                    st.warning(f"The files are {total_bytes / (1024 * 1024):.1f} MiB, {limit}")
+                return
+            export_dir = get_static_files().exports_dir if serve_static else None
+            with st.spinner(f"Exporting {len(files)} file(s)..."):
+                with self.metrics.timer("export"):
+                    export_path, _ = export_zip(files, self.directory, export_dir, name=self.directory.name)
+            st.session_state[f"{uid}_export_path"] = str(export_path)
+        export_path = st.session_state.get(f"{uid}_export_path")
+        if export_path is None or not Path(export_path).exists():
+            return
+        if not serve_static and st.session_state.get(f"{uid}_download"):
+            # The archive was downloaded, it isn't displayed again so streamlit releases it.
+            Path(export_path).unlink(missing_ok=True)
+            del st.session_state[f"{uid}_export_path"]
+            return
+        size = Path(export_path).stat().st_size
+        with download_col:
+            if size > max_bytes:
+                st.warning(f"The archive is {size / (1024 * 1024):.1f} MiB, {limit}")
+                Path(export_path).unlink(missing_ok=True)
+                del st.session_state[f"{uid}_export_path"]
+            elif serve_static:
+                url = get_static_files().url_for(export_path)
+                st.markdown(f'<a href="{html.escape(url)}" download="{html.escape(download_name)}">Download {html.escape(download_name)}</a> ({size / (1024 * 1024):.1f} MiB)', unsafe_allow_html=True)
             else:
-                st.button(label="Update", key=f"{img_path.stem}_{uid}_submit_button_{filename_idx}", type="primary", use_container_width=True, on_click=self.update_file, args=(img_path, new_name, del_check))
-            with details_col1:
-                st.text_input(label="Width:", key=f"{img_path.stem}_{uid}_width_{filename_idx}", value=f"{img_meta.width}", disabled=True)
-            with details_col2:
-                st.text_input(label="Height:", key=f"{img_path.stem}_{uid}_height_{filename_idx}", value=f"{img_meta.height}", disabled=True)
-        except get_image_size.UnknownImageFormat:
-            width, height = -1, -1
-
-    @st.cache_resource(experimental_allow_widgets=True, show_spinner="Loading...")
-    def create(_self, directory, file_extensions, image_alignment, number_of_columns, show_details, uid):
+                with open(export_path, "rb") as f:
+                    st.download_button(label=f"Download {download_name} ({size / (1024 * 1024):.1f} MiB)", data=f, file_name=download_name, mime="application/zip", key=f"{uid}_download")
+
+    def create_grid(self, library_files, start_idx, number_of_columns, show_details, uid, thumbnail_width=300, serve_static=False, multi_select=False):
+        """Creates the rows of images.
+
+        Can be overridden to display the images with a different layout.
+
+        Args:
+            library_files (list): A list() of str() paths to the files to display.
+            start_idx (int): An int() of the position of the first file in the library, used to create unique keys for fields within the details section.
+            number_of_columns (int): An int() defining the number of required columns.
+            show_details (bool): A bool() to show or hide the file and edit details.
+            uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnails, None displays the original images.
+            serve_static (bool): A bool() to display the images through streamlit's static file route.
+            multi_select (bool): A bool() to display a checkbox on each image.
+        """
+        # Work out the number of rows required by dividing the number of files to display by the 
+        # number of columns and rounding up using `math.ceil`.
+        num_of_rows_req = ceil(len(library_files) / number_of_columns)
+        filename_idx = start_idx
+        # For each row we create a separate set of columns (st.columns) for images, details and 
+        # buttons to keep them in the correct columns, the columns are created directly inside the 
+        # root container to keep the number of elements sent to the browser low.
+        for idx in range(num_of_rows_req):
+            imgs_columns = st.columns(number_of_columns)
+            # Since we are keeping track of the filename index we can use it to slice the 
+            # `library_files` list at the correct points for each row.
+            for col_idx, img in enumerate(library_files[idx * number_of_columns:(idx + 1) * number_of_columns]):
+                with imgs_columns[col_idx]:
+                    self.display_image(img, thumbnail_width, serve_static)
+                    self.metrics.count("files_displayed")
+                    if multi_select:
+                        self.create_select(img, uid)
+                    if show_details == True:
+                        with self.metrics.timer("details"):
+                            self.create_details(img, filename_idx, uid)
+                filename_idx += 1
+
+    def create(self, directory, file_extensions, image_alignment, number_of_columns, show_details, uid, thumbnail_width=300, max_rows=None, pagination="pages", page=1, generation=None, serve_static=False, sort_by=None, sort_descending=False, file_filter=None, show_filters=False, multi_select=False, show_duplicates=False, duplicate_distance=DEFAULT_MAX_DISTANCE, show_export=False):
         """Creates a simple library or gallery with columns.
 
-        Creates a library or gallery using columns out of streamlit widgets.
+        Creates a library or gallery using columns out of streamlit widgets. The widgets are created 
+        on every run, only the file list and metadata are cached by load_library_data().
 
         Args:
             directory (str): A str() of the path to the folder containing the library images, for example, "assets".
@@ -122,6 +729,20 @@ class Library():
             number_of_columns (int): An int() defining the number of required columns, default is 5.
             show_details (bool): A bool() to show or hide the file and edit details, False hides them, default is True to show them.
             uid (str): A str() containing a unique identifier allowing you to create multiple libraries on the same page containing the same images.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnails displayed in the library, None displays the original images.
+            max_rows (int): An int() defining the maximum number of rows displayed at once, None displays all files on a single page.
+            pagination (str): A str() defining how further rows are displayed when using `max_rows`, options are "pages" or "load_more".
+            page (int): An int() of the page to display, or the number of pages to display when using "load_more".
+            generation (int): An int() of the directory index generation used as the cache key of the file list and metadata, default is None to use the current generation.
+            serve_static (bool): A bool() to display the images through streamlit's static file route.
+            sort_by (str): A str() defining the order of the files, options are "name", "modified", "size" or "dimensions", None uses the directory order.
+            sort_descending (bool): A bool() to reverse the order of the files.
+            file_filter (FileFilter): A FileFilter() used to only display matching files, None displays every file.
+            show_filters (bool): A bool() to display search, sort and filter controls above the library.
+            multi_select (bool): A bool() to display a checkbox on each image and controls to change the selected files at once.
+            show_duplicates (bool): A bool() to display a control grouping similar images.
+            duplicate_distance (int): An int() defining the number of bits of the perceptual hashes that may differ for images to be considered similar.
+            show_export (bool): A bool() to display a button exporting the selected or displayed files to a ZIP archive.
         
         Returns:
             root_container (st.container): A streamlit widget containing the library.
@@ -130,54 +751,48 @@ class Library():
         with root_container:
             # To be able to display the images, details and buttons all in one row and aligned 
             # correctly so that images of different sizes don't affect the alignment of the details 
-            # and buttons we need do some minor maths and keep track of multiple index values. 
-            # First we instantiate some defaults.
-            col_idx = 0
+            # and buttons we need do some minor maths and keep track of the filename index. The 
+            # alignment of every row is set by a single stylesheet scoped to this library.
+            self.create_styles(image_alignment, uid)
             filename_idx = 0
-            max_idx = number_of_columns-1
-            # Get the file list and filename list, work out the total number of files from the 
-            # length of the file list.
-            library_files = _self.fetch_files(directory, file_extensions)
-            num_of_files = len(library_files)
-            # Work out the number of rows required by dividing the number of files by the number of 
-            # columns and rounding up using `math.ceil`.
-            num_of_rows_req = ceil(num_of_files / number_of_columns)
-            # Create the required number of rows (st.container).
-            library_rows = list()
-            library_rows_idx = 0
-            for i in range(num_of_rows_req):
-                library_rows.append(st.container())
-            # For each library row we need to create separate rows (st.container) for images, 
-            # and rows (st.expander) for details and buttons to keep them in the correct columns.
-            for idx in range(num_of_rows_req):
-                with library_rows[library_rows_idx]:
-                    imgs_columns = list(st.columns(number_of_columns))
-                # Since we are keeping track of the column and filename indexes we can use 
-                # those to slice the `library_files` list at the correct points for each row 
-                # and then increase or reset the indexes as required.
-                for img in library_files[filename_idx:(filename_idx + number_of_columns)]:
-                    with imgs_columns[col_idx]:
-                        st.image(img, use_column_width="auto")
-                        st.write(
-                                f"""<style>
-                                [data-testid="stHorizontalBlock"] {{
-                                    align-items: {image_alignment};
-                                }}
-                                </style>
-                                """,
-                                unsafe_allow_html=True
-                            )
-                        if show_details == True:
-                            _self.create_details(img, filename_idx, uid)
-                    # Keeps track of the current column, if we reach the `max_idx` we reset it 
-                    # to 0 and increase the row index. This combined with the slicing should 
-                    # ensure all images, details and buttons are in the correct columns.
-                    if col_idx < max_idx:
-                        col_idx += 1
-                    else:
-                        col_idx = 0
-                        library_rows_idx += 1
-                    filename_idx += 1
+            # Get the file table from the cached data layer, then sort and filter it. Only the 
+            # positions of the matching files are returned, work out the total number of files 
+            # from their length.
+            if generation is None:
+                generation = get_index(directory).generation
+            self.library_data = load_library_data(self, str(directory), tuple(file_extensions), generation)
+            file_table = self.library_data.table
+            if show_filters:
+                file_filter, sort_by, sort_descending = self.create_filters(file_table, file_filter, sort_by, sort_descending, uid)
+            with self.metrics.timer("query"):
+                file_order = file_table.select(file_filter, sort_by, sort_descending)
+            if show_duplicates:
+                file_order = self.create_duplicate_controls(file_order, directory, file_extensions, generation, duplicate_distance, uid)
+            if show_export:
+                self.create_export_controls(file_table, file_order, uid, serve_static, multi_select)
+            bulk_controls = st.container() if multi_select else None
+            num_of_files = len(file_order)
+            # When `max_rows` is set only a slice of the files is displayed, work out the start 
+            # and end of the slice from the page size. Nothing outside of the slice is read or 
+            # displayed.
+            if max_rows is None:
+                num_of_pages = 1
+                end_idx = num_of_files
+            else:
+                page_size = max_rows * number_of_columns
+                num_of_pages = max(ceil(num_of_files / page_size), 1)
+                page = min(max(page, 1), num_of_pages)
+                end_idx = min(page * page_size, num_of_files)
+                if pagination != "load_more":
+                    filename_idx = (page - 1) * page_size
+            start_idx = filename_idx
+            library_files = file_table.paths(file_order[start_idx:end_idx])
+            if multi_select:
+                with bulk_controls:
+                    self.create_bulk_controls(library_files, uid)
+            self.create_grid(library_files, start_idx, number_of_columns, show_details, uid, thumbnail_width, serve_static, multi_select)
+            if num_of_pages > 1:
+                self.create_page_controls(num_of_pages, page, pagination, uid)
         return root_container
 
 # Below is an example of using class inheritance to override the default file details section.
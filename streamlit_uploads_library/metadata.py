@@ -0,0 +1,292 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from streamlit_uploads_library.probe import probe
+from streamlit_uploads_library.shared import get_shared_cache
+from streamlit_uploads_library.utils import atomic_write, default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+ImageMetadata = namedtuple("ImageMetadata", ["width", "height", "format", "orientation", "size"])
+ImageMetadata.__doc__ = """The metadata of an image, width and height are -1 and format is None when the format is unknown."""
+
+METADATA_VERSION = 2
+
+def read_metadata(path, size):
+    """Reads the metadata of an image.
+
+    Only the image header is read, the pixel data is never decoded. Common formats are read by
+    probe(), Pillow is only used for the formats it doesn't recognise.
+
+    Args:
+        path (str): A str() of the path to the image.
+        size (int): An int() of the size of the image in bytes.
+
+    Returns:
+        metadata (ImageMetadata): The ImageMetadata() of the image.
+    """
+    try:
+        result = probe(path)
+        if result is not None:
+            return ImageMetadata(result.width, result.height, result.format, result.orientation, size)
+    except (OSError, ValueError) as e:
+        logger.debug(f"Unable to read the metadata of {path}: {e}")
+        return ImageMetadata(-1, -1, None, 1, size)
+    # Pillow is only imported for the formats probe() doesn't recognise.
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return ImageMetadata(img.width, img.height, img.format, img.getexif().get(0x0112, 1), size)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        logger.debug(f"Unable to read the metadata of {path}: {e}")
+        return ImageMetadata(-1, -1, None, 1, size)
+
+class MetadataStore():
+    """A persistent store of image metadata.
+
+    The store holds the width, height, format, EXIF orientation and size of each image keyed on its
+    path, modification time and size. Images are read in bulk by a thread pool when the directory
+    index changes so displaying the metadata never reads a file. When a SharedCache() is used the 
+    metadata is stored in it instead and each image is only read by one process.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.index import get_index
+        from streamlit_uploads_library.metadata import MetadataStore
+
+        index = get_index("assets")
+        index.refresh()
+        store = MetadataStore(directory="assets")
+        store.update(index.entries())
+        width = store.get(index.files()[0]).width
+
+    Args:
+        directory (str): A str() of the path to the folder containing the images, for example, "assets".
+        store_path (str): A str() of the path to the file used to store the metadata, default is None to store it in the package cache directory.
+        max_workers (int): An int() defining the number of threads used to read images, default is 8.
+        shared_cache (SharedCache): A SharedCache() used to store the metadata instead of `store_path`, default is None.
+    """
+    def __init__(self, directory, store_path=None, max_workers=8, shared_cache=None):
+        self.directory = str(Path(directory).resolve())
+        if store_path is None:
+            digest = hashlib.sha1(self.directory.encode("utf-8")).hexdigest()
+            store_path = default_cache_dir() / "metadata" / f"{digest}.pickle"
+        self.store_path = Path(store_path)
+        self.max_workers = max_workers
+        self.shared_cache = shared_cache
+        self.generation = None
+        self.records = dict()
+        self._changed = set()
+        self._removed = set()
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Loads the store from disk.
+
+        Loads previously saved metadata, a missing, unreadable or outdated store is ignored.
+        """
+        if self.shared_cache is not None:
+            records = self.shared_cache.load_metadata(self.directory)
+            with self._lock:
+                self.records = {path: (mtime_ns, size, ImageMetadata(*values, size)) for path, (mtime_ns, size, values) in records.items()}
+            return
+        try:
+            with open(self.store_path, "rb") as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable metadata store {self.store_path}: {e}")
+            return
+        if saved.get("version") != METADATA_VERSION or saved.get("directory") != self.directory:
+            return
+        with self._lock:
+            self.records = saved["records"]
+
+    def save(self):
+        """Saves the store to disk, or the changed records to the shared cache."""
+        if self.shared_cache is not None:
+            with self._lock:
+                records = {path: self.records[path] for path in self._changed if path in self.records}
+                removed = self._removed
+                self._changed = set()
+                self._removed = set()
+            try:
+                self.shared_cache.save_metadata(self.directory, records, removed)
+            except sqlite3.Error as e:
+                logger.warning(f"Unable to save metadata store {self.directory} to the shared cache: {e}")
+            return
+        with self._lock:
+            self._changed.clear()
+            self._removed.clear()
+            saved = {"version": METADATA_VERSION, "directory": self.directory, "records": self.records}
+            data = pickle.dumps(saved, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            atomic_write(self.store_path, data)
+        except OSError as e:
+            logger.warning(f"Unable to save metadata store {self.store_path}: {e}")
+
+    def update(self, entries, generation=None, save=True):
+        """Updates the store from the directory index.
+
+        Images that are new or whose modification time or size has changed are read by a thread
+        pool. When `generation` matches the generation of the last update nothing is done. When a 
+        shared cache is used, images already read by another process are loaded from it instead and 
+        the changes are always saved.
+
+        Args:
+            entries (list): A list() of FileEntry() objects from the directory index.
+            generation (tuple): A hashable value identifying the directory index generation the entries belong to, default is None to always update.
+            save (bool): A bool() to save the store to disk when it has changed, default is True, set it to False when updating in batches and call save() afterwards.
+
+        Returns:
+            changed (bool): A bool() which is True when the store has changed.
+        """
+        if generation is not None and generation == self.generation:
+            return False
+        with self._lock:
+            records = self.records
+            stale = [entry for entry in entries if records.get(entry.path, (None, None))[:2] != (entry.mtime_ns, entry.size)]
+        if stale and self.shared_cache is not None:
+            with self.shared_cache.lock(f"metadata:{self.directory}"):
+                self.read(self.load_shared(stale))
+                self.save()
+        elif stale:
+            self.read(stale)
+            if save:
+                self.save()
+        self.generation = generation
+        return bool(stale)
+
+    def add(self, records, save=True):
+        """Adds metadata read elsewhere, for example by the upload workers, to the store.
+
+        Args:
+            records (dict): A dict() of path to a tuple() of modification time, size and ImageMetadata().
+            save (bool): A bool() to save the store, default is True.
+        """
+        if not records:
+            return
+        with self._lock:
+            for path, record in records.items():
+                self.records[path] = record
+                self._changed.add(path)
+                self._removed.discard(path)
+        if save:
+            self.save()
+
+    def load_shared(self, stale):
+        """Loads the records of stale images already read by another process from the shared cache.
+
+        Args:
+            stale (list): A list() of FileEntry() objects of the images to load.
+
+        Returns:
+            stale (list): A list() of FileEntry() objects of the images that still have to be read.
+        """
+        records = self.shared_cache.load_metadata(self.directory, [entry.path for entry in stale])
+        remaining = list()
+        with self._lock:
+            for entry in stale:
+                mtime_ns, size, values = records.get(entry.path, (None, None, None))
+                if (mtime_ns, size) == (entry.mtime_ns, entry.size):
+                    self.records[entry.path] = (mtime_ns, size, ImageMetadata(*values, size))
+                else:
+                    remaining.append(entry)
+        return remaining
+
+    def read(self, stale):
+        """Reads the metadata of stale images with the thread pool.
+
+        Args:
+            stale (list): A list() of FileEntry() objects of the images to read.
+        """
+        if not stale:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(lambda entry: read_metadata(entry.path, entry.size), stale))
+        with self._lock:
+            for entry, metadata in zip(stale, results):
+                self.records[entry.path] = (entry.mtime_ns, entry.size, metadata)
+                self._changed.add(entry.path)
+
+    def prune(self, entries):
+        """Removes the records of images that are no longer indexed.
+
+        Args:
+            entries (list): A list() of every FileEntry() in the directory index.
+
+        Returns:
+            changed (bool): A bool() which is True when the store has changed.
+        """
+        with self._lock:
+            removed = set(self.records) - {entry.path for entry in entries}
+            for path in removed:
+                del self.records[path]
+            self._removed.update(removed)
+        if removed:
+            self.save()
+        return bool(removed)
+
+    def get(self, path):
+        """Returns the stored metadata of an image.
+
+        Args:
+            path (str): A str() of the path to the image.
+
+        Returns:
+            metadata (ImageMetadata): The ImageMetadata() of the image or None if it is not stored.
+        """
+        record = self.records.get(str(path))
+        if record is None:
+            return None
+        return record[2]
+
+_stores = dict()
+_stores_lock = threading.Lock()
+
+def get_metadata_store(directory):
+    """Returns the shared metadata store of a directory.
+
+    Args:
+        directory (str): A str() of the path to the folder containing the images.
+
+    Returns:
+        metadata_store (MetadataStore): The MetadataStore() of the directory.
+    """
+    directory = str(Path(directory).resolve())
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = MetadataStore(directory, shared_cache=get_shared_cache())
+            _stores[directory] = store
+        return store
+
+def rename_records(changes):
+    """Moves the metadata of renamed files to their new paths in every store containing them.
+
+    Renaming or moving a file keeps its modification time and size, so its metadata stays valid and 
+    it doesn't have to be read again.
+
+    Args:
+        changes (dict): A dict() of the str() old path of each file to its str() new path, or None when it was deleted.
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        prefix = store.directory + os.sep
+        records = dict()
+        for old_path, new_path in changes.items():
+            if new_path is None or not new_path.startswith(prefix):
+                continue
+            record = store.records.get(old_path)
+            if record is not None:
+                records[new_path] = record
+        store.add(records)
@@ -0,0 +1,117 @@
+import logging
+import os
+from collections import namedtuple
+from pathlib import Path
+from streamlit_uploads_library.index import invalidate_paths
+from streamlit_uploads_library.metadata import rename_records
+
+logger = logging.getLogger(__name__)
+
+BulkResult = namedtuple("BulkResult", ["done", "failed"])
+BulkResult.__doc__ = """The result of a bulk operation.
+
+Args:
+    done (dict): A dict() of the str() path of each changed file to its new str() path, or None when it was deleted.
+    failed (dict): A dict() of the str() path of each file that could not be changed to a str() describing the error.
+"""
+
+def apply_changes(changes):
+    """Applies a set of file changes in a single pass.
+
+    Every change is checked before any file is touched, a change whose new path already exists, is
+    used by another change or isn't valid fails without affecting the others. The files are then renamed, moved
+    or deleted, the changed paths are invalidated once in the indexes containing them and the
+    metadata of renamed and moved files is carried over to their new paths.
+
+    Args:
+        changes (dict): A dict() of the path of each file to change to its new path, or None to delete it.
+
+    Returns:
+        result (BulkResult): The BulkResult() of the changes.
+    """
+    done = dict()
+    failed = dict()
+    targets = set()
+    planned = list()
+    for old_path, new_path in changes.items():
+        old_path = Path(os.path.abspath(old_path))
+        if new_path is not None:
+            new_path = Path(os.path.abspath(new_path))
+            if new_path == old_path:
+                continue
+            try:
+                exists = str(new_path) in targets or new_path.exists()
+            except OSError as e:
+                # For example a name longer than the filesystem allows.
+                failed[str(old_path)] = e.strerror or str(e)
+                continue
+            if exists:
+                failed[str(old_path)] = f"{new_path.name} already exists."
+                continue
+            targets.add(str(new_path))
+        planned.append((old_path, new_path))
+    for old_path, new_path in planned:
+        try:
+            if new_path is None:
+                old_path.unlink()
+            else:
+                new_path.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(old_path, new_path)
+        except OSError as e:
+            logger.warning(e)
+            failed[str(old_path)] = e.strerror or str(e)
+            continue
+        done[str(old_path)] = None if new_path is None else str(new_path)
+    changed_paths = list(done)
+    changed_paths.extend(new_path for new_path in done.values() if new_path is not None)
+    invalidate_paths(changed_paths)
+    rename_records(done)
+    return BulkResult(done, failed)
+
+def delete_files(paths):
+    """Deletes files.
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the files to delete.
+
+    Returns:
+        result (BulkResult): The BulkResult() of the operation.
+    """
+    return apply_changes({path: None for path in paths})
+
+def move_files(paths, folder):
+    """Moves files into a folder, creating it if required.
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the files to move.
+        folder (str): A str() of the path to the folder to move the files to.
+
+    Returns:
+        result (BulkResult): The BulkResult() of the operation.
+    """
+    folder = Path(folder)
+    return apply_changes({path: folder / Path(path).name for path in paths})
+
+def rename_files(paths, pattern, start=1):
+    """Renames files using a pattern.
+
+    The pattern is a format string for the new name of each file without its extension, it can use
+    `{stem}` for the current name and `{index}` for the position of the file in `paths`, for
+    example "holiday_{index:03d}". The extension of each file is kept.
+
+    Args:
+        paths (list): A list() of str() or Path() paths to the files to rename, in the order used for `{index}`.
+        pattern (str): A str() containing the format of the new names.
+        start (int): An int() of the first `{index}`, default is 1.
+
+    Returns:
+        result (BulkResult): The BulkResult() of the operation.
+    """
+    changes = dict()
+    for idx, path in enumerate(paths, start=start):
+        path = Path(path)
+        new_stem = pattern.format(stem=path.stem, index=idx)
+        if not new_stem or os.sep in new_stem or (os.altsep and os.altsep in new_stem):
+            raise ValueError(f"The pattern {pattern!r} doesn't produce a valid file name.")
+        changes[path] = path.with_name(new_stem + path.suffix)
+    return apply_changes(changes)
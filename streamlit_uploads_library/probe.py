@@ -0,0 +1,383 @@
+import logging
+import struct
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+ProbeResult = namedtuple("ProbeResult", ["format", "width", "height", "orientation", "animated"])
+ProbeResult.__doc__ = """The header of an image, the format uses the same names as Pillow, for example "JPEG" or "AVIF".
+
+Args:
+    format (str): A str() of the image format.
+    width (int): An int() of the stored width in pixels, before the orientation is applied.
+    height (int): An int() of the stored height in pixels, before the orientation is applied.
+    orientation (int): An int() of the EXIF orientation from 1 to 8.
+    animated (bool): A bool() which is True when the image has more than one frame.
+"""
+
+# Most headers are found in the first read, later reads are only needed for JPEG files with large
+# metadata segments, ISOBMFF files with large boxes and GIF frames.
+HEADER_BYTES = 64 * 1024
+MAX_READS = 64
+MAX_PROBE_BYTES = 1024 * 1024
+
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"hevm", b"hevs", b"mif1", b"msf1"}
+AVIF_BRANDS = {b"avif", b"avis"}
+ANIMATED_BRANDS = {b"avis", b"msf1", b"hevm", b"hevs"}
+# The EXIF orientation matching each anticlockwise rotation of an ISOBMFF `irot` property.
+IROT_ORIENTATIONS = {0: 1, 1: 8, 2: 3, 3: 6}
+
+class HeaderReader():
+    """Reads parts of a file, serving them from the first block read whenever possible.
+
+    Args:
+        f (file): A readable and seekable binary file object.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.start = f.tell()
+        self.header = f.read(HEADER_BYTES)
+        self.num_of_reads = 1
+
+    def read(self, offset, length):
+        """Returns the bytes at an offset, fewer at the end of the file.
+
+        Args:
+            offset (int): An int() of the offset from the start of the image.
+            length (int): An int() of the number of bytes to read.
+
+        Returns:
+            data (bytes): The bytes() read.
+        """
+        if offset + length <= len(self.header):
+            return self.header[offset:offset + length]
+        if self.num_of_reads >= MAX_READS or length > MAX_PROBE_BYTES:
+            raise ValueError("The header is too large to probe.")
+        self.num_of_reads += 1
+        self.f.seek(self.start + offset)
+        return self.f.read(length)
+
+def read_tiff_tags(data, offset=0):
+    """Returns the dimensions and orientation stored in the first IFD of TIFF data.
+
+    Used for TIFF files and for the EXIF data of other formats, which is stored in the same way.
+
+    Args:
+        data (bytes): The bytes() of the TIFF data, starting with the byte order mark.
+        offset (int): An int() of the offset of the TIFF data in `data`, default is 0.
+
+    Returns:
+        tags (dict): A dict() of tag id to value for the width (256), height (257) and orientation (274) tags found.
+    """
+    byte_order = data[offset:offset + 2]
+    if byte_order == b"II":
+        endian = "<"
+    elif byte_order == b"MM":
+        endian = ">"
+    else:
+        return dict()
+    magic, ifd_offset = struct.unpack_from(endian + "HI", data, offset + 2)
+    if magic != 42:
+        return dict()
+    ifd_start = offset + ifd_offset
+    num_of_entries = struct.unpack_from(endian + "H", data, ifd_start)[0]
+    tags = dict()
+    for entry_idx in range(num_of_entries):
+        entry_start = ifd_start + 2 + entry_idx * 12
+        if entry_start + 12 > len(data):
+            break
+        tag, value_type = struct.unpack_from(endian + "HH", data, entry_start)
+        if tag in (256, 257, 274):
+            if value_type == 3:
+                tags[tag] = struct.unpack_from(endian + "H", data, entry_start + 8)[0]
+            elif value_type == 4:
+                tags[tag] = struct.unpack_from(endian + "I", data, entry_start + 8)[0]
+    return tags
+
+def probe_jpeg(reader):
+    """Reads the header of a JPEG image by walking its segments up to the first frame header."""
+    offset = 2
+    orientation = 1
+    while True:
+        marker = reader.read(offset, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        marker_type = marker[1]
+        if marker_type == 0xFF:
+            offset += 1
+            continue
+        if marker_type in (0x01, *range(0xD0, 0xD9)):
+            offset += 2
+            continue
+        length = struct.unpack(">H", marker[2:])[0]
+        if marker_type in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            height, width = struct.unpack(">HH", reader.read(offset + 5, 4))
+            return ProbeResult("JPEG", width, height, orientation, False)
+        if marker_type == 0xE1 and orientation == 1:
+            segment = reader.read(offset + 4, length - 2)
+            if segment.startswith(b"Exif\x00\x00"):
+                orientation = read_tiff_tags(segment, 6).get(274, 1)
+        offset += 2 + length
+
+def probe_png(reader):
+    """Reads the header of a PNG image, an `acTL` chunk before the image data marks an animation."""
+    header = reader.read(0, 33)
+    width, height = struct.unpack_from(">II", header, 16)
+    animated = False
+    offset = 8
+    while True:
+        chunk = reader.read(offset, 8)
+        if len(chunk) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", chunk)
+        if chunk_type == b"acTL":
+            animated = True
+            break
+        if chunk_type == b"IDAT":
+            break
+        offset += 12 + length
+    return ProbeResult("PNG", width, height, 1, animated)
+
+def probe_gif(reader):
+    """Reads the header of a GIF image, walking its blocks until a second frame or a looping extension is found."""
+    header = reader.read(0, 13)
+    width, height, flags = struct.unpack_from("<HHB", header, 6)
+    offset = 13
+    if flags & 0x80:
+        offset += 3 << ((flags & 0x07) + 1)
+    num_of_frames = 0
+    while offset < MAX_PROBE_BYTES:
+        block = reader.read(offset, 1)
+        if not block or block == b"\x3b":
+            break
+        if block == b"\x21":
+            label = reader.read(offset + 1, 1)
+            if label == b"\xff" and reader.read(offset + 3, 11) == b"NETSCAPE2.0":
+                num_of_frames = 2
+                break
+            offset += 2
+        elif block == b"\x2c":
+            num_of_frames += 1
+            if num_of_frames > 1:
+                break
+            descriptor = reader.read(offset + 1, 9)
+            local_flags = descriptor[8]
+            offset += 10
+            if local_flags & 0x80:
+                offset += 3 << ((local_flags & 0x07) + 1)
+            # Skip the LZW minimum code size.
+            offset += 1
+        else:
+            break
+        # Skip the data sub-blocks, a zero length sub-block ends them.
+        while True:
+            sub_block = reader.read(offset, 1)
+            if not sub_block:
+                break
+            offset += 1 + sub_block[0]
+            if sub_block[0] == 0:
+                break
+    return ProbeResult("GIF", width, height, 1, num_of_frames > 1)
+
+def probe_webp(reader):
+    """Reads the header of a WebP image from its first chunk."""
+    header = reader.read(0, 30)
+    chunk_type = header[12:16]
+    if chunk_type == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack_from("<HH", header, 26)
+        return ProbeResult("WEBP", width & 0x3FFF, height & 0x3FFF, 1, False)
+    if chunk_type == b"VP8L" and header[20] == 0x2F:
+        bits = struct.unpack_from("<I", header, 21)[0]
+        return ProbeResult("WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, 1, False)
+    if chunk_type == b"VP8X":
+        flags = header[20]
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        orientation = 1
+        if flags & 0x08:
+            # The EXIF chunk follows the image data, walk the chunk headers to find it.
+            riff_size = struct.unpack_from("<I", header, 4)[0] + 8
+            offset = 12
+            while offset + 8 <= riff_size:
+                chunk_type, length = struct.unpack("<4sI", reader.read(offset, 8))
+                if chunk_type == b"EXIF":
+                    exif = reader.read(offset + 8, length)
+                    start = 6 if exif.startswith(b"Exif\x00\x00") else 0
+                    orientation = read_tiff_tags(exif, start).get(274, 1)
+                    break
+                offset += 8 + length + (length & 1)
+        return ProbeResult("WEBP", width, height, orientation, bool(flags & 0x02))
+    return None
+
+def iter_boxes(data, offset=0, end=None):
+    """Yields the type, content start and end of each ISOBMFF box in `data`."""
+    if end is None:
+        end = len(data)
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, min(offset + size, end)
+        offset += size
+
+def probe_isobmff(reader):
+    """Reads the header of an AVIF or HEIF image from the properties of its primary item."""
+    ftyp = reader.read(0, 8)
+    ftyp_size = struct.unpack_from(">I", ftyp)[0]
+    ftyp = reader.read(0, ftyp_size)
+    brands = {ftyp[8:12]}
+    brands.update(ftyp[idx:idx + 4] for idx in range(16, ftyp_size - 3, 4))
+    if brands & AVIF_BRANDS:
+        image_format = "AVIF"
+    elif brands & HEIF_BRANDS:
+        image_format = "HEIF"
+    else:
+        return None
+    offset = ftyp_size
+    meta = None
+    while meta is None:
+        box_header = reader.read(offset, 16)
+        if len(box_header) < 8:
+            return None
+        size, box_type = struct.unpack_from(">I4s", box_header)
+        if size == 1:
+            size = struct.unpack_from(">Q", box_header, 8)[0]
+        if size < 8:
+            return None
+        if box_type == b"meta":
+            meta = reader.read(offset, size)
+        offset += size
+    primary_item = None
+    properties = list()
+    associations = dict()
+    # The meta box is a full box, its children start after the version and flags.
+    for box_type, start, end in iter_boxes(meta, 12):
+        if box_type == b"pitm":
+            primary_item = struct.unpack_from(">H" if meta[start] == 0 else ">I", meta, start + 4)[0]
+        elif box_type == b"iprp":
+            for child_type, child_start, child_end in iter_boxes(meta, start, end):
+                if child_type == b"ipco":
+                    properties = list(iter_boxes(meta, child_start, child_end))
+                elif child_type == b"ipma":
+                    version = meta[child_start]
+                    flags = int.from_bytes(meta[child_start + 1:child_start + 4], "big")
+                    position = child_start + 4
+                    num_of_entries = struct.unpack_from(">I", meta, position)[0]
+                    position += 4
+                    for _ in range(num_of_entries):
+                        if version < 1:
+                            item_id = struct.unpack_from(">H", meta, position)[0]
+                            position += 2
+                        else:
+                            item_id = struct.unpack_from(">I", meta, position)[0]
+                            position += 4
+                        num_of_associations = meta[position]
+                        position += 1
+                        indexes = list()
+                        for _ in range(num_of_associations):
+                            if flags & 1:
+                                indexes.append(struct.unpack_from(">H", meta, position)[0] & 0x7FFF)
+                                position += 2
+                            else:
+                                indexes.append(meta[position] & 0x7F)
+                                position += 1
+                        associations[item_id] = indexes
+    if primary_item in associations:
+        item_properties = [properties[idx - 1] for idx in associations[primary_item] if 0 < idx <= len(properties)]
+    else:
+        item_properties = properties
+    width = height = None
+    orientation = 1
+    for box_type, start, end in item_properties:
+        if box_type == b"ispe" and width is None:
+            width, height = struct.unpack_from(">II", meta, start + 4)
+        elif box_type == b"irot":
+            orientation = IROT_ORIENTATIONS[meta[start] & 0x03]
+    if width is None:
+        return None
+    return ProbeResult(image_format, width, height, orientation, bool(brands & ANIMATED_BRANDS))
+
+def probe_tiff(reader):
+    """Reads the header of a TIFF image from its first IFD."""
+    header = reader.header
+    tags = read_tiff_tags(header)
+    if 256 not in tags or 257 not in tags:
+        return None
+    return ProbeResult("TIFF", tags[256], tags[257], tags.get(274, 1), False)
+
+def probe_bmp(reader):
+    """Reads the header of a BMP image."""
+    header = reader.read(0, 26)
+    dib_size = struct.unpack_from("<I", header, 14)[0]
+    if dib_size == 12:
+        width, height = struct.unpack_from("<HH", header, 18)
+    else:
+        width, height = struct.unpack_from("<ii", header, 18)
+    return ProbeResult("BMP", width, abs(height), 1, False)
+
+def probe_file(f):
+    """Reads the header of an image from a file object.
+
+    The file object is returned to its position afterwards.
+
+    Args:
+        f (file): A readable and seekable binary file object positioned at the start of the image.
+
+    Returns:
+        result (ProbeResult): The ProbeResult() of the image, or None if the format isn't recognised.
+    """
+    position = f.tell()
+    try:
+        reader = HeaderReader(f)
+        header = reader.header
+        if header.startswith(b"\xff\xd8"):
+            return probe_jpeg(reader)
+        if header.startswith(b"\x89PNG\r\n\x1a\n"):
+            return probe_png(reader)
+        if header[:6] in (b"GIF87a", b"GIF89a"):
+            return probe_gif(reader)
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return probe_webp(reader)
+        if header[4:8] == b"ftyp":
+            return probe_isobmff(reader)
+        if header[:4] in (b"II*\x00", b"MM\x00*"):
+            return probe_tiff(reader)
+        if header[:2] == b"BM":
+            return probe_bmp(reader)
+        return None
+    except (struct.error, ValueError, IndexError, KeyError) as e:
+        logger.debug(f"Unable to probe the image header: {e}")
+        return None
+    finally:
+        f.seek(position)
+
+def probe(src):
+    """Reads the format, dimensions, orientation and animation of an image from its header.
+
+    Only the first 64 KiB of the file are read in most cases, a few more small reads are needed for
+    JPEG files with large metadata segments, HEIF files with large metadata and GIF files. The pixel
+    data is never decoded and Pillow is not used.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.probe import probe
+
+        result = probe("assets/landscape/pexels-analogicus-6958793.jpg")
+        print(result.width, result.height)
+
+    Args:
+        src (str): A str() of the path to the image, or a readable and seekable binary file object.
+
+    Returns:
+        result (ProbeResult): The ProbeResult() of the image, or None if the format isn't recognised.
+    """
+    if hasattr(src, "read"):
+        return probe_file(src)
+    with open(src, "rb") as f:
+        return probe_file(f)
@@ -0,0 +1,348 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from PIL import Image, ImageOps
+from streamlit_uploads_library.decoding import check_decode_limits, decode_image, decoded_bytes, draft_image, get_decode_limits, get_memory_budget, open_image, set_decode_limits
+from streamlit_uploads_library.metadata import ImageMetadata
+from streamlit_uploads_library.probe import probe
+from streamlit_uploads_library.thumbnails import resize_thumbnail, save_thumbnail
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+class PartFile():
+    """An exclusively held partial file of an upload.
+
+    Partial files are named after the content hash of the upload so an interrupted copy can be 
+    resumed, two sessions uploading the same content at once would write to the same file. The 
+    shared partial file is locked with `flock` for as long as the upload uses it, a session which 
+    finds it locked by another upload copies to a private partial file instead. The lock is released 
+    automatically when the process dies, so a copy interrupted by a restart can still be resumed. 
+    Without `fcntl`, on Windows, every upload uses a private partial file and copies aren't resumed.
+
+    Example Usage:
+        python
+        with PartFile(destination / f".{digest}.part") as part_file:
+            resumable_copy(file, part_file.path, file.size)
+            os.replace(part_file.path, destination / file.name)
+
+    Args:
+        path (Path): A Path() object pointing to the shared partial file.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd = None
+        if not self.acquire():
+            fd, private_path = tempfile.mkstemp(dir=self.path.parent, prefix=f"{self.path.stem}.", suffix=".part")
+            os.close(fd)
+            self.path = Path(private_path)
+
+    def acquire(self):
+        """Locks the shared partial file.
+
+        Returns:
+            locked (bool): A bool() which is True when the lock was taken, False when another upload holds it.
+        """
+        if fcntl is None:
+            return False
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            # The previous holder may have renamed or removed the file between the open and the lock.
+            try:
+                locked = os.fstat(fd).st_ino == os.stat(self.path).st_ino
+            except FileNotFoundError:
+                locked = False
+            if locked:
+                self._fd = fd
+                return True
+            os.close(fd)
+
+    def release(self):
+        """Releases the lock, after the partial file has been renamed or removed."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def resumable_copy(src, path, size, chunk_size=CHUNK_SIZE):
+    """Streams a file object to a partial file, resuming an earlier interrupted copy.
+
+    Partial files are named after the content hash of the upload, so when a previous copy of the 
+    same content was interrupted, for example because the server was restarted, the data already on 
+    disk is kept and only the remaining chunks are written. The partial file is only trusted up to 
+    its last complete chunk, it has to be held with a PartFile() so no other upload writes to it.
+
+    Args:
+        src (file): A readable and seekable binary file object containing `size` bytes.
+        path (Path): A Path() object pointing to the partial file.
+        size (int): An int() of the size of the content in bytes.
+        chunk_size (int): An int() defining the number of bytes read at a time, default is 1 MiB.
+
+    Returns:
+        num_of_bytes (int): An int() of the number of bytes written by this call.
+    """
+    path = Path(path)
+    try:
+        offset = path.stat().st_size
+    except FileNotFoundError:
+        offset = 0
+    if offset != size:
+        offset = min(offset - offset % chunk_size, size)
+    num_of_bytes = 0
+    with open(path, "r+b" if offset else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        src.seek(offset)
+        while offset + num_of_bytes < size:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            f.write(chunk)
+            num_of_bytes += len(chunk)
+    os.chmod(path, 0o644)
+    src.seek(0)
+    return num_of_bytes
+
+def check_image_header(file):
+    """Checks that a file object contains an image.
+
+    Only the image header is read, the file object is returned to the start afterwards. Common
+    formats are read by probe() and accepted when Pillow can decode them, Pillow is only used to
+    read the header of other formats. Images above the decoding limits are not supported.
+
+    Args:
+        file (file): A readable and seekable binary file object.
+
+    Returns:
+        image_format (str): A str() of the image format, for example "JPEG", or None if it is not a supported image.
+    """
+    try:
+        result = probe(file)
+        if result is not None:
+            Image.init()
+            if result.format not in Image.OPEN:
+                raise ValueError(f"{result.format} images can't be decoded.")
+            check_decode_limits(result.width, result.height, file.seek(0, os.SEEK_END))
+            image_format = result.format
+        else:
+            with open_image(file) as img:
+                image_format = img.format
+    except (OSError, ValueError, SyntaxError) as e:
+        logger.debug(f"Unsupported image: {e}")
+        image_format = None
+    file.seek(0)
+    return image_format
+
+def check_image_file(path):
+    """Checks that a file on disk contains an image.
+
+    Args:
+        path (str): A str() of the path to the file.
+
+    Returns:
+        image_format (str): A str() of the image format, for example "JPEG", or None if it is not a supported image.
+    """
+    with open(path, "rb") as f:
+        return check_image_header(f)
+
+def transform_image(src, path, suffix=None):
+    """Decodes and re-encodes an image.
+
+    Runs in a worker process, the image is read from disk so it is never copied between processes. 
+    The image is written to a temporary file which is then renamed to `path`. The output format is 
+    taken from the file extension of `path`. The re-encoded image carries no EXIF metadata so the 
+    EXIF orientation is applied to the pixels first. The image has to be within the decoding limits.
+
+    Args:
+        src (str): A str() of the path to the uploaded image.
+        path (str): A str() of the path to save the image to.
+        suffix (str): A str() of the file extension used to choose the output format, default is None to use the extension of `path`.
+
+    Returns:
+        num_of_bytes (int): An int() of the size of the saved image in bytes.
+    """
+    path = Path(path)
+    if suffix is None:
+        suffix = path.suffix
+    with decode_image(src) as img:
+        image_format = Image.registered_extensions().get(suffix.lower(), img.format)
+        if img.getexif().get(0x0112, 1) != 1:
+            img = ImageOps.exif_transpose(img)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format=image_format)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return path.stat().st_size
+
+def create_derivatives(path, thumbnails, compute_hash=False):
+    """Reads the metadata of a saved image and creates its thumbnails.
+
+    Runs in a worker process, the image is decoded once, at a reduced scale for JPEG images, and 
+    downscaled from the largest thumbnail to the smallest. The perceptual hash of the image is 
+    computed from the smallest thumbnail. The image has to be within the decoding limits.
+
+    Args:
+        path (str): A str() of the path to the saved image.
+        thumbnails (list): A list() of tuples of the thumbnail path, width, format and quality of each thumbnail to create.
+        compute_hash (bool): A bool() to compute the perceptual hash even when there are no thumbnails to create, default is False.
+
+    Returns:
+        metadata (ImageMetadata): The ImageMetadata() of the image.
+        sizes (list): A list() of the size in bytes of each thumbnail, in the order of `thumbnails`, None when it could not be created.
+        image_hash (int): An int() of the perceptual hash of the image, or None when it wasn't decoded.
+    """
+    sizes = [None] * len(thumbnails)
+    with open_image(path) as img:
+        metadata = ImageMetadata(img.width, img.height, img.format, img.getexif().get(0x0112, 1), os.stat(path).st_size)
+        if not thumbnails and not compute_hash:
+            return metadata, sizes, None
+        # Imported here so workers which only validate or transform uploads never load NumPy.
+        from streamlit_uploads_library.similarity import HASH_DECODE_SIZE, dhash
+        max_width = max((width for _, width, _, _ in thumbnails), default=HASH_DECODE_SIZE)
+        draft_image(img, (max_width, max_width))
+        with get_memory_budget().reserve(decoded_bytes(img)):
+            for thumbnail_idx in sorted(range(len(thumbnails)), key=lambda idx: thumbnails[idx][1], reverse=True):
+                thumbnail_path, width, image_format, quality = thumbnails[thumbnail_idx]
+                try:
+                    resize_thumbnail(img, width)
+                    sizes[thumbnail_idx] = save_thumbnail(img, thumbnail_path, image_format, quality)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Unable to create a thumbnail for {path}: {e}")
+            image_hash = dhash(img)
+    return metadata, sizes, image_hash
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_process_pool(max_workers=None):
+    """Returns the shared process pool.
+
+    The pool is created on first use and shared by every uploader in the process, so the number of
+    worker processes decoding images at once is bounded no matter how many sessions upload files.
+    Workers are started with "spawn" because forking a multithreaded server is unsafe, they use the 
+    decoding limits set when the pool is created.
+
+    Args:
+        max_workers (int): An int() defining the number of worker processes, default is None to use the number of CPUs up to 4. Only used when the pool is created.
+
+    Returns:
+        pool (ProcessPoolExecutor): The shared ProcessPoolExecutor().
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if max_workers is None:
+                max_workers = min(4, os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=set_decode_limits, initargs=get_decode_limits())
+        return _pool
+
+def reset_process_pool(pool):
+    """Discards the shared process pool so the next call to get_process_pool() creates a new one.
+
+    Used once a worker has died, for example when it was killed for running out of memory, because
+    the pool then refuses every further job.
+
+    Args:
+        pool (ProcessPoolExecutor): The broken ProcessPoolExecutor(), the shared pool is only discarded if it is still this one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def submit_job(fn, *args, max_workers=None, memory_bytes=0, memory_budget=None):
+    """Submits a job to the shared process pool, reserving the memory it needs.
+
+    The memory the job needs is reserved before it is submitted, waiting until it is available, and
+    released once the job has finished.
+
+    Args:
+        fn (callable): The function to run in a worker process.
+        *args: The arguments passed to `fn`.
+        max_workers (int): An int() defining the number of worker processes, default is None to use the number of CPUs up to 4. Only used when the pool is created.
+        memory_bytes (int): An int() of the number of bytes of memory to reserve for the job, default is 0.
+        memory_budget (MemoryBudget): The MemoryBudget() to reserve the memory from, default is None to use the budget of the process.
+
+    Returns:
+        future (Future): The Future() of the job.
+    """
+    if not memory_bytes:
+        return submit_to_pool(fn, *args, max_workers=max_workers)
+    if memory_budget is None:
+        memory_budget = get_memory_budget()
+    memory_budget.acquire(memory_bytes)
+    try:
+        future = submit_to_pool(fn, *args, max_workers=max_workers)
+    except BaseException:
+        memory_budget.release(memory_bytes)
+        raise
+    future.add_done_callback(lambda _: memory_budget.release(memory_bytes))
+    return future
+
+def submit_to_pool(fn, *args, max_workers=None):
+    """Submits a job to the shared process pool, replacing the pool once if it is broken.
+
+    Args:
+        fn (callable): The function to run in a worker process.
+        *args: The arguments passed to `fn`.
+        max_workers (int): An int() defining the number of worker processes, default is None to use the number of CPUs up to 4. Only used when the pool is created.
+
+    Returns:
+        future (Future): The Future() of the job.
+    """
+    pool = get_process_pool(max_workers)
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        logger.warning("A worker process died, starting a new process pool.")
+        reset_process_pool(pool)
+        return get_process_pool(max_workers).submit(fn, *args)
+
+def job_result(future, fn, *args, max_workers=None, memory_bytes=0, memory_budget=None):
+    """Returns the result of a job submitted with submit_job(), running it again once if its worker died.
+
+    A dying worker fails every job waiting in the pool, so each of them is retried once in a new 
+    pool, with the same memory reserved. A job which kills its worker again raises BrokenProcessPool.
+
+    Args:
+        future (Future): The Future() returned by submit_job().
+        fn (callable): The function the job runs.
+        *args: The arguments passed to `fn`.
+        max_workers (int): An int() defining the number of worker processes, default is None to use the number of CPUs up to 4. Only used when the pool is created.
+        memory_bytes (int): An int() of the number of bytes of memory to reserve for the retried job, default is 0.
+        memory_budget (MemoryBudget): The MemoryBudget() to reserve the memory from, default is None to use the budget of the process.
+
+    Returns:
+        result: The value returned by `fn`.
+    """
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        return submit_job(fn, *args, max_workers=max_workers, memory_bytes=memory_bytes, memory_budget=memory_budget).result()
@@ -0,0 +1,195 @@
+import datetime
+import os
+from collections import namedtuple
+import numpy as np
+
+SORT_KEYS = ("name", "modified", "size", "dimensions")
+
+FileFilter = namedtuple("FileFilter", ["search", "subfolder", "modified_after", "modified_before", "min_width", "max_width", "min_height", "max_height"], defaults=(None,) * 8)
+FileFilter.__doc__ = """Filters applied to the files of a library, every field is optional and None disables it.
+
+Args:
+    search (str): A str() which must be contained in the filename, case insensitive.
+    subfolder (str): A str() of the path relative to the library directory of a folder whose files, including those in its subfolders, are included.
+    modified_after (datetime.date): A datetime.date() or datetime.datetime(), files modified before it are excluded, dates include the whole day.
+    modified_before (datetime.date): A datetime.date() or datetime.datetime(), files modified after it are excluded, dates include the whole day.
+    min_width (int): An int() of the minimum width in pixels.
+    max_width (int): An int() of the maximum width in pixels.
+    min_height (int): An int() of the minimum height in pixels.
+    max_height (int): An int() of the maximum height in pixels.
+"""
+
+def timestamp_ns(value, end_of_day=False):
+    """Returns a date or datetime as a timestamp in nanoseconds.
+
+    Args:
+        value (datetime.date): A datetime.date() or datetime.datetime() in local time.
+        end_of_day (bool): A bool() to use the end of the day for a date instead of its start, default is False.
+
+    Returns:
+        timestamp (int): An int() of nanoseconds since the epoch.
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time.max if end_of_day else datetime.time.min)
+    return int(value.timestamp() * 1_000_000_000)
+
+class FileTable():
+    """A table of the files in a library used to sort and filter them.
+
+    The name, modification time, size and dimensions of each file are stored in arrays and the order
+    of the files for every sort key is computed once when the table is created, so sorting and
+    filtering only mask the precomputed orders and take a few milliseconds for 100,000 files.
+
+    Args:
+        directory (str): A str() of the path to the folder containing the library images.
+        files (list): A list() of str() paths to the files.
+        entries (dict): A dict() of path to FileEntry() used for the modification times and sizes, files without an entry are read with `stat`.
+        metadata (dict): A dict() of path to ImageMetadata() used for the dimensions, files without metadata have unknown dimensions.
+    """
+    def __init__(self, directory, files, entries, metadata):
+        directory = str(directory)
+        num_of_files = len(files)
+        self.files = list(files)
+        self.names = list()
+        mtimes = list()
+        sizes = list()
+        widths = list()
+        heights = list()
+        folder_codes = dict()
+        dir_codes = dict()
+        codes = list()
+        for path in self.files:
+            dir_path, _, name = path.rpartition(os.sep)
+            self.names.append(name.lower())
+            entry = entries.get(path)
+            if entry is not None:
+                mtimes.append(entry.mtime_ns)
+                sizes.append(entry.size)
+            else:
+                try:
+                    stat = os.stat(path)
+                    mtimes.append(stat.st_mtime_ns)
+                    sizes.append(stat.st_size)
+                except OSError:
+                    mtimes.append(0)
+                    sizes.append(0)
+            img_meta = metadata.get(path)
+            widths.append(-1 if img_meta is None else img_meta.width)
+            heights.append(-1 if img_meta is None else img_meta.height)
+            code = dir_codes.get(dir_path)
+            if code is None:
+                folder = os.path.relpath(dir_path, directory)
+                code = dir_codes[dir_path] = folder_codes.setdefault(folder, len(folder_codes))
+            codes.append(code)
+        self.mtime_ns = np.array(mtimes, dtype=np.int64)
+        self.size = np.array(sizes, dtype=np.int64)
+        self.width = np.array(widths, dtype=np.int64)
+        self.height = np.array(heights, dtype=np.int64)
+        self.folder = np.array(codes, dtype=np.int32)
+        # Every folder containing files and their parent folders, used to choose a subfolder.
+        folders = set()
+        for folder in folder_codes:
+            while folder not in ("", ".", os.curdir) and folder not in folders:
+                folders.add(folder)
+                folder = os.path.dirname(folder)
+        self.folders = sorted(folders, key=str.lower)
+        self.folder_names = np.array(list(folder_codes), dtype=object)
+        name_order = np.array(sorted(range(num_of_files), key=self.names.__getitem__), dtype=np.int64)
+        name_rank = np.empty(num_of_files, dtype=np.int64)
+        name_rank[name_order] = np.arange(num_of_files)
+        # Files with the same key are ordered by name.
+        self.orders = {
+            "name": name_order,
+            "modified": np.lexsort((name_rank, self.mtime_ns)),
+            "size": np.lexsort((name_rank, self.size)),
+            "dimensions": np.lexsort((name_rank, self.width * self.height)),
+        }
+
+    def __len__(self):
+        return len(self.files)
+
+    def mask(self, file_filter):
+        """Returns which files match a filter.
+
+        Args:
+            file_filter (FileFilter): The FileFilter() to apply.
+
+        Returns:
+            mask (np.ndarray): A numpy bool array which is True for each matching file, or None when the filter matches every file.
+        """
+        mask = None
+        def combine(condition):
+            return condition if mask is None else mask & condition
+        if file_filter.search:
+            search = file_filter.search.lower()
+            mask = combine(np.fromiter((search in name for name in self.names), dtype=bool, count=len(self.names)))
+        if file_filter.subfolder not in (None, "", "."):
+            subfolder = os.path.normpath(file_filter.subfolder)
+            codes = [code for code, folder in enumerate(self.folder_names) if folder == subfolder or folder.startswith(subfolder + os.sep)]
+            mask = combine(np.isin(self.folder, codes))
+        if file_filter.modified_after is not None:
+            mask = combine(self.mtime_ns >= timestamp_ns(file_filter.modified_after))
+        if file_filter.modified_before is not None:
+            mask = combine(self.mtime_ns <= timestamp_ns(file_filter.modified_before, end_of_day=True))
+        if file_filter.min_width is not None:
+            mask = combine(self.width >= file_filter.min_width)
+        if file_filter.max_width is not None:
+            mask = combine((self.width >= 0) & (self.width <= file_filter.max_width))
+        if file_filter.min_height is not None:
+            mask = combine(self.height >= file_filter.min_height)
+        if file_filter.max_height is not None:
+            mask = combine((self.height >= 0) & (self.height <= file_filter.max_height))
+        return mask
+
+    def select(self, file_filter=None, sort_by=None, descending=False):
+        """Returns the positions of the files matching a filter in the requested order.
+
+        Only the positions are returned so paginated views only create the paths they display, use 
+        paths() to get them.
+
+        Args:
+            file_filter (FileFilter): The FileFilter() to apply, default is None to include every file.
+            sort_by (str): A str() of the sort key, options are "name", "modified", "size" or "dimensions", default is None to keep the directory order.
+            descending (bool): A bool() to reverse the order, default is False.
+
+        Returns:
+            order (np.ndarray): A numpy int array of positions in `files`.
+        """
+        if sort_by is None:
+            order = np.arange(len(self.files))
+        elif sort_by in self.orders:
+            order = self.orders[sort_by]
+        else:
+            raise ValueError(f"Unknown sort key {sort_by!r}, options are {', '.join(SORT_KEYS)}.")
+        if file_filter is not None:
+            mask = self.mask(file_filter)
+            if mask is not None:
+                order = order[mask[order]]
+        if descending:
+            order = order[::-1]
+        return order
+
+    def paths(self, order):
+        """Returns the paths of the files at the given positions.
+
+        Args:
+            order (np.ndarray): A numpy int array of positions in `files`, as returned by select().
+
+        Returns:
+            files (list): A list() of str() paths.
+        """
+        files = self.files
+        return [files[file_idx] for file_idx in order.tolist()]
+
+    def query(self, file_filter=None, sort_by=None, descending=False):
+        """Returns the files matching a filter in the requested order.
+
+        Args:
+            file_filter (FileFilter): The FileFilter() to apply, default is None to include every file.
+            sort_by (str): A str() of the sort key, options are "name", "modified", "size" or "dimensions", default is None to keep the directory order.
+            descending (bool): A bool() to reverse the order, default is False.
+
+        Returns:
+            files (list): A list() of str() paths.
+        """
+        return self.paths(self.select(file_filter, sort_by, descending))
@@ -0,0 +1,152 @@
+import logging
+import threading
+from pathlib import Path
+from streamlit_uploads_library.index import get_index
+from streamlit_uploads_library.metadata import get_metadata_store
+
+logger = logging.getLogger(__name__)
+
+class BackgroundScan():
+    """Scans a directory in a background thread.
+
+    Used when a directory has never been indexed, the directory index is built and the metadata of
+    the images is read in a background thread while the files found so far are available in batches,
+    in the same order as they are listed by the index once the scan is done. This allows a library
+    to display the first images straight away instead of waiting for the whole tree to be scanned.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.scanning import start_scan
+
+        scan = start_scan("assets")
+        while not scan.wait(0.1):
+            print(f"{len(scan.entries())} files found")
+
+    Args:
+        directory (str): A str() of the path to the folder to scan, for example, "assets".
+        batch_size (int): An int() defining the number of files read before they are made available, default is 100.
+    """
+    def __init__(self, directory, batch_size=100):
+        self.index = get_index(directory)
+        self.directory = self.index.directory
+        self.metadata_store = get_metadata_store(self.directory)
+        self.batch_size = batch_size
+        self.dirs_visited = 0
+        self.dirs_pending = 1
+        self.error = None
+        self._entries = list()
+        self._batch = list()
+        from PIL import Image
+        self._image_extensions = tuple(Image.registered_extensions())
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self.run, name=f"BackgroundScan({self.directory})", daemon=True)
+
+    def start(self):
+        """Starts the scan."""
+        self._thread.start()
+
+    def run(self):
+        """Builds the directory index and reads the metadata of the images in batches."""
+        try:
+            self.index.refresh(progress=self.add_dir)
+            self.flush()
+            self.metadata_store.save()
+        except Exception as e:
+            logger.exception(f"Unable to scan {self.directory}")
+            self.error = e
+        finally:
+            self._done.set()
+
+    def add_dir(self, dir_path, dir_record, num_pending):
+        """Adds the files of a scanned directory, used as the progress callback of the index.
+
+        Args:
+            dir_path (str): A str() of the path to the scanned directory.
+            dir_record (tuple): A tuple() of the directory modification time, a dict() of filename to FileEntry() and a list() of subdirectory names.
+            num_pending (int): An int() of the number of directories left to scan.
+        """
+        self._batch.extend(dir_record[1].values())
+        self.dirs_visited += 1
+        self.dirs_pending = num_pending
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Reads the metadata of the current batch and makes its files available."""
+        batch = self._batch
+        self._batch = list()
+        images = [entry for entry in batch if entry.extension in self._image_extensions]
+        if images:
+            self.metadata_store.update(images, save=False)
+        with self._lock:
+            self._entries.extend(batch)
+
+    def entries(self, start=0):
+        """Returns the files found so far.
+
+        Args:
+            start (int): An int() of the number of files to skip, used to only fetch the files found since the last call.
+
+        Returns:
+            entries (list): A list() of FileEntry() objects.
+        """
+        with self._lock:
+            return self._entries[start:]
+
+    def progress(self):
+        """Returns the estimated progress of the scan.
+
+        The total number of directories is unknown until the scan is done, the estimate is based on
+        the number of directories visited and the number of directories found but not visited yet.
+
+        Returns:
+            progress (float): A float() between 0.0 and 1.0.
+        """
+        if self._done.is_set():
+            return 1.0
+        return self.dirs_visited / (self.dirs_visited + self.dirs_pending + 1)
+
+    def done(self):
+        """Returns whether the scan has finished.
+
+        Returns:
+            done (bool): A bool() which is True when the scan has finished.
+        """
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Waits for the scan to finish.
+
+        Args:
+            timeout (float): A float() of the maximum number of seconds to wait, default is None to wait until it has finished.
+
+        Returns:
+            done (bool): A bool() which is True when the scan has finished.
+        """
+        return self._done.wait(timeout)
+
+_scans = dict()
+_scans_lock = threading.Lock()
+
+def start_scan(directory, batch_size=100):
+    """Starts a background scan of a directory.
+
+    Only one scan runs for each directory at a time, a scan that is already running is returned
+    instead of starting another one.
+
+    Args:
+        directory (str): A str() of the path to the folder to scan.
+        batch_size (int): An int() defining the number of files read before they are made available, default is 100. Only used when a scan is started.
+
+    Returns:
+        scan (BackgroundScan): The running BackgroundScan() of the directory.
+    """
+    directory = str(Path(directory).resolve())
+    with _scans_lock:
+        scan = _scans.get(directory)
+        if scan is None or scan.done():
+            scan = BackgroundScan(directory, batch_size=batch_size)
+            scan.start()
+            _scans[directory] = scan
+        return scan
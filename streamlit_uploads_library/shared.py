@@ -0,0 +1,279 @@
+import hashlib
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from streamlit_uploads_library.utils import default_cache_dir
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexes (directory TEXT PRIMARY KEY, generation INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS index_dirs (directory TEXT NOT NULL, path TEXT NOT NULL, generation INTEGER NOT NULL, record BLOB, PRIMARY KEY (directory, path));
+CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, directory TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, width INTEGER, height INTEGER, format TEXT, orientation INTEGER);
+CREATE INDEX IF NOT EXISTS metadata_directory ON metadata (directory);
+CREATE TABLE IF NOT EXISTS thumbnails (cache_dir TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL, PRIMARY KEY (cache_dir, name));
+CREATE INDEX IF NOT EXISTS thumbnails_used ON thumbnails (cache_dir, used);
+"""
+
+# SQLite limits the number of variables in a single statement.
+BATCH_SIZE = 500
+
+class SharedCache():
+    """A cache shared by every streamlit process on the host.
+
+    Stores the directory indexes, image metadata and thumbnail catalog in a SQLite database in WAL
+    mode so several streamlit server processes, for example behind a load balancer, share one warm
+    cache. Index changes are stored per directory together with the generation they were made in, so
+    other processes only load the directories that changed. Rescanning a directory and reading
+    metadata are coordinated with file locks, so after a change only one process does the work and
+    the others load its results. File locks are not available on Windows, the cache is then only
+    coordinated between threads.
+
+    Enable it with `enable_shared_cache()` before creating any library, gallery or file uploader.
+
+    Args:
+        db_path (str): A str() of the path to the database, default is None to use "shared.sqlite3" in the package cache directory.
+        timeout (float): A float() of the number of seconds to wait for another process to finish writing, default is 30.
+    """
+    def __init__(self, db_path=None, timeout=30.0):
+        if db_path is None:
+            db_path = default_cache_dir() / "shared.sqlite3"
+        self.db_path = Path(db_path).resolve()
+        self.lock_dir = self.db_path.parent / "locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._thread_locks = dict()
+        self._thread_locks_lock = threading.Lock()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """Returns the database connection of the current thread.
+
+        Returns:
+            connection (sqlite3.Connection): The sqlite3.Connection() of the current thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """Runs the statements within the block in a single write transaction."""
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @contextmanager
+    def lock(self, name):
+        """Holds an exclusive lock shared by every process using the cache.
+
+        Args:
+            name (str): A str() identifying the locked resource, for example the path to a directory.
+        """
+        with self._thread_locks_lock:
+            thread_lock = self._thread_locks.setdefault(name, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = self.lock_dir / (hashlib.sha1(name.encode("utf-8")).hexdigest() + ".lock")
+            with open(lock_path, "a+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def index_generation(self, directory):
+        """Returns the generation of a stored directory index.
+
+        Args:
+            directory (str): A str() of the path to the indexed directory.
+
+        Returns:
+            generation (int): An int() of the generation or None if the directory has not been stored.
+        """
+        row = self.connection().execute("SELECT generation FROM indexes WHERE directory = ?", (directory,)).fetchone()
+        return None if row is None else row[0]
+
+    def load_index(self, directory, since=0):
+        """Returns the changes made to a stored directory index.
+
+        Args:
+            directory (str): A str() of the path to the indexed directory.
+            since (int): An int() of the generation already loaded, only later changes are returned, default is 0 to return every directory.
+
+        Returns:
+            generation (int): An int() of the stored generation or None if the directory has not been stored.
+            changes (dict): A dict() of directory path to directory record, or None when the directory was removed, in the order they were first stored.
+        """
+        connection = self.connection()
+        connection.execute("BEGIN")
+        try:
+            generation = self.index_generation(directory)
+            rows = connection.execute("SELECT path, record FROM index_dirs WHERE directory = ? AND generation > ? ORDER BY rowid", (directory, since)).fetchall()
+        finally:
+            connection.execute("COMMIT")
+        changes = {path: None if record is None else pickle.loads(record) for path, record in rows}
+        return generation, changes
+
+    def save_index(self, directory, generation, changes):
+        """Stores the changes made to a directory index.
+
+        Args:
+            directory (str): A str() of the path to the indexed directory.
+            generation (int): An int() of the new generation of the index.
+            changes (dict): A dict() of directory path to directory record, or None when the directory was removed.
+        """
+        rows = [(directory, path, generation, None if record is None else pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)) for path, record in changes.items()]
+        with self.transaction() as connection:
+            connection.executemany("INSERT INTO index_dirs (directory, path, generation, record) VALUES (?, ?, ?, ?) ON CONFLICT (directory, path) DO UPDATE SET generation = excluded.generation, record = excluded.record", rows)
+            connection.execute("INSERT INTO indexes (directory, generation) VALUES (?, ?) ON CONFLICT (directory) DO UPDATE SET generation = excluded.generation", (directory, generation))
+
+    def load_metadata(self, directory, paths=None):
+        """Returns stored image metadata.
+
+        Args:
+            directory (str): A str() of the path to the directory containing the images.
+            paths (list): A list() of str() paths to return, default is None to return every image in the directory.
+
+        Returns:
+            records (dict): A dict() of path to a tuple() of modification time, size and a tuple() of width, height, format and orientation.
+        """
+        connection = self.connection()
+        query = "SELECT path, mtime_ns, size, width, height, format, orientation FROM metadata"
+        if paths is None:
+            rows = connection.execute(f"{query} WHERE directory = ?", (directory,)).fetchall()
+        else:
+            paths = list(paths)
+            rows = list()
+            for start in range(0, len(paths), BATCH_SIZE):
+                batch = paths[start:start + BATCH_SIZE]
+                rows.extend(connection.execute(f"{query} WHERE path IN ({', '.join('?' * len(batch))})", batch).fetchall())
+        return {path: (mtime_ns, size, (width, height, image_format, orientation)) for path, mtime_ns, size, width, height, image_format, orientation in rows}
+
+    def save_metadata(self, directory, records, removed=()):
+        """Stores image metadata.
+
+        Args:
+            directory (str): A str() of the path to the directory containing the images.
+            records (dict): A dict() of path to a tuple() of modification time, size and a tuple() of width, height, format and orientation.
+            removed (list): A list() of str() paths to images whose metadata is removed.
+        """
+        rows = [(path, directory, mtime_ns, size, *values[:4]) for path, (mtime_ns, size, values) in records.items()]
+        with self.transaction() as connection:
+            connection.executemany("INSERT OR REPLACE INTO metadata (path, directory, mtime_ns, size, width, height, format, orientation) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            connection.executemany("DELETE FROM metadata WHERE path = ?", [(path,) for path in removed])
+
+    def add_thumbnails(self, cache_dir, thumbnails):
+        """Adds thumbnails to the catalog.
+
+        Args:
+            cache_dir (str): A str() of the path to the thumbnail cache directory.
+            thumbnails (list): A list() of tuples of the thumbnail filename, size in bytes and last use time, existing entries are kept.
+        """
+        with self.transaction() as connection:
+            connection.executemany("INSERT OR IGNORE INTO thumbnails (cache_dir, name, size, used) VALUES (?, ?, ?, ?)", [(cache_dir, name, size, used) for name, size, used in thumbnails])
+
+    def touch_thumbnail(self, cache_dir, name, size=None):
+        """Marks a thumbnail as used, adding it to the catalog when `size` is given.
+
+        Args:
+            cache_dir (str): A str() of the path to the thumbnail cache directory.
+            name (str): A str() of the filename of the thumbnail.
+            size (int): An int() of the size of a new thumbnail in bytes, default is None to only update an existing entry.
+
+        Returns:
+            cached (bool): A bool() which is True when the thumbnail is in the catalog.
+        """
+        connection = self.connection()
+        if size is None:
+            return connection.execute("UPDATE thumbnails SET used = ? WHERE cache_dir = ? AND name = ?", (time.time(), cache_dir, name)).rowcount > 0
+        connection.execute("INSERT OR REPLACE INTO thumbnails (cache_dir, name, size, used) VALUES (?, ?, ?, ?)", (cache_dir, name, size, time.time()))
+        return True
+
+    def remove_thumbnail(self, cache_dir, name):
+        """Removes a thumbnail from the catalog.
+
+        Args:
+            cache_dir (str): A str() of the path to the thumbnail cache directory.
+            name (str): A str() of the filename of the thumbnail.
+        """
+        self.connection().execute("DELETE FROM thumbnails WHERE cache_dir = ? AND name = ?", (cache_dir, name))
+
+    def evict_thumbnails(self, cache_dir, max_bytes):
+        """Removes the least recently used thumbnails from the catalog.
+
+        Args:
+            cache_dir (str): A str() of the path to the thumbnail cache directory.
+            max_bytes (int): An int() defining the maximum combined size of the thumbnails in bytes.
+
+        Returns:
+            evicted (list): A list() of str() filenames of the removed thumbnails, the caller deletes the files.
+        """
+        evicted = list()
+        with self.transaction() as connection:
+            total_bytes = connection.execute("SELECT COALESCE(SUM(size), 0) FROM thumbnails WHERE cache_dir = ?", (cache_dir,)).fetchone()[0]
+            if total_bytes <= max_bytes:
+                return evicted
+            for name, size in connection.execute("SELECT name, size FROM thumbnails WHERE cache_dir = ? ORDER BY used", (cache_dir,)).fetchall():
+                if total_bytes <= max_bytes:
+                    break
+                evicted.append(name)
+                total_bytes -= size
+            connection.executemany("DELETE FROM thumbnails WHERE cache_dir = ? AND name = ?", [(cache_dir, name) for name in evicted])
+        return evicted
+
+_shared_cache = None
+
+def enable_shared_cache(db_path=None):
+    """Enables the cache shared between processes.
+
+    Must be called before any library, gallery or file uploader is created, for example at the top
+    of the main script, every process serving the app must use the same `db_path`.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.shared import enable_shared_cache
+        from streamlit_uploads_library.library import Library
+
+        enable_shared_cache()
+        library = Library(directory="assets")
+
+    Args:
+        db_path (str): A str() of the path to the database, default is None to use "shared.sqlite3" in the package cache directory.
+
+    Returns:
+        shared_cache (SharedCache): The enabled SharedCache().
+    """
+    global _shared_cache
+    if _shared_cache is None or (db_path is not None and Path(db_path).resolve() != _shared_cache.db_path):
+        _shared_cache = SharedCache(db_path)
+    return _shared_cache
+
+def get_shared_cache():
+    """Returns the cache shared between processes.
+
+    Returns:
+        shared_cache (SharedCache): The enabled SharedCache() or None when it is not enabled.
+    """
+    return _shared_cache
@@ -0,0 +1,293 @@
+import hashlib
+import logging
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from streamlit_uploads_library.decoding import decode_image
+from streamlit_uploads_library.utils import atomic_write, default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+HASHES_VERSION = 1
+# Images whose hashes differ in at most this many of their 64 bits are considered similar.
+DEFAULT_MAX_DISTANCE = 4
+# Images are decoded at a reduced scale of at least this size to be hashed.
+HASH_DECODE_SIZE = 64
+# The number of neighbours compared to each hash in every band when grouping similar images.
+MAX_NEIGHBOURS = 64
+# The number of bits set in every byte value, used to count the bits of a whole array at once.
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+ORIENTATION_TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def dhash(img):
+    """Returns the difference hash of an image.
+
+    The image is reduced to 9x8 grey pixels with its EXIF orientation applied and each bit of the
+    hash records whether a pixel is brighter than its left neighbour, so resized, recompressed or
+    re-exported copies of an image have the same or a very close hash.
+
+    Args:
+        img (Image): A PIL Image(), downscale it first when it is large.
+
+    Returns:
+        image_hash (int): An int() of the 64 bit hash.
+    """
+    orientation = img.getexif().get(0x0112, 1)
+    small = img.convert("L").resize((36, 32), Image.Resampling.BOX)
+    if orientation in ORIENTATION_TRANSPOSES:
+        small = small.transpose(ORIENTATION_TRANSPOSES[orientation])
+    pixels = np.asarray(small.resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+def hash_image(path):
+    """Returns the difference hash of an image file.
+
+    JPEG images are decoded at a reduced scale, pass the path to a thumbnail when one exists to
+    avoid decoding the original.
+
+    Args:
+        path (str): A str() of the path to the image or its thumbnail.
+
+    Returns:
+        image_hash (int): An int() of the 64 bit hash, or None if the image can't be decoded.
+    """
+    try:
+        with decode_image(path, (HASH_DECODE_SIZE, HASH_DECODE_SIZE)) as img:
+            img.thumbnail((HASH_DECODE_SIZE * 4, HASH_DECODE_SIZE * 4))
+            return dhash(img)
+    except (OSError, ValueError, SyntaxError) as e:
+        logger.debug(f"Unable to hash {path}: {e}")
+        return None
+
+def hamming_distances(hashes, image_hash):
+    """Returns the number of bits that differ between every hash in an array and a hash.
+
+    Args:
+        hashes (np.ndarray): A numpy uint64 array of hashes.
+        image_hash (int): An int() of the hash to compare them to.
+
+    Returns:
+        distances (np.ndarray): A numpy uint8 array of the distance to each hash.
+    """
+    differences = np.ascontiguousarray(hashes ^ np.uint64(image_hash))
+    return POPCOUNT[differences.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+def find_similar(hashes, image_hash, max_distance=DEFAULT_MAX_DISTANCE):
+    """Returns the positions of the hashes similar to a hash, closest first.
+
+    Args:
+        hashes (np.ndarray): A numpy uint64 array of hashes.
+        image_hash (int): An int() of the hash to compare them to.
+        max_distance (int): An int() of the maximum number of differing bits, default is 4.
+
+    Returns:
+        positions (np.ndarray): A numpy int array of positions in `hashes`.
+    """
+    distances = hamming_distances(hashes, image_hash)
+    positions = np.flatnonzero(distances <= max_distance)
+    return positions[np.argsort(distances[positions], kind="stable")]
+
+def group_similar(hashes, max_distance=DEFAULT_MAX_DISTANCE):
+    """Groups similar hashes.
+
+    Hashes are never compared pairwise. The 64 bits are split into `max_distance + 1` bands, two
+    hashes within `max_distance` bits of each other have at least one identical band, so for every
+    band the hashes are sorted on it and only neighbours with the same band value are compared, up
+    to MAX_NEIGHBOURS of them. Hashes connected by a similar pair form a group.
+
+    Args:
+        hashes (np.ndarray): A numpy uint64 array of hashes.
+        max_distance (int): An int() of the maximum number of differing bits, default is 4.
+
+    Returns:
+        labels (np.ndarray): A numpy int array of the group of each hash, the position of its first member, or -1 when it isn't similar to any other hash.
+    """
+    # Identical hashes are grouped directly, only the distinct hashes are compared.
+    hashes, inverse = np.unique(np.asarray(hashes, dtype=np.uint64), return_inverse=True)
+    num_of_hashes = len(hashes)
+    firsts = list()
+    seconds = list()
+    bounds = np.linspace(0, 64, min(max_distance + 1, 64) + 1).astype(np.uint64)
+    for band_start, band_end in zip(bounds[:-1], bounds[1:]):
+        band_mask = np.uint64((1 << int(band_end - band_start)) - 1)
+        bands = (hashes >> band_start) & band_mask
+        order = np.lexsort((hashes, bands))
+        sorted_bands = bands[order]
+        for offset in range(1, min(MAX_NEIGHBOURS, num_of_hashes - 1) + 1):
+            same_band = np.flatnonzero(sorted_bands[offset:] == sorted_bands[:-offset])
+            if not len(same_band):
+                break
+            first = order[same_band]
+            second = order[same_band + offset]
+            similar = hamming_distances(hashes[first] ^ hashes[second], 0) <= max_distance
+            firsts.append(first[similar])
+            seconds.append(second[similar])
+    labels = np.arange(num_of_hashes)
+    if firsts:
+        firsts = np.concatenate(firsts)
+        seconds = np.concatenate(seconds)
+        # Spread the smallest label along the pairs until every group has a single label.
+        while True:
+            lowest = np.minimum(labels[firsts], labels[seconds])
+            updated = labels.copy()
+            np.minimum.at(updated, firsts, lowest)
+            np.minimum.at(updated, seconds, lowest)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+    labels = labels[inverse]
+    # Label each group with the position of its first member.
+    first_positions = np.full(num_of_hashes, len(labels))
+    np.minimum.at(first_positions, labels, np.arange(len(labels)))
+    group_sizes = np.bincount(labels, minlength=num_of_hashes)
+    return np.where(group_sizes[labels] > 1, first_positions[labels], -1)
+
+class PerceptualHashes():
+    """A persistent store of the perceptual hashes of the images in a directory.
+
+    The difference hash of each image is keyed on its path, modification time and size and computed
+    by a thread pool from its thumbnail, which is created when it doesn't exist yet, so the original
+    is only decoded once to display and hash it. Hashes of uploads are added by the upload workers.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.index import get_index
+        from streamlit_uploads_library.similarity import PerceptualHashes, group_similar
+
+        index = get_index("assets")
+        index.refresh()
+        store = PerceptualHashes(directory="assets")
+        store.update(index.entries())
+        files = index.files()
+        labels = group_similar(store.hashes(files)[0])
+
+    Args:
+        directory (str): A str() of the path to the folder containing the images, for example, "assets".
+        store_path (str): A str() of the path to the file used to store the hashes, default is None to store them in the package cache directory.
+        max_workers (int): An int() defining the number of threads used to hash images, default is 8.
+    """
+    def __init__(self, directory, store_path=None, max_workers=8):
+        self.directory = str(Path(directory).resolve())
+        if store_path is None:
+            digest = hashlib.sha1(self.directory.encode("utf-8")).hexdigest()
+            store_path = default_cache_dir() / "hashes" / f"{digest}.pickle"
+        self.store_path = Path(store_path)
+        self.max_workers = max_workers
+        self.records = dict()
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Loads the store from disk, a missing, unreadable or outdated store is ignored."""
+        try:
+            with open(self.store_path, "rb") as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable hash store {self.store_path}: {e}")
+            return
+        if saved.get("version") != HASHES_VERSION or saved.get("directory") != self.directory:
+            return
+        with self._lock:
+            self.records = saved["records"]
+
+    def save(self):
+        """Saves the store to disk."""
+        with self._lock:
+            saved = {"version": HASHES_VERSION, "directory": self.directory, "records": self.records}
+            data = pickle.dumps(saved, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            atomic_write(self.store_path, data)
+        except OSError as e:
+            logger.warning(f"Unable to save hash store {self.store_path}: {e}")
+
+    def update(self, entries, thumbnail_cache=None, thumbnail_width=300, save=True):
+        """Hashes the images that are new or whose modification time or size has changed.
+
+        Args:
+            entries (list): A list() of FileEntry() objects from the directory index.
+            thumbnail_cache (ThumbnailCache): A ThumbnailCache() whose thumbnails are hashed instead of the originals, default is None to hash the originals.
+            thumbnail_width (int): An int() defining the width in pixels of the thumbnails to hash, default is 300.
+            save (bool): A bool() to save the store to disk when it has changed, default is True.
+
+        Returns:
+            changed (bool): A bool() which is True when the store has changed.
+        """
+        with self._lock:
+            records = self.records
+            stale = [entry for entry in entries if records.get(entry.path, (None, None))[:2] != (entry.mtime_ns, entry.size)]
+        if not stale:
+            return False
+        def hash_entry(entry):
+            path = entry.path
+            if thumbnail_cache is not None:
+                path = thumbnail_cache.get(path, thumbnail_width)
+            return hash_image(path)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(hash_entry, stale))
+        self.add({entry.path: (entry.mtime_ns, entry.size, image_hash) for entry, image_hash in zip(stale, results)}, save)
+        return True
+
+    def add(self, records, save=True):
+        """Adds hashes computed elsewhere, for example by the upload workers, to the store.
+
+        Args:
+            records (dict): A dict() of path to a tuple() of modification time, size and int() hash, or None when the image can't be decoded.
+            save (bool): A bool() to save the store, default is True.
+        """
+        if not records:
+            return
+        with self._lock:
+            self.records.update(records)
+        if save:
+            self.save()
+
+    def hashes(self, paths):
+        """Returns the stored hashes of images.
+
+        Args:
+            paths (list): A list() of str() paths to the images.
+
+        Returns:
+            hashes (np.ndarray): A numpy uint64 array of the hash of each image, 0 for images without a hash.
+            known (np.ndarray): A numpy bool array which is True for each image with a hash.
+        """
+        records = self.records
+        values = [records.get(path, (None, None, None))[2] for path in paths]
+        known = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+        hashes = np.fromiter((value or 0 for value in values), dtype=np.uint64, count=len(values))
+        return hashes, known
+
+_stores = dict()
+_stores_lock = threading.Lock()
+
+def get_perceptual_hashes(directory):
+    """Returns the shared perceptual hash store of a directory.
+
+    Args:
+        directory (str): A str() of the path to the folder containing the images.
+
+    Returns:
+        perceptual_hashes (PerceptualHashes): The PerceptualHashes() of the directory.
+    """
+    directory = str(Path(directory).resolve())
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = PerceptualHashes(directory)
+            _stores[directory] = store
+        return store
@@ -0,0 +1,337 @@
+import hashlib
+import logging
+import os
+import secrets
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+from streamlit_uploads_library.index import add_invalidation_listener
+from streamlit_uploads_library.instrumentation import NULL_METRICS
+from streamlit_uploads_library.shared import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Streamlit serves every other file type from the static folder as "text/plain".
+SAFE_STATIC_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
+# Streamlit refuses to serve larger files from the static folder.
+MAX_STATIC_FILE_BYTES = 200 * 1024 * 1024
+# Seconds after which the originals published by a process that stopped running are deleted.
+ORIGINALS_MAX_AGE = 24 * 60 * 60
+# Seconds between two updates of the modification time of a process' originals folder.
+ORIGINALS_TOUCH_INTERVAL = 60
+# Threads creating the thumbnails queued by queue_thumbnail().
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+
+def static_serving_enabled():
+    """Returns whether streamlit serves the app static folder.
+
+    Returns:
+        enabled (bool): A bool() which is True when `server.enableStaticServing` is set.
+    """
+    from streamlit import config
+    return bool(config.get_option("server.enableStaticServing"))
+
+class StaticFiles():
+    """Publishes library images through streamlit's static file route.
+
+    Images are displayed by URL instead of being read by the streamlit server and pushed through
+    its in-memory media file manager for every session. Thumbnails are created as JPEGs, or PNGs for
+    formats which can be transparent, directly in the static folder and originals are hard linked into it (or copied when the static folder is on
+    another filesystem). File names are derived from the path, modification time and size of the
+    original so a URL never changes its content, each URL carries a `v` query parameter which makes
+    streamlit send long lived `Cache-Control` headers, browsers and reverse proxies can then cache
+    the images indefinitely. Thumbnails can also be queued to be created by background threads, so
+    a page can be displayed without waiting for them.
+
+    Published originals are removed as soon as the original is renamed, moved, deleted or changed,
+    and the least recently used ones are removed when they grow beyond `max_original_bytes`. They
+    are only tracked in memory, so every StaticFiles() publishes into its own subfolder of the 
+    originals folder, whose modification time it refreshes while it is used. Subfolders left 
+    unused for ORIGINALS_MAX_AGE by a process that stopped are deleted, the originals published by 
+    other sessions and server processes are never touched.
+
+    Requires `enableStaticServing = true` in the `[server]` section of ".streamlit/config.toml".
+
+    Args:
+        static_dir (str): A str() of the path to the app static folder, default is None to use the "static" folder next to the main script.
+        max_bytes (int): An int() defining the maximum combined size of the thumbnails in bytes, default is 512 MiB.
+        max_original_bytes (int): An int() defining the maximum combined size of the published originals in bytes, default is 1 GiB.
+    """
+    def __init__(self, static_dir=None, max_bytes=512 * 1024 * 1024, max_original_bytes=1024 * 1024 * 1024):
+        if static_dir is None:
+            static_dir = Path(sys.argv[0]).resolve().parent / "static"
+        self.static_dir = Path(static_dir).resolve()
+        self.root = self.static_dir / "streamlit_uploads_library"
+        self.originals_root = self.root / "originals"
+        self.originals_dir = self.originals_root / f"{os.getpid()}-{secrets.token_hex(4)}"
+        self.originals_dir.mkdir(parents=True, exist_ok=True)
+        self.exports_dir = self.root / "exports"
+        from streamlit_uploads_library.thumbnails import ThumbnailCache
+        self.thumbnail_cache = ThumbnailCache(cache_dir=self.root / "thumbnails", max_bytes=max_bytes, image_format="JPEG", shared_cache=get_shared_cache(), alpha_format="PNG")
+        self.max_original_bytes = max_original_bytes
+        self._lock = threading.Lock()
+        # Published file name to the path of its original and its size, in least recently used order.
+        self._originals = OrderedDict()
+        self._original_bytes = 0
+        self._touched = time.monotonic()
+        # Names of the thumbnails queued for the background threads and of those which failed.
+        self._queued_thumbnails = set()
+        self._failed_thumbnails = set()
+        self._thumbnail_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="StaticThumbnails")
+        self.prune_originals()
+        add_invalidation_listener(self.discard_originals)
+
+    def url_for(self, path):
+        """Returns the URL of a file in the static folder.
+
+        Args:
+            path (str): A str() of the path to a file inside the static folder.
+
+        Returns:
+            url (str): A str() containing the URL relative to the app.
+        """
+        path = Path(path)
+        rel_path = path.relative_to(self.static_dir).as_posix()
+        return f"app/static/{quote(rel_path)}?v={path.stem}"
+
+    def thumbnail_url(self, img, width, metrics=NULL_METRICS):
+        """Returns the URL of a thumbnail, creating it if required.
+
+        Args:
+            img (str): A str() of the path to the original image.
+            width (int): An int() of the requested thumbnail width in pixels.
+            metrics (Metrics): A Metrics() used to count cache hits, misses and bytes read, default is a no-op.
+
+        Returns:
+            url (str): A str() containing the URL of the thumbnail, or None if it could not be created.
+        """
+        thumbnail_path = self.thumbnail_cache.get(img, width, metrics=metrics)
+        if thumbnail_path == str(img):
+            return None
+        return self.url_for(thumbnail_path)
+
+    def cached_thumbnail_url(self, img, width, metrics=NULL_METRICS):
+        """Returns the URL of a thumbnail without creating it.
+
+        Args:
+            img (str): A str() of the path to the original image.
+            width (int): An int() of the requested thumbnail width in pixels.
+            metrics (Metrics): A Metrics() used to count cache hits, default is a no-op.
+
+        Returns:
+            url (str): A str() containing the URL of the thumbnail, or None if it isn't cached.
+        """
+        thumbnail_path = self.thumbnail_cache.get(img, width, metrics=metrics, create=False)
+        if thumbnail_path is None:
+            return None
+        return self.url_for(thumbnail_path)
+
+    def queue_thumbnail(self, img, width):
+        """Queues a thumbnail to be created by a background thread.
+
+        A thumbnail is only queued once while it is pending, a thumbnail which could not be created 
+        is never queued again unless the original changes.
+
+        Args:
+            img (str): A str() of the path to the original image.
+            width (int): An int() of the requested thumbnail width in pixels.
+
+        Returns:
+            queued (bool): A bool() which is False if the thumbnail could not be created.
+        """
+        name = self.thumbnail_cache.thumbnail_path(img, width).name
+        with self._lock:
+            if name in self._failed_thumbnails:
+                return False
+            if name not in self._queued_thumbnails:
+                self._queued_thumbnails.add(name)
+                self._thumbnail_pool.submit(self.create_queued_thumbnail, img, width, name)
+        return True
+
+    def create_queued_thumbnail(self, img, width, name):
+        """Creates a thumbnail queued by queue_thumbnail().
+
+        Args:
+            img (str): A str() of the path to the original image.
+            width (int): An int() of the requested thumbnail width in pixels.
+            name (str): A str() of the filename of the thumbnail.
+        """
+        try:
+            failed = self.thumbnail_cache.get(img, width) == str(img)
+        except OSError as e:
+            logger.warning(f"Unable to create a thumbnail for {img}: {e}")
+            failed = True
+        with self._lock:
+            self._queued_thumbnails.discard(name)
+            if failed:
+                self._failed_thumbnails.add(name)
+
+    def original_url(self, img):
+        """Returns the URL of an original image, publishing it if required.
+
+        Args:
+            img (str): A str() of the path to the original image.
+
+        Returns:
+            url (str): A str() containing the URL of the image, or None if it can't be served statically.
+        """
+        img = os.path.abspath(img)
+        suffix = Path(img).suffix.lower()
+        if suffix not in SAFE_STATIC_EXTENSIONS:
+            return None
+        try:
+            stat = os.stat(img)
+        except OSError:
+            return None
+        name = f"{self.original_key(img, stat)}{suffix}"
+        published_path = self.originals_dir / name
+        self.touch_originals()
+        with self._lock:
+            published = name in self._originals
+            if published:
+                self._originals.move_to_end(name)
+        if not published or not published_path.exists():
+            try:
+                self.publish(img, published_path)
+            except OSError as e:
+                logger.warning(f"Unable to publish {img}: {e}")
+                return None
+            self.add_original(name, img, stat.st_size)
+        return self.url_for(published_path)
+
+    def original_key(self, img, stat):
+        """Returns the key used to name a published original.
+
+        Args:
+            img (str): A str() of the absolute path to the original image.
+            stat (os.stat_result): The stat() result of the original image.
+
+        Returns:
+            key (str): A str() containing the hex digest used to name the published file.
+        """
+        return hashlib.sha1(f"{img}|{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")).hexdigest()
+
+    def publish(self, img, published_path):
+        """Hard links or copies an image into the static folder.
+
+        Args:
+            img (str): A str() of the path to the original image.
+            published_path (Path): A Path() object pointing to the file to create in the static folder.
+        """
+        tmp_path = published_path.with_name(f".{published_path.name}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            os.link(img, tmp_path)
+        except OSError:
+            shutil.copyfile(img, tmp_path)
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, published_path)
+
+    def add_original(self, name, img, size):
+        """Records a published original, removing the least recently used ones when required.
+
+        Args:
+            name (str): A str() of the file name of the published original.
+            img (str): A str() of the absolute path to the original image.
+            size (int): An int() of the size of the original image in bytes.
+        """
+        evicted = list()
+        with self._lock:
+            previous = self._originals.pop(name, None)
+            if previous is not None:
+                self._original_bytes -= previous[1]
+            self._originals[name] = (img, size)
+            self._original_bytes += size
+            while self._original_bytes > self.max_original_bytes and len(self._originals) > 1:
+                evicted_name, (_, evicted_size) = self._originals.popitem(last=False)
+                self._original_bytes -= evicted_size
+                evicted.append(evicted_name)
+        self.unlink_originals(evicted)
+
+    def discard_originals(self, paths):
+        """Removes the published copies of originals that were renamed, moved, deleted or changed.
+
+        Registered with add_invalidation_listener() so the static folder never serves a file the
+        library no longer contains.
+
+        Args:
+            paths (list): A list() of str() absolute paths to changed files or directories.
+        """
+        prefixes = tuple(path.rstrip(os.sep) + os.sep for path in paths)
+        paths = set(paths)
+        with self._lock:
+            affected = [(name, img) for name, (img, _) in self._originals.items() if img in paths or img.startswith(prefixes)]
+        stale = list()
+        for name, img in affected:
+            try:
+                current = f"{self.original_key(img, os.stat(img))}{Path(img).suffix.lower()}"
+            except OSError:
+                current = None
+            if current != name:
+                stale.append(name)
+        with self._lock:
+            for name in stale:
+                entry = self._originals.pop(name, None)
+                if entry is not None:
+                    self._original_bytes -= entry[1]
+        self.unlink_originals(stale)
+
+    def touch_originals(self):
+        """Refreshes the modification time of the originals folder of this process, at most once per ORIGINALS_TOUCH_INTERVAL."""
+        now = time.monotonic()
+        if now - self._touched < ORIGINALS_TOUCH_INTERVAL:
+            return
+        self._touched = now
+        try:
+            os.utime(self.originals_dir)
+        except OSError as e:
+            logger.warning(f"Unable to update {self.originals_dir}: {e}")
+
+    def prune_originals(self, max_age=ORIGINALS_MAX_AGE):
+        """Deletes the originals folders of processes that stopped using them.
+
+        Args:
+            max_age (int): An int() of the number of seconds a folder is kept after its last use, default is 1 day.
+        """
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.originals_root):
+            try:
+                if entry.path == str(self.originals_dir) or entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError as e:
+                logger.warning(f"Unable to remove {entry.path}: {e}")
+
+    def unlink_originals(self, names):
+        """Deletes published originals from the static folder.
+
+        Args:
+            names (list): A list() of str() file names in the originals folder.
+        """
+        for name in names:
+            try:
+                (self.originals_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+
+_default_static_files = None
+_default_static_files_lock = threading.Lock()
+
+def get_static_files():
+    """Returns the default static files publisher.
+
+    Returns:
+        static_files (StaticFiles): The shared StaticFiles() instance.
+    """
+    global _default_static_files
+    with _default_static_files_lock:
+        if _default_static_files is None:
+            _default_static_files = StaticFiles()
+        return _default_static_files
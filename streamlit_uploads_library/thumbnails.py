@@ -0,0 +1,325 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from PIL import Image, ImageOps
+from streamlit_uploads_library.decoding import decode_image
+from streamlit_uploads_library.instrumentation import NULL_METRICS
+from streamlit_uploads_library.shared import get_shared_cache
+from streamlit_uploads_library.utils import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+FORMAT_SUFFIXES = {"WEBP": ".webp", "JPEG": ".jpg", "PNG": ".png"}
+# Extensions of the formats which can store transparency.
+ALPHA_EXTENSIONS = (".png", ".gif", ".webp", ".avif", ".tif", ".tiff", ".ico")
+
+def resize_thumbnail(img, width):
+    """Downscales an image to a thumbnail width in place.
+
+    The aspect ratio is kept and the bounding box is swapped for EXIF orientations 5 to 8 because 
+    they swap the axes once the orientation is applied. An image already smaller than the thumbnail 
+    is left unchanged, so an image can be downscaled to several widths from the largest to the 
+    smallest.
+
+    Args:
+        img (Image): The PIL Image() to downscale.
+        width (int): An int() of the requested thumbnail width in pixels.
+    """
+    # `thumbnail` uses JPEG draft mode internally so large JPEGs are decoded at a reduced scale
+    # instead of at full resolution.
+    if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        img.thumbnail((width * 4, width))
+    else:
+        img.thumbnail((width, width * 4))
+
+def save_thumbnail(img, thumbnail_path, image_format="WEBP", quality=80):
+    """Saves a thumbnail.
+
+    EXIF orientation is applied because the thumbnail is saved without the original metadata. The 
+    thumbnail is written to a temporary file first and then renamed so a partially written file is 
+    never served.
+
+    Args:
+        img (Image): The downscaled PIL Image().
+        thumbnail_path (Path): A Path() object pointing to the thumbnail to create.
+        image_format (str): A str() with the format used to save the thumbnail, "WEBP", "JPEG" or "PNG", default is "WEBP".
+        quality (int): An int() defining the encoder quality, default is 80.
+
+    Returns:
+        size (int): An int() of the size of the created thumbnail in bytes.
+    """
+    thumbnail_path = Path(thumbnail_path)
+    img = ImageOps.exif_transpose(img)
+    if image_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA")
+    fd, tmp_path = tempfile.mkstemp(dir=thumbnail_path.parent, prefix=".", suffix=thumbnail_path.suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format=image_format, quality=quality)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, thumbnail_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return thumbnail_path.stat().st_size
+
+class ThumbnailCache():
+    """A persistent on-disk cache of downscaled images.
+
+    Thumbnails are keyed on the path, modification time and size of the original file together with
+    the requested width, so a changed original produces a new key and the old thumbnail simply ages
+    out. Thumbnails are generated once and kept on disk between runs, the least recently used ones
+    are deleted when the cache grows beyond `max_bytes`. When a SharedCache() is used the catalog of 
+    thumbnails is kept in it, so processes sharing the cache directory share the thumbnails and a 
+    single byte budget. With `alpha_format` the thumbnails of formats which can be transparent are 
+    saved in that format instead, so a format without transparency such as JPEG can be used for 
+    photos without flattening transparent images onto black. The format is chosen from the file 
+    extension of the original and is part of the thumbnail file name.
+
+    Example Usage:
+        python
+        from streamlit_uploads_library.thumbnails import ThumbnailCache
+
+        thumbnails = ThumbnailCache(max_bytes=256 * 1024 * 1024)
+        thumbnail_path = thumbnails.get("assets/landscape/pexels-analogicus-6958793.jpg", width=300)
+
+    Args:
+        cache_dir (str): A str() of the path to the folder used to store thumbnails, default is None to use "~/.cache/streamlit_uploads_library/thumbnails".
+        max_bytes (int): An int() defining the maximum combined size of all thumbnails in bytes, default is 512 MiB.
+        image_format (str): A str() with the format used to save thumbnails, "WEBP" or "JPEG", default is "WEBP".
+        quality (int): An int() defining the encoder quality used to save thumbnails, default is 80.
+        shared_cache (SharedCache): A SharedCache() used to store the catalog of thumbnails, default is None to keep it in memory.
+        alpha_format (str): A str() with the format used to save the thumbnails of images which can be transparent, for example "PNG", default is None to use `image_format`.
+    """
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024, image_format="WEBP", quality=80, shared_cache=None, alpha_format=None):
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "thumbnails"
+        self.cache_dir = Path(cache_dir).resolve()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.image_format = image_format.upper()
+        self.quality = quality
+        self.suffix = FORMAT_SUFFIXES[self.image_format]
+        self.alpha_format = None if alpha_format is None else alpha_format.upper()
+        self.shared_cache = shared_cache
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.load_entries()
+
+    def load_entries(self):
+        """Loads the existing thumbnails.
+
+        Loads the thumbnails already present in the cache directory, the modification time of each
+        thumbnail is refreshed whenever it is used so it is used to restore the LRU order.
+        """
+        existing = list()
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                existing.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        if self.shared_cache is not None:
+            self.shared_cache.add_thumbnails(str(self.cache_dir), [(name, size, mtime_ns / 1e9) for mtime_ns, name, size in existing])
+            self.evict_shared()
+            return
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            for _, name, size in sorted(existing):
+                self._entries[name] = size
+                self._total_bytes += size
+            self.evict()
+
+    def thumbnail_key(self, path, mtime_ns, size, width):
+        """Returns the cache key of a thumbnail.
+
+        Args:
+            path (str): A str() of the path to the original image.
+            mtime_ns (int): An int() of the modification time of the original image in nanoseconds.
+            size (int): An int() of the size of the original image in bytes.
+            width (int): An int() of the requested thumbnail width in pixels.
+
+        Returns:
+            key (str): A str() containing the hex digest used to name the thumbnail.
+        """
+        key = f"{path}|{mtime_ns}|{size}|{width}|{self.quality}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, path, width, stat=None, metrics=NULL_METRICS, create=True):
+        """Returns the path to a thumbnail, creating it if required.
+
+        Args:
+            path (str): A str() of the path to the original image.
+            width (int): An int() of the requested thumbnail width in pixels.
+            stat (os.stat_result): An optional stat() result for the original image, used to avoid another stat call.
+            metrics (Metrics): A Metrics() used to count cache hits, misses and bytes read, default is a no-op.
+            create (bool): A bool() to create the thumbnail when it isn't cached, default is True.
+
+        Returns:
+            thumbnail_path (str): A str() of the path to the thumbnail, the original path if it could not be created or None if it isn't cached and `create` is False.
+        """
+        path = str(path)
+        if stat is None:
+            stat = os.stat(path)
+        thumbnail_path = self.thumbnail_path(path, width, stat)
+        name = thumbnail_path.name
+        if self.shared_cache is not None:
+            if self.shared_cache.touch_thumbnail(str(self.cache_dir), name) and thumbnail_path.exists():
+                metrics.count("thumbnail_cache_hits")
+                return str(thumbnail_path)
+            cached = False
+        else:
+            with self._lock:
+                cached = name in self._entries
+                if cached:
+                    self._entries.move_to_end(name)
+        if cached:
+            try:
+                os.utime(thumbnail_path)
+                metrics.count("thumbnail_cache_hits")
+                return str(thumbnail_path)
+            except FileNotFoundError:
+                self.discard(name)
+        if not create:
+            return None
+        metrics.count("thumbnail_cache_misses")
+        metrics.count("bytes_read", stat.st_size)
+        try:
+            size = self.create_thumbnail(path, thumbnail_path, width)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning(f"Unable to create a thumbnail for {path}: {e}")
+            return path
+        self.add(name, size)
+        return str(thumbnail_path)
+
+    def thumbnail_path(self, path, width, stat=None):
+        """Returns the path a thumbnail is stored at, whether or not it exists.
+
+        Args:
+            path (str): A str() of the path to the original image.
+            width (int): An int() of the requested thumbnail width in pixels.
+            stat (os.stat_result): An optional stat() result for the original image, used to avoid another stat call.
+
+        Returns:
+            thumbnail_path (Path): A Path() object pointing to the thumbnail.
+        """
+        path = str(path)
+        if stat is None:
+            stat = os.stat(path)
+        return self.cache_dir / (self.thumbnail_key(path, stat.st_mtime_ns, stat.st_size, width) + FORMAT_SUFFIXES[self.thumbnail_format(path)])
+
+    def thumbnail_format(self, path):
+        """Returns the format used to save the thumbnail of an image.
+
+        Args:
+            path (str): A str() of the path to the original image.
+
+        Returns:
+            image_format (str): A str() of the format, `alpha_format` for images which can be transparent, otherwise `image_format`.
+        """
+        if self.alpha_format is not None and str(path).lower().endswith(ALPHA_EXTENSIONS):
+            return self.alpha_format
+        return self.image_format
+
+    def add(self, name, size):
+        """Adds a thumbnail created in the cache directory to the cache.
+
+        Used after creating a thumbnail, including thumbnails created by another process such as 
+        the upload workers, evicting the least recently used thumbnails when required.
+
+        Args:
+            name (str): A str() of the filename of the thumbnail.
+            size (int): An int() of the size of the thumbnail in bytes.
+        """
+        if self.shared_cache is not None:
+            self.shared_cache.touch_thumbnail(str(self.cache_dir), name, size)
+            self.evict_shared()
+            return
+        with self._lock:
+            if name not in self._entries:
+                self._total_bytes += size
+            self._entries[name] = size
+            self.evict()
+
+    def create_thumbnail(self, path, thumbnail_path, width):
+        """Creates a thumbnail.
+
+        The image is downscaled to `width` keeping the aspect ratio, EXIF orientation is applied
+        because the thumbnail is saved without the original metadata. The thumbnail is written to a
+        temporary file first and then renamed so a partially written file is never served. JPEG 
+        images are decoded at a reduced scale and the image has to be within the decoding limits.
+
+        Args:
+            path (str): A str() of the path to the original image.
+            thumbnail_path (Path): A Path() object pointing to the thumbnail to create.
+            width (int): An int() of the requested thumbnail width in pixels.
+
+        Returns:
+            size (int): An int() of the size of the created thumbnail in bytes.
+        """
+        with decode_image(path, (width, width)) as img:
+            resize_thumbnail(img, width)
+            return save_thumbnail(img, thumbnail_path, self.thumbnail_format(path), self.quality)
+
+    def discard(self, name):
+        """Removes a thumbnail from the cache.
+
+        Args:
+            name (str): A str() of the filename of the thumbnail to remove.
+        """
+        if self.shared_cache is not None:
+            self.shared_cache.remove_thumbnail(str(self.cache_dir), name)
+        with self._lock:
+            size = self._entries.pop(name, None)
+            if size is not None:
+                self._total_bytes -= size
+        try:
+            (self.cache_dir / name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Evicts the least recently used thumbnails.
+
+        Deletes thumbnails in least recently used order until the cache is within `max_bytes`, the
+        caller must hold the lock.
+        """
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                (self.cache_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+
+    def evict_shared(self):
+        """Evicts the least recently used thumbnails of every process using the shared cache."""
+        for name in self.shared_cache.evict_thumbnails(str(self.cache_dir), self.max_bytes):
+            try:
+                (self.cache_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_thumbnail_cache():
+    """Returns the default thumbnail cache.
+
+    The default cache is shared by every library and gallery in the process so that a single byte
+    budget applies to all of them.
+
+    Returns:
+        thumbnail_cache (ThumbnailCache): The shared ThumbnailCache() instance.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ThumbnailCache(shared_cache=get_shared_cache())
+        return _default_cache
@@ -1,7 +1,20 @@
 import streamlit as st
 import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from PIL import Image
+from streamlit_uploads_library.archives import DEFAULT_MAX_ARCHIVE_BYTES, DEFAULT_MAX_ARCHIVE_MEMBERS, ArchiveError, extract_member, is_archive, iter_members, member_path
+from streamlit_uploads_library.decoding import estimate_decoded_bytes, get_memory_budget
+from streamlit_uploads_library.dedupe import get_content_hashes, hash_file
+from streamlit_uploads_library.index import get_index, invalidate_paths
+from streamlit_uploads_library.instrumentation import Metrics, NULL_METRICS
+from streamlit_uploads_library.metadata import get_metadata_store
+from streamlit_uploads_library.processing import PartFile, check_image_file, check_image_header, create_derivatives, job_result, resumable_copy, submit_job, transform_image
+from streamlit_uploads_library.similarity import DEFAULT_MAX_DISTANCE, find_similar, get_perceptual_hashes
+from streamlit_uploads_library.static import get_static_files, static_serving_enabled
+from streamlit_uploads_library.thumbnails import get_thumbnail_cache
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +42,21 @@ class UploadFiles():
         uid (str): A str() containing a unique identifier allowing you to create multiple file uploaders on the same page.
         upload_label (str): A str() used to set the label of the file uploader widget, default is "Upload Files", can be set to None to display an empty string instead.
         widget_type (str): A str() defining the type of widget to use to display the file uploader, options are "container" or "expander", default is "container".
+        save_mode (str): A str() defining how files are saved, "passthrough" streams the original bytes to disk after checking the image header, "transform" decodes and re-encodes each image in a worker process applying its EXIF orientation, default is "passthrough".
+        max_workers (int): An int() defining the number of worker processes used to transform images and create thumbnails, default is None to use the number of CPUs up to 4.
+        thumbnail_widths (list): A list() of int() widths in pixels of the thumbnails created for each saved file, use the `thumbnail_width` of the libraries and galleries displaying the folder and add larger widths for web sized variants, default is (300,), an empty list() disables them.
+        serve_static (bool): A bool() to also create the thumbnails used by libraries and galleries with `serve_static` enabled, default is False.
+        max_file_bytes (int): An int() defining the maximum size of a single uploaded file in bytes, larger files are rejected, default is None for no limit other than streamlit's `server.maxUploadSize`.
+        memory_budget (int): An int() defining the number of bytes of decoded images held in memory at once by the "transform" save_mode and by thumbnails, shared by everything in the process, default is 1 GiB. Only used when the memory budget is created.
+        warn_duplicates (bool): A bool() to display a warning when a saved file looks like an image already in the folder, such as a resized or re-exported copy, default is False. The folder is hashed on the first upload.
+        duplicate_distance (int): An int() defining the number of bits of the 64 bit perceptual hashes that may differ for images to be considered similar, default is 4.
+        accept_archives (bool): A bool() to also accept ZIP and TAR archives, the images they contain are extracted into `save_location` keeping their folders, default is False.
+        max_archive_bytes (int): An int() defining the maximum uncompressed size of an archive in bytes, larger archives are rejected, default is 4 GiB.
+        max_archive_members (int): An int() defining the maximum number of entries in an archive, archives with more are rejected, default is 10,000.
+        metrics (Metrics): A Metrics() used to record timings and counters for the file uploader, default is None to disable instrumentation.
+        show_metrics (bool): A bool() to display the recorded timings and counters below the file uploader, default is False.
     """
-    def __init__(self, save_location, expanded=True, file_extensions=["png", "jpg", "jpeg"], header="Upload Files", info_msg="Upload new files here.", uid="files", upload_label="Upload Files", widget_type="container"):
+    def __init__(self, save_location, expanded=True, file_extensions=["png", "jpg", "jpeg"], header="Upload Files", info_msg="Upload new files here.", uid="files", upload_label="Upload Files", widget_type="container", save_mode="passthrough", max_workers=None, thumbnail_widths=(300,), serve_static=False, max_file_bytes=None, memory_budget=1024 * 1024 * 1024, warn_duplicates=False, duplicate_distance=DEFAULT_MAX_DISTANCE, accept_archives=False, max_archive_bytes=DEFAULT_MAX_ARCHIVE_BYTES, max_archive_members=DEFAULT_MAX_ARCHIVE_MEMBERS, metrics=None, show_metrics=False):
         self.save_location = save_location
         self.expanded = expanded
         self.file_extensions = file_extensions
@@ -39,10 +65,38 @@ class UploadFiles():
         self.uid = uid
         self.upload_label = upload_label
         self.widget_type = widget_type
-        self.uploader = self.create_layout(self.expanded, self.file_extensions, self.header, self.info_msg, self.uid, self.upload_label, self.widget_type)
+        self.save_mode = save_mode
+        self.max_workers = max_workers
+        self.thumbnail_widths = thumbnail_widths
+        self.serve_static = serve_static and static_serving_enabled()
+        self.max_file_bytes = max_file_bytes
+        self.memory_budget = memory_budget
+        self.warn_duplicates = warn_duplicates
+        self.duplicate_distance = duplicate_distance
+        self.accept_archives = accept_archives
+        self.max_archive_bytes = max_archive_bytes
+        self.max_archive_members = max_archive_members
+        self.show_metrics = show_metrics
+        if metrics is None:
+            metrics = Metrics() if show_metrics else NULL_METRICS
+        self.metrics = metrics
+        upload_types = list(self.file_extensions)
+        if self.accept_archives:
+            # Streamlit checks the last extension only, ".tar.gz" archives are accepted as ".gz".
+            upload_types.extend(("zip", "tar", "tgz", "gz"))
+        self.uploader = self.create_layout(self.expanded, upload_types, self.header, self.info_msg, self.uid, self.upload_label, self.widget_type)
 
         if self.uploaded_files is not None:
-            self.save_uploaded_files(self.uploaded_files, self.save_location)
+            # The file uploader keeps its value across reruns, files that have already been saved 
+            # in this session are skipped so a rerun doesn't save them again.
+            processed_uploads = st.session_state.setdefault(f"{self.uid}_processed_uploads", set())
+            new_files = [file for file in self.uploaded_files if file.id not in processed_uploads]
+            if new_files:
+                self.save_uploaded_files(new_files, self.save_location)
+                processed_uploads.update(file.id for file in new_files)
+        if self.show_metrics:
+            with self.upload_options:
+                self.metrics.render(label=f"Performance ({self.uid})")
 
     def create_layout(self, expanded, file_extensions, header, info_msg, uid, upload_label, widget_type):
         """Creates the file uploader widget layout.
@@ -76,14 +130,319 @@ class UploadFiles():
     def save_uploaded_files(self, files_to_upload, destination):
         """Saves the uploaded files.
         
-        Saves the file(s) selected using the file uploader to the directory provided.
+        Saves the file(s) selected using the file uploader to the directory provided. Files are 
+        hashed first and skipped when a file with the same content already exists in the directory, 
+        the skipped files are listed in a message once saving has finished, files larger than `max_file_bytes` are rejected. Each file is streamed to disk in chunks to a 
+        hidden partial file named after its content hash, if saving the same content was interrupted 
+        before only the missing chunks are written. In the "passthrough" save_mode the image header 
+        is checked and the partial file is renamed once complete, in the "transform" save_mode each 
+        image is decoded from the partial file and re-encoded in a worker process, waiting for the 
+        shared memory budget when other large images are being decoded. The thumbnails and metadata 
+        of the saved files are then created by the worker processes. A progress bar is displayed 
+        while saving. Archives are extracted by save_archive() when `accept_archives` is set. Only the 
+        saved paths are invalidated in the libraries displaying the directory, once at the end.
 
         Args:
             files_to_upload (list): A list() of file(s) returned by the st.file_uploader widget.
             destination (str): A str() pointing to the directory to save the uploaded files.
         """
-        for file in files_to_upload:
-            full_path = Path(f"{destination}/{file.name}")
-            with Image.open(file) as f:
-                f.save(full_path)
-        st.cache_resource.clear()
+        if not files_to_upload:
+            return
+        destination = Path(destination)
+        content_hashes = get_content_hashes(destination)
+        archives = [file for file in files_to_upload if self.accept_archives and is_archive(file.name)]
+        files_to_upload = [file for file in files_to_upload if not (self.accept_archives and is_archive(file.name))]
+        num_of_files = len(files_to_upload)
+        saved_paths = list()
+        changed_dirs = list()
+        skipped_names = list()
+        progress_bar = st.progress(0, text=f"Saving {num_of_files} file(s)...")
+        # Skip any file whose content already exists in the destination, including files repeated 
+        # within this batch.
+        unique_files = dict()
+        for done_idx, file in enumerate(files_to_upload, start=1):
+            with self.metrics.timer("hash"):
+                digest = hash_file(file)
+            self.metrics.count("bytes_read", file.size)
+            existing_path = content_hashes.find(digest, file.size) if digest not in unique_files else unique_files[digest][1]
+            if self.max_file_bytes is not None and file.size > self.max_file_bytes:
+                logger.warning(f"Unable to save {file.name}: {file.size} bytes is larger than the limit of {self.max_file_bytes} bytes.")
+                self.metrics.count("files_rejected")
+                progress_bar.progress(done_idx / num_of_files, text=f"Rejected {file.name} ({done_idx}/{num_of_files})")
+            elif existing_path is not None:
+                logger.info(f"Skipping {file.name}, the same file already exists as {Path(existing_path).name}.")
+                self.metrics.count("files_skipped")
+                skipped_names.append(file.name)
+                progress_bar.progress(done_idx / num_of_files, text=f"Skipped {file.name} ({done_idx}/{num_of_files})")
+            else:
+                unique_files[digest] = (file, destination / Path(file.name).name)
+        done_idx = num_of_files - len(unique_files)
+        with self.metrics.timer("save"):
+            if self.save_mode == "transform":
+                memory_budget = get_memory_budget(self.memory_budget)
+                futures = dict()
+                part_files = list()
+                try:
+                    for digest, (file, full_path) in unique_files.items():
+                        try:
+                            # The partial file is held until the worker has read it and it is removed.
+                            part_file = PartFile(destination / f".{digest}.part")
+                            part_files.append(part_file)
+                            part_path = part_file.path
+                            self.metrics.count("bytes_written", resumable_copy(file, part_path, file.size))
+                            # Workers read the image from the partial file, the memory it needs once decoded 
+                            # is reserved until the worker has finished.
+                            num_of_bytes = estimate_decoded_bytes(part_path)
+                            future = submit_job(transform_image, str(part_path), str(full_path), max_workers=self.max_workers, memory_bytes=num_of_bytes, memory_budget=memory_budget)
+                            futures[future] = (digest, full_path, part_file, num_of_bytes)
+                        except Exception as e:
+                            logger.warning(f"Unable to save {full_path.name}: {e}")
+                            done_idx += 1
+                    for future in as_completed(futures):
+                        digest, full_path, part_file, num_of_bytes = futures[future]
+                        try:
+                            self.metrics.count("bytes_written", job_result(future, transform_image, str(part_file.path), str(full_path), max_workers=self.max_workers, memory_bytes=num_of_bytes, memory_budget=memory_budget))
+                            self.metrics.count("files_saved")
+                            content_hashes.add(digest, full_path)
+                            saved_paths.append(full_path)
+                        except Exception as e:
+                            logger.warning(f"Unable to save {full_path.name}: {e}")
+                        part_file.path.unlink(missing_ok=True)
+                        part_file.release()
+                        done_idx += 1
+                        progress_bar.progress(done_idx / num_of_files, text=f"Saved {full_path.name} ({done_idx}/{num_of_files})")
+                finally:
+                    for part_file in part_files:
+                        part_file.release()
+            else:
+                for digest, (file, full_path) in unique_files.items():
+                    try:
+                        if check_image_header(file) is None:
+                            raise ValueError("not a supported image.")
+                        with PartFile(destination / f".{digest}.part") as part_file:
+                            self.metrics.count("bytes_written", resumable_copy(file, part_file.path, file.size))
+                            os.replace(part_file.path, full_path)
+                        self.metrics.count("files_saved")
+                        content_hashes.add(digest, full_path)
+                        saved_paths.append(full_path)
+                    except Exception as e:
+                        logger.warning(f"Unable to save {full_path.name}: {e}")
+                    done_idx += 1
+                    progress_bar.progress(done_idx / num_of_files, text=f"Saved {full_path.name} ({done_idx}/{num_of_files})")
+        with self.metrics.timer("extract"):
+            for archive in archives:
+                archive_paths, archive_dirs, archive_skipped = self.save_archive(archive, destination, content_hashes, progress_bar)
+                saved_paths.extend(archive_paths)
+                changed_dirs.extend(archive_dirs)
+                skipped_names.extend(archive_skipped)
+        with self.metrics.timer("derivatives"):
+            self.create_derivatives(saved_paths, destination, progress_bar)
+        progress_bar.empty()
+        invalidate_paths(saved_paths + changed_dirs)
+        if skipped_names:
+            names = ", ".join(skipped_names[:10])
+            if len(skipped_names) > 10:
+                names += f" and {len(skipped_names) - 10} more"
+            with self.upload_options:
+                st.info(f"Skipped {len(skipped_names)} file(s) which already exist in the folder: {names}.")
+
+    def save_archive(self, file, destination, content_hashes, progress_bar):
+        """Extracts the images of an uploaded archive.
+
+        The archive is read as a stream and each image with one of the `file_extensions` is written 
+        to a hidden staging folder in the destination while its content is hashed, images whose 
+        content already exists are skipped. Paths leaving the destination, links, images larger than 
+        `max_file_bytes` or compressed suspiciously well and archives above `max_archive_bytes` or 
+        `max_archive_members` are refused. The extracted images are validated in parallel while the 
+        archive is still being read, by a thread pool checking their headers in the "passthrough" 
+        save_mode or by the worker processes re-encoding them in the "transform" save_mode. Nothing 
+        is moved into the destination until the whole archive has been read, so a rejected archive 
+        saves no files at all.
+
+        Args:
+            file (UploadedFile): The archive returned by the st.file_uploader widget.
+            destination (Path): A Path() object pointing to the directory to extract the images to.
+            content_hashes (ContentHashes): The ContentHashes() of the destination.
+            progress_bar (st.progress): The progress bar displayed while saving.
+
+        Returns:
+            saved_paths (list): A list() of Path() objects pointing to the saved images.
+            created_dirs (list): A list() of Path() objects pointing to the folders created for them.
+            skipped_names (list): A list() of str() names of the members skipped because their content already exists.
+        """
+        saved_paths = list()
+        created_dirs = list()
+        skipped_names = list()
+        digests = set()
+        futures = dict()
+        if self.save_mode == "transform":
+            memory_budget = get_memory_budget(self.memory_budget)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers or min(8, os.cpu_count() or 1))
+        # The directory is only listed once, the extracted images are added to the index together 
+        # at the end.
+        content_hashes.index.refresh()
+        # Staged files end in ".part" so libraries and the duplicate check ignore them.
+        staging_dir = Path(tempfile.mkdtemp(dir=destination, prefix=".", suffix=".extract"))
+        rejected = False
+        try:
+            try:
+                for member_idx, member in enumerate(iter_members(file, self.file_extensions, self.max_file_bytes, self.max_archive_bytes, self.max_archive_members)):
+                    member_path(destination, member.name)
+                    part_path = staging_dir / f"{member_idx}.part"
+                    digest, num_of_bytes = extract_member(member, part_path)
+                    self.metrics.count("bytes_read", num_of_bytes)
+                    if digest in digests or content_hashes.find(digest, num_of_bytes, refresh=False) is not None:
+                        logger.info(f"Skipping {member.name}, the same file already exists.")
+                        self.metrics.count("files_skipped")
+                        skipped_names.append(member.name)
+                        part_path.unlink()
+                        continue
+                    digests.add(digest)
+                    if self.save_mode == "transform":
+                        staged_path = staging_dir / f"{member_idx}.out.part"
+                        args = (str(part_path), str(staged_path), Path(member.name).suffix)
+                        num_of_bytes = estimate_decoded_bytes(part_path)
+                        future = submit_job(transform_image, *args, max_workers=self.max_workers, memory_bytes=num_of_bytes, memory_budget=memory_budget)
+                    else:
+                        staged_path = part_path
+                        args = (str(part_path),)
+                        num_of_bytes = 0
+                        future = pool.submit(check_image_file, *args)
+                    futures[future] = (digest, member.name, staged_path, args, num_of_bytes)
+                    progress_bar.progress(min(file.tell() / max(file.size, 1), 1.0), text=f"Extracting {file.name}: {member.name}")
+            except ArchiveError as e:
+                logger.warning(f"Unable to extract {file.name}: {e}")
+                self.metrics.count("files_rejected")
+                rejected = True
+            if rejected:
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                return saved_paths, created_dirs, skipped_names
+            valid = list()
+            for future in as_completed(futures):
+                digest, name, staged_path, args, num_of_bytes = futures[future]
+                try:
+                    if self.save_mode == "transform":
+                        job_result(future, transform_image, *args, max_workers=self.max_workers, memory_bytes=num_of_bytes, memory_budget=memory_budget)
+                    elif future.result() is None:
+                        raise ValueError("not a supported image.")
+                    valid.append((digest, name, staged_path))
+                except Exception as e:
+                    logger.warning(f"Unable to save {name}: {e}")
+            # Every path is checked again before the first file is moved in, in case a folder in
+            # the destination was replaced by a link while the archive was read.
+            try:
+                targets = [(digest, member_path(destination, name), staged_path) for digest, name, staged_path in valid]
+            except ArchiveError as e:
+                logger.warning(f"Unable to extract {file.name}: {e}")
+                self.metrics.count("files_rejected")
+                return saved_paths, created_dirs, skipped_names
+            for digest, full_path, staged_path in targets:
+                try:
+                    if not full_path.parent.exists():
+                        new_dir = full_path.parent
+                        while not new_dir.parent.exists():
+                            new_dir = new_dir.parent
+                        full_path.parent.mkdir(parents=True, exist_ok=True)
+                        created_dirs.append(new_dir)
+                    os.chmod(staged_path, 0o644)
+                    os.replace(staged_path, full_path)
+                except OSError as e:
+                    logger.warning(f"Unable to save {full_path.name}: {e}")
+                    continue
+                self.metrics.count("bytes_written", full_path.stat().st_size)
+                self.metrics.count("files_saved")
+                content_hashes.add(digest, full_path)
+                saved_paths.append(full_path)
+        finally:
+            if self.save_mode != "transform":
+                pool.shutdown()
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return saved_paths, created_dirs, skipped_names
+
+    def create_derivatives(self, saved_paths, destination, progress_bar):
+        """Creates the thumbnails and reads the metadata of saved files.
+
+        Each file is decoded once by a worker process which creates a thumbnail for every width in 
+        `thumbnail_widths`, reads its metadata and computes its perceptual hash. The thumbnails are 
+        added to the caches used by libraries and galleries, the metadata to the metadata store and 
+        the hashes to the perceptual hash store of the directory, so newly saved files are displayed 
+        and compared without being decoded again.
+
+        Args:
+            saved_paths (list): A list() of Path() objects pointing to the saved files.
+            destination (Path): A Path() object pointing to the directory the files were saved to.
+            progress_bar (st.progress): The progress bar displayed while saving.
+        """
+        if not saved_paths:
+            return
+        thumbnail_caches = list()
+        if self.thumbnail_widths:
+            thumbnail_caches.append(get_thumbnail_cache())
+            if self.serve_static:
+                thumbnail_caches.append(get_static_files().thumbnail_cache)
+        futures = dict()
+        for path in saved_paths:
+            try:
+                path = path.resolve()
+                stat = path.stat()
+                thumbnails = [(thumbnail_cache, thumbnail_cache.thumbnail_path(path, width, stat), width) for thumbnail_cache in thumbnail_caches for width in self.thumbnail_widths]
+                specs = [(str(thumbnail_path), width, thumbnail_cache.thumbnail_format(path), thumbnail_cache.quality) for thumbnail_cache, thumbnail_path, width in thumbnails]
+                futures[submit_job(create_derivatives, str(path), specs, self.warn_duplicates, max_workers=self.max_workers)] = (path, stat, thumbnails, specs)
+            except Exception as e:
+                logger.warning(f"Unable to create the thumbnails of {path.name}: {e}")
+        records = dict()
+        hash_records = dict()
+        for done_idx, future in enumerate(as_completed(futures), start=1):
+            path, stat, thumbnails, specs = futures[future]
+            try:
+                metadata, sizes, image_hash = job_result(future, create_derivatives, str(path), specs, self.warn_duplicates, max_workers=self.max_workers)
+            except Exception as e:
+                logger.warning(f"Unable to create the thumbnails of {path.name}: {e}")
+                continue
+            records[str(path)] = (stat.st_mtime_ns, stat.st_size, metadata)
+            if image_hash is not None:
+                hash_records[str(path)] = (stat.st_mtime_ns, stat.st_size, image_hash)
+            for (thumbnail_cache, thumbnail_path, _), size in zip(thumbnails, sizes):
+                if size is not None:
+                    thumbnail_cache.add(thumbnail_path.name, size)
+                    self.metrics.count("thumbnails_created")
+            progress_bar.progress(done_idx / len(futures), text=f"Created thumbnails for {path.name} ({done_idx}/{len(futures)})")
+        get_metadata_store(destination).add(records)
+        get_perceptual_hashes(destination).add(hash_records)
+        if self.warn_duplicates:
+            self.warn_similar(hash_records, destination)
+
+    def warn_similar(self, hash_records, destination):
+        """Displays a warning for each saved file that looks like another image in the directory.
+
+        The images already in the directory are hashed from their thumbnails the first time, the 
+        saved files are then compared to every image at once.
+
+        Args:
+            hash_records (dict): A dict() of the str() path of each saved file to a tuple() of its modification time, size and perceptual hash.
+            destination (Path): A Path() object pointing to the directory the files were saved to.
+        """
+        if not hash_records:
+            return
+        perceptual_hashes = get_perceptual_hashes(destination)
+        index = get_index(destination)
+        index.refresh()
+        entries = [entry for entry in index.entries(tuple(self.file_extensions)) if entry.path not in hash_records]
+        thumbnail_cache = get_thumbnail_cache() if self.thumbnail_widths else None
+        thumbnail_width = min(self.thumbnail_widths) if self.thumbnail_widths else None
+        with self.metrics.timer("hashes"):
+            perceptual_hashes.update(entries, thumbnail_cache, thumbnail_width)
+        paths = [entry.path for entry in entries]
+        paths.extend(hash_records)
+        hashes, known = perceptual_hashes.hashes(paths)
+        for path, (_, _, image_hash) in hash_records.items():
+            similar = [paths[position] for position in find_similar(hashes, image_hash, self.duplicate_distance) if known[position] and paths[position] != path]
+            if similar:
+                names = ", ".join(Path(similar_path).name for similar_path in similar[:3])
+                if len(similar) > 3:
+                    names += f" and {len(similar) - 3} more"
+                with self.upload_options:
+                    st.warning(f"{Path(path).name} looks like {names}.")
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from pathlib import Path
+
+def default_cache_dir():
+    """Returns the default cache directory.
+
+    Returns the directory used to store thumbnails and other derived data, `$XDG_CACHE_HOME` is
+    respected if it is set, otherwise "~/.cache" is used. It is kept outside of any library
+    directory so that cached files are never picked up as library images.
+
+    Returns:
+        cache_dir (Path): A Path() object pointing to the cache directory.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "streamlit_uploads_library"
+
+def atomic_write(path, data):
+    """Writes a file atomically.
+
+    The data is written to a temporary file in the same directory which is then renamed over `path`,
+    so readers in other threads or processes never see a partially written file.
+
+    Args:
+        path (Path): A Path() object pointing to the file to write.
+        data (bytes): The bytes() to write.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,70 @@
+import logging
+import threading
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from streamlit_uploads_library.index import get_index, invalidate_paths
+
+logger = logging.getLogger(__name__)
+
+class IndexEventHandler(FileSystemEventHandler):
+    """Forwards filesystem events to the file indexes.
+
+    Every created, deleted, modified or moved path is marked as changed in the indexes containing
+    it, the indexes then only list the affected directories on their next refresh.
+    """
+    def on_any_event(self, event):
+        paths = [event.src_path]
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            paths.append(dest_path)
+        invalidate_paths(paths)
+
+_observer = None
+_watched = dict()
+_watched_lock = threading.Lock()
+
+def watch(directory):
+    """Watches a directory for changes.
+
+    A single observer thread is shared by the whole process and each directory is only scheduled
+    once, no matter how many libraries display it. When the directory can't be watched, for example
+    because the inotify watch limit has been reached, the index falls back to checking directory
+    modification times on each refresh.
+
+    Args:
+        directory (str): A str() of the path to the folder to watch.
+
+    Returns:
+        watched (bool): A bool() which is True when the directory is being watched.
+    """
+    global _observer
+    index = get_index(directory)
+    with _watched_lock:
+        if index.directory in _watched:
+            return True
+        try:
+            if _observer is None:
+                _observer = Observer()
+                _observer.daemon = True
+                _observer.start()
+            _watched[index.directory] = _observer.schedule(IndexEventHandler(), index.directory, recursive=True)
+        except OSError as e:
+            logger.warning(f"Unable to watch {index.directory}, falling back to polling: {e}")
+            return False
+    # Any change made before the watch was scheduled is picked up by one last full refresh.
+    index.refresh()
+    index.watched = True
+    return True
+
+def unwatch(directory):
+    """Stops watching a directory.
+
+    Args:
+        directory (str): A str() of the path to the folder to stop watching.
+    """
+    index = get_index(directory)
+    with _watched_lock:
+        watch_handle = _watched.pop(index.directory, None)
+        if watch_handle is not None:
+            _observer.unschedule(watch_handle)
+    index.watched = False